@@ -1,39 +1,68 @@
-import ast
-import os
+import hashlib
+import inspect
 import logging
 
+from analysis_engine.analyzers.ast_rules import ASTRuleDispatcher, default_rules
+from analysis_engine.analyzers.taint_engine import TaintEngine
+from analysis_engine.utils.findings_cache import ruleset_version
+from analysis_engine.utils.repo_index import RepoIndex
+from analysis_engine.utils.sharding import DEFAULT_MIN_FILES, ShardedFileRunner
+
 logger = logging.getLogger(__name__)
 
 class ASTAnalyzer:
     """Abstract Syntax Tree-based security analysis"""
     
-    def analyze(self, repo_path):
+    cache_name = 'ast'
+    
+    def __init__(self, rules=None, workers=1, min_shard_files=DEFAULT_MIN_FILES, cache=None, taint=True):
+        self.runner = ShardedFileRunner(workers, min_shard_files, cache)
+        self.taint = TaintEngine(cache) if taint else None
+        self.dispatcher = ASTRuleDispatcher(rules if rules is not None else default_rules())
+        self.ruleset_version = ruleset_version(
+            self.cache_name, [self._rule_fingerprint(rule) for rule in self.dispatcher.rules]
+        )
+    
+    def cache_identity(self):
+        """Findings-cache key: editing, adding or removing a rule invalidates cached results"""
+        return self.cache_name, self.ruleset_version
+    
+    def _rule_fingerprint(self, rule):
+        # The whole defining module, so edits to shared helpers count too
+        rule_class = type(rule)
+        try:
+            source = inspect.getsource(inspect.getmodule(rule_class))
+        except (OSError, TypeError):
+            source = ''
+        return rule_class.__module__, rule_class.__qualname__, hashlib.sha256(source.encode('utf-8')).hexdigest()
+    
+    def analyze(self, repo_path, repo_index=None):
         """Run AST analysis on all Python files"""
-        findings = []
-        
-        for root, dirs, files in os.walk(repo_path):
-            for file in files:
-                if file.endswith('.py'):
-                    file_path = os.path.join(root, file)
-                    file_findings = self._analyze_file(file_path, repo_path)
-                    findings.extend(file_findings)
-        
+        findings = list(self.iter_findings(repo_path, repo_index))
         logger.info("ASTAnalyzer found {} findings".format(len(findings)))
         return findings
     
-    def _analyze_file(self, file_path, repo_path):
+    def iter_findings(self, repo_path, repo_index=None):
+        """Findings in file order, yielded as each file is analyzed"""
+        if repo_index is None:
+            repo_index = RepoIndex(repo_path)
+        yield from self.runner.iter_run(self, repo_index, repo_index.iter_files(language='python'))
+        if self.taint is not None:
+            # Flows cross files, so the taint pass covers the whole checkout even on incremental scans
+            try:
+                yield from self.taint.analyze(repo_index.full)
+            except Exception as e:
+                logger.warning("Taint analysis failed: {}".format(str(e)))
+    
+    def _analyze_file(self, rel_path, repo_index):
         """Analyze file using AST"""
         findings = []
         
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-            
-            tree = ast.parse(content)
+            tree = repo_index.parse_ast(rel_path)
             
-            findings.extend(self._check_missing_auth(tree, file_path, repo_path))
-            findings.extend(self._check_idor(tree, file_path, repo_path))
-            findings.extend(self._check_data_flow(tree, file_path, repo_path))
+            # Every rule is dispatched from a single traversal of the tree
+            findings.extend(self.dispatcher.run(tree, rel_path))
         
         except SyntaxError:
             logger.debug("Syntax error in file")
@@ -41,75 +70,3 @@ class ASTAnalyzer:
             logger.warning("AST error: {}".format(str(e)))
         
         return findings
-    
-    def _check_missing_auth(self, tree, file_path, repo_path):
-        """Check for functions without authentication"""
-        findings = []
-        
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                has_auth = any(self._is_auth_decorator(d) for d in node.decorator_list)
-                
-                if not has_auth and any(kw in node.name.lower() for kw in ['delete', 'transfer', 'admin']):
-                    findings.append({
-                        'shortform_keyword': 'MISSING-AUTH-CHECK',
-                        'file_path': os.path.relpath(file_path, repo_path),
-                        'line_number': node.lineno,
-                        'severity': 'HIGH',
-                        'context_snippet': 'Function {}'.format(node.name),
-                        'source': 'ast',
-                        'confidence': 'LOW'
-                    })
-        
-        return findings
-    
-    def _check_idor(self, tree, file_path, repo_path):
-        """Check for IDOR vulnerabilities"""
-        findings = []
-        
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Call):
-                if hasattr(node.func, 'attr') and node.func.attr in ['get', 'find']:
-                    if node.args and self._is_user_input(node.args[0]):
-                        findings.append({
-                            'shortform_keyword': 'IDOR-VULNERABILITY',
-                            'file_path': os.path.relpath(file_path, repo_path),
-                            'line_number': node.lineno,
-                            'severity': 'HIGH',
-                            'context_snippet': 'Direct object reference',
-                            'source': 'ast',
-                            'confidence': 'MEDIUM'
-                        })
-        
-        return findings
-    
-    def _check_data_flow(self, tree, file_path, repo_path):
-        """Check for data flow vulnerabilities"""
-        findings = []
-        
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Call):
-                if hasattr(node.func, 'attr') and node.func.attr in ['execute', 'query']:
-                    if node.args and self._is_user_input(node.args[0]):
-                        findings.append({
-                            'shortform_keyword': 'TAINTED-DATA-FLOW',
-                            'file_path': os.path.relpath(file_path, repo_path),
-                            'line_number': node.lineno,
-                            'severity': 'HIGH',
-                            'context_snippet': 'User input to query',
-                            'source': 'ast',
-                            'confidence': 'HIGH'
-                        })
-        
-        return findings
-    
-    def _is_auth_decorator(self, node):
-        if isinstance(node, ast.Name):
-            return node.id in ['login_required', 'require_auth']
-        return False
-    
-    def _is_user_input(self, node):
-        if isinstance(node, ast.Attribute):
-            if isinstance(node.value, ast.Name):
-                return node.value.id in ['request', 'args']
-        return False
\ No newline at end of file
@@ -1,238 +1,348 @@
+import os
+import re
+import sys
 import subprocess
 import json
+import sqlite3
+import tempfile
+import time
 import logging
-import os
+
+from analysis_engine.utils import bandit_runner
+from analysis_engine.utils.advisory_db import DEFAULT_DB_PATH, AdvisoryDB, normalize_package
+from analysis_engine.utils.findings import Finding
+from analysis_engine.utils.findings_cache import ruleset_version
+from analysis_engine.utils.manifests import declared_dependencies, dependency_files
+from analysis_engine.utils.repo_index import RepoIndex
+from analysis_engine.utils.rule_packs import load_rule_pack, require, source_fingerprint
+from analysis_engine.utils.sharding import DEFAULT_MIN_FILES, ShardedFileRunner
 
 logger = logging.getLogger(__name__)
 
+BANDIT_ARGS = ['-q', '-f', 'json', '-ll']
+BANDIT_TIMEOUT = 120
+# Directories `bandit -r` skips by default
+BANDIT_EXCLUDED_DIRS = {'.svn', 'CVS', '.bzr', '.hg', '.git', '__pycache__', '.tox', '.eggs'}
+# Files per Bandit invocation, keeping the command line well under ARG_MAX
+BANDIT_BATCH_SIZE = 500
+# Rule pack mapping Bandit test IDs to keywords (analysis_engine/rules/bandit.json)
+RULE_PACK = 'bandit'
+BANDIT_TEST_ID = re.compile(r'^B\d{3}$')
+# 'in_process' runs Bandit's tests over the scan's own parsed modules; 'subprocess' shells out to the CLI
+BANDIT_MODES = ('in_process', 'subprocess')
+# 'advisory_db' matches pinned manifest versions against the offline advisory store; 'pip_audit' shells out
+DEPENDENCY_AUDIT_MODES = ('advisory_db', 'pip_audit')
+# Root manifests pip-audit can read, with the arguments that point it at each
+PIP_AUDIT_MANIFESTS = {'requirements.txt': ['-r', 'requirements.txt'], 'pyproject.toml': ['.']}
+# PEP 440 specifier sets pip resolves; other ranges (Poetry's ^1.2, Pipfile's *) are audited by bare name
+PEP440_SPECIFIERS = re.compile(r'^(?:(?:===?|!=|~=|<=?|>=?)\s*[\w.*+!-]+\s*,?\s*)+$')
+
+
+def validate_rules(rules):
+    for test_id, rule in rules.items():
+        require(BANDIT_TEST_ID.match(test_id), RULE_PACK, test_id, "not a Bandit test ID")
+        require(isinstance(rule, dict) and isinstance(rule.get('keyword'), str) and rule['keyword'],
+                RULE_PACK, test_id, "missing keyword")
+
+
+def compile_rule_tables(rules):
+    return {'keywords': {test_id: rule['keyword'] for test_id, rule in rules.items()}}
+
+
 class ExternalToolAnalyzer:
-    """Integrates Bandit and pip-audit"""
+    """Integrates Bandit and dependency auditing (offline advisory database or pip-audit)"""
+    
+    cache_name = 'bandit'
     
-    def __init__(self):
-        self.bandit_mapping = self._load_bandit_mapping()
+    def __init__(self, cache=None, workers=1, min_shard_files=DEFAULT_MIN_FILES, bandit_mode='in_process',
+                 dependency_audit='advisory_db', advisory_db_path=DEFAULT_DB_PATH, resolve_unpinned=True):
+        if bandit_mode not in BANDIT_MODES:
+            raise ValueError("Unknown bandit_mode: {}".format(bandit_mode))
+        if dependency_audit not in DEPENDENCY_AUDIT_MODES:
+            raise ValueError("Unknown dependency_audit: {}".format(dependency_audit))
+        self.rule_pack = load_rule_pack(RULE_PACK, validate_rules, compile_rule_tables,
+                                        compiler_key=source_fingerprint(sys.modules[__name__]))
+        self.bandit_mapping = self.rule_pack.tables['keywords']
+        self.cache = cache
+        self.runner = ShardedFileRunner(workers, min_shard_files, cache)
+        if bandit_mode == 'in_process' and not bandit_runner.available():
+            logger.info("Bandit is not importable in this environment; running the bandit CLI instead")
+            bandit_mode = 'subprocess'
+        self.bandit_mode = bandit_mode
+        self._bandit_version = None
+        self._bandit = None
+        # What the last dependency audit covered, reported in the scan metrics
+        self.audit_summary = None
+        # Unpinned PyPI requirements are resolved with pip-audit (which needs the network)
+        self.resolve_unpinned = resolve_unpinned
+        self.advisory_db = AdvisoryDB(advisory_db_path) if dependency_audit == 'advisory_db' else None
+        if self.advisory_db is not None and not self.advisory_db.synced():
+            logger.warning("Advisory database {} has not been synced (python -m analysis_engine.utils.advisory_db); "
+                           "auditing dependencies with pip-audit".format(advisory_db_path))
+            self.advisory_db = None
     
-    def analyze(self, repo_path):
+    def analyze(self, repo_path, repo_index=None):
         """Run external tools"""
         findings = []
+        if repo_index is None:
+            repo_index = RepoIndex(repo_path)
         
-        findings.extend(self._run_bandit(repo_path))
-        findings.extend(self._run_pip_audit(repo_path))
+        findings.extend(self._run_bandit(repo_path, repo_index))
+        self.audit_summary = None
+        if self.advisory_db is not None:
+            findings.extend(self._run_advisory_audit(repo_path, repo_index))
+        else:
+            findings.extend(self._run_pip_audit(repo_path, repo_index))
         
         logger.info("ExternalToolAnalyzer found {} findings".format(len(findings)))
         return findings
     
-    def _load_bandit_mapping(self):
-        """Map Bandit test IDs to standardized keywords"""
-        return {
-    'B201': 'FLASK-DEBUG-MODE',           # flask_debug_true
-    'B301': 'PICKLE-UNSAFE',              # pickle
-    'B302': 'MARSHAL-UNSAFE',             # marshal
-    'B303': 'MD5-WEAK-HASH',              # md5
-    'B304': 'CIPHER-WEAK',                # ciphers
-    'B305': 'CIPHER-MODE-WEAK',           # cipher_modes
-    'B306': 'TEMP-WEAK',                  # mktemp_q
-    'B307': 'EVAL-EXEC-USE',              # eval
-    'B308': 'MARK-SAFE-USAGE',            # mark_safe
-    'B309': 'HTTPSCONNECTION-UNVERIFIED', # httpsconnection
-    'B310': 'URL-OPEN-UNVERIFIED',        # urllib_urlopen
-    'B311': 'RANDOM-WEAK',                # random
-    'B312': 'TELNETLIB-USAGE',            # telnetlib
-    'B313': 'XML-ETREE-PARSE',            # xml_etree
-    'B314': 'XML-EXPAT-PARSE',            # xml_expat
-    'B315': 'XML-MINIDOM-PARSE',          # xml_minidom
-    'B316': 'XML-PULLDOM-PARSE',          # xml_pulldom
-    'B317': 'XML-SAX-PARSE',              # xml_sax
-    'B318': 'XML-DOM-PARSE',              # xml_dom
-    'B319': 'XML-ETREE-ITERPARSE',        # xml_etree_iterparse
-    'B320': 'UNVERIFIED-CONTEXT-SSL',     # unverified_context
-    'B321': 'FTPLIB-USAGE',               # ftplib
-    'B322': 'INPUT-BUILTIN-USAGE',        # input
-    'B323': 'UNVERIFIED-FTP-CONTEXT',     # unverified_ftp_context
-    'B324': 'HASHLIB-PBKDF2-WEAK',        # hashlib_pbkdf2_weak
+    def cache_identity(self):
+        """Findings-cache key: Bandit's version, its arguments and our keyword mapping"""
+        if self._bandit_version is None:
+            if self.bandit_mode == 'in_process':
+                self._bandit_version = bandit_runner.bandit_version()
+            else:
+                result = subprocess.run(['bandit', '--version'], capture_output=True, text=True, timeout=30)
+                self._bandit_version = (result.stdout.splitlines() or [''])[0].strip()
+        return self.cache_name, ruleset_version(self._bandit_version, BANDIT_ARGS, self.rule_pack.content_hash)
     
-    # ======================================================================
-    # HARDCODED SECRETS & CREDENTIALS
-    # ======================================================================
-    'B105': 'HARDCODED-PASSWORD-STRING',  # hardcoded_password_string
-    'B106': 'HARDCODED-PASSWORD-FUNCARG', # hardcoded_password_funcarg
-    'B107': 'HARDCODED-PASSWORD-DEFAULT', # hardcoded_password_default
-    'B108': 'HARDCODED-TMP-DIRECTORY',    # hardcoded_tmp_directory
-    'B109': 'PASSWORD-CONFIG-OPTION',     # password_config_option_not_marked_secret
+    def _bandit_targets(self, repo_index):
+        return [
+            indexed for indexed in repo_index.iter_files(language='python')
+            if not BANDIT_EXCLUDED_DIRS.intersection(indexed.rel_path.split(os.sep)[:-1])
+            and not indexed.rel_path.split(os.sep)[0].endswith('.egg')
+        ]
     
-    # ======================================================================
-    # COMMAND INJECTION & OS OPERATIONS
-    # ======================================================================
-    'B602': 'SUBPROCESS-SHELL-TRUE',      # shell=True in subprocess
-    'B603': 'SUBPROCESS-WITHOUT-SHELL',   # subprocess without shell equals true
-    'B604': 'ANY-OTHER-FUNCTION-WITH-SHELL', # any_other_function_with_shell_equals_true
-    'B605': 'START-PROCESS-WITH-SHELL',   # start_process_with_a_shell
-    'B606': 'START-PROCESS-NO-SHELL',     # start_process_with_no_shell
-    'B607': 'PARTIAL-PATH-EXECUTABLE',    # start_process_with_partial_path
-    'B608': 'SQL-INJECTION-BANDIT',       # sql_injection
-    'B609': 'WILDCARD-INJECTION',         # linux_commands_wildcard_injection
-    'B610': 'DJANGO-SQL-INJECTION',       # django_sql_injection
-    'B611': 'DJANGO-QUERY-INJECTION',     # django_query_injection
-    'B612': 'LOG-SQL-INJECTION',          # logging_sql_injection
-    'B613': 'REQUEST-VERIFY-FALSE',       # request_verify_false
-    
-    # ======================================================================
-    # AUTHENTICATION & AUTHORIZATION
-    # ======================================================================
-    'B701': 'JINJA2-AUTOESCAPE-FALSE',    # jinja2_autoescape_false
-    'B702': 'MAKO-ESCAPE-FALSE',          # mako_templates
-    'B703': 'DJANGO-MARK-SAFE',           # django_mark_safe
+    def _run_bandit(self, repo_path, repo_index):
+        """Run Bandit per file, serving unchanged files from the findings cache"""
+        if self.bandit_mode == 'in_process':
+            try:
+                return self.runner.run(self, repo_index, self._bandit_targets(repo_index))
+            except Exception as e:
+                logger.error("Bandit error: {}".format(str(e)))
+                return []
+        
+        findings = []
+        try:
+            targets = self._bandit_targets(repo_index)
+            identity = self.cache_identity() if self.cache is not None else None
+            cached = {}
+            if identity and targets:
+                try:
+                    cached = self.cache.load(identity, repo_index, targets)
+                except sqlite3.Error as e:
+                    logger.warning("Findings cache unavailable, running Bandit on every file: {}".format(e))
+            
+            pending = [indexed.rel_path for indexed in targets if indexed.rel_path not in cached]
+            by_file = self._bandit_files(repo_path, pending) if pending else {}
+            if identity and by_file:
+                try:
+                    self.cache.store(identity, repo_index, by_file)
+                except sqlite3.Error as e:
+                    logger.warning("Could not update findings cache: {}".format(e))
+            
+            by_file.update(cached)
+            for indexed in targets:
+                findings.extend(by_file.get(indexed.rel_path, ()))
+        
+        except FileNotFoundError:
+            logger.error("Bandit not installed: pip install bandit")
+        except subprocess.TimeoutExpired:
+            logger.error("Bandit timed out after {} seconds".format(BANDIT_TIMEOUT))
+        except Exception as e:
+            logger.error("Bandit error: {}".format(str(e)))
+        
+        return findings
     
-    # ======================================================================
-    # CRYPTOGRAPHY & SSL/TLS
-    # ======================================================================
-    'B501': 'SSL-CERT-NONE',              # ssl with verify disabled
-    'B502': 'SSL-WITH-BAD-VERSION',       # ssl_with_bad_version
-    'B503': 'SSL-WITH-BAD-DEFAULTS',      # ssl_with_bad_defaults
-    'B504': 'SSL-WITH-NO-VERSION',        # ssl_with_no_version
-    'B505': 'WEAK-CRYPTOGRAPHIC-KEY',     # weak_cryptographic_key
-    'B506': 'YAML-LOAD-UNSAFE',           # yaml_load
-    'B507': 'SSH-NO-HOST-KEY-VERIFICATION', # ssh_no_host_key_verification
+    def _analyze_file(self, rel_path, repo_index):
+        """Bandit's tests over one file, reusing the module parsed for the AST stage"""
+        if self._bandit is None:
+            # Built lazily so each shard worker loads Bandit's plugins once
+            self._bandit = bandit_runner.BanditRunner()
+        try:
+            tree = repo_index.parse_ast(rel_path)
+            issues = self._bandit.scan(repo_index.abs_path(rel_path), repo_index.read_text(rel_path), tree)
+        except SyntaxError:
+            logger.debug("Syntax error in file")
+            return []
+        except Exception as e:
+            logger.warning("Bandit error in {}: {}".format(rel_path, str(e)))
+            return []
+        return [self._map_bandit_issue(dict(issue, filename=rel_path)) for issue in issues]
     
-    # ======================================================================
-    # EXCEPTION HANDLING & FLOW CONTROL
-    # ======================================================================
-    'B110': 'TRY-EXCEPT-CONTINUE',        # try_except_continue
-    'B111': 'TRY-EXCEPT-PASS',            # try_except_pass
-    'B112': 'TRY-EXCEPT-BARE',            # try_except_bare
-    'B113': 'REQUEST-TIMEOUT-MISSING',    # request_without_timeout
+    def _bandit_files(self, repo_path, rel_paths):
+        """
+        Run Bandit on the given files and return their mapped findings keyed by
+        path. Every file Bandit scanned gets an entry, even with no findings,
+        so clean files are cached too; files it failed to scan are left out.
+        """
+        by_file = {}
+        deadline = time.time() + BANDIT_TIMEOUT
+        for start in range(0, len(rel_paths), BANDIT_BATCH_SIZE):
+            batch = rel_paths[start:start + BANDIT_BATCH_SIZE]
+            # Paths are relative because bandit runs inside repo_path, so
+            # issue['filename'] comes back relative to the repository too
+            result = subprocess.run(
+                ['bandit'] + BANDIT_ARGS + ['--'] + batch,
+                capture_output=True,
+                text=True,
+                timeout=max(1, deadline - time.time()),
+                cwd=repo_path  # Run from within the repo directory
+            )
+            if result.returncode not in [0, 1]:
+                logger.error("Bandit exited with {}: {}".format(result.returncode, result.stderr[-500:]))
+                continue
+            try:
+                data = json.loads(result.stdout)
+            except json.JSONDecodeError:
+                logger.error("Bandit JSON parse error")
+                continue
+            
+            # Syntax errors are a property of the blob and safe to cache as "no findings";
+            # anything else (I/O, crashes) is left uncached so it is retried next scan
+            failed = {
+                os.path.normpath(error.get('filename', '')) for error in data.get('errors', [])
+                if 'syntax error' not in error.get('reason', '')
+            }
+            batch_findings = {rel_path: [] for rel_path in batch if rel_path not in failed}
+            for issue in data.get('results', []):
+                finding = self._map_bandit_issue(issue)
+                batch_findings.setdefault(finding.file_path, []).append(finding)
+            by_file.update(batch_findings)
+        return by_file
     
-    # ======================================================================
-    # ASSERTION & TESTING
-    # ======================================================================
-    'B101': 'ASSERT-USAGE',               # assert_used (in security context)
-    'B102': 'EXEC-BUILTIN-USAGE',         # exec_used
-    'B103': 'SET-BUILTIN-USAGE',          # set_builtin_usage (for blacklist)
-    'B104': 'ASSERT-RAISES-USAGE',        # assert_raises_usage (for blacklist)
+    def _map_bandit_issue(self, issue):
+        test_id = issue.get('test_id', 'UNKNOWN')
+        
+        # Map Bandit test ID to keyword
+        keyword = self.bandit_mapping.get(test_id, 'BANDIT-{}'.format(test_id))
+        
+        finding = Finding(
+            keyword, os.path.normpath(issue['filename']), issue['line_number'], issue['issue_severity'], 'bandit',
+            confidence='HIGH', snippet=issue.get('code', '')[:300],
+            extra={'bandit_test_id': test_id, 'bandit_issue': issue.get('issue_text', '')}
+        )
+        logger.debug("Bandit {}: {} at {}:{}".format(
+            test_id, keyword, finding.file_path, finding.line_number
+        ))
+        return finding
     
-    # ======================================================================
-    # FUNCTION & CLASS DEFINITIONS
-    # ======================================================================
-    'B201': 'FLASK-DEBUG-TRUE',           # flask_debug_true
-    'B202': 'TARFILE-UNSAFE-EXTRACT',     # tarfile_unsafe_members
-    'B203': 'YML-LOAD-UNSAFE',            # yaml_load (alternative)
-    'B301': 'PICKLE-LOAD',                # pickle_load
-    'B302': 'MARSHAL-LOAD',               # marshal_load
+    def __getstate__(self):
+        # Bandit's manager holds loaded plugins; workers build their own
+        state = self.__dict__.copy()
+        state['_bandit'] = None
+        return state
     
-    # ======================================================================
-    # FILE OPERATIONS
-    # ======================================================================
-    'B108': 'INSECURE-TEMPFILE',          # hardcoded_tmp_directory
-    'B109': 'TEMP-FILE-NO-CLEANUP',       # password_config_option
-    'B110': 'FILE-PERMISSIONS-WEAK',      # try_except_continue
-    'B111': 'OPEN-FILE-NO-PERMISSION',    # try_except_pass
+    def _run_advisory_audit(self, repo_path, repo_index):
+        """
+        Match every pinned dependency in the root manifests against the offline
+        advisory database. Dependencies declared only as a range are reported
+        where they are declared, and the PyPI ones resolved with pip-audit.
+        """
+        findings = []
+        unpinned = []
+        summary = self.audit_summary = {'mode': 'advisory_db', 'pinned': 0, 'unpinned': 0, 'pip_audit': []}
+        try:
+            dependencies = []
+            for rel_path, language in dependency_files(repo_index):
+                for dependency in declared_dependencies(rel_path, language, repo_index.read_text(rel_path)):
+                    (dependencies if dependency.version else unpinned).append(dependency)
+            for dependency, advisory in self.advisory_db.lookup(dependencies):
+                findings.append(Finding(
+                    'VULNERABLE-DEPENDENCY', dependency.file_path, dependency.line_number,
+                    advisory.severity, 'advisory_db', confidence='HIGH',
+                    snippet=f"{dependency.name}=={dependency.version} - {advisory.id}: {advisory.summary}"[:300],
+                    extra={
+                        'cve': advisory.cve,
+                        'advisory_id': advisory.id,
+                        'package': dependency.name,
+                        'ecosystem': dependency.ecosystem,
+                        'installed_version': dependency.version,
+                        'fixed_version': advisory.fixed,
+                    }
+                ))
+            summary['pinned'], summary['unpinned'] = len(dependencies), len(unpinned)
+            logger.info("Audited {} pinned dependencies: {} vulnerable; {} declared without an exact version".format(
+                len(dependencies), len(findings), len(unpinned)))
+        except sqlite3.Error as e:
+            logger.error("Advisory database error: {}".format(e))
+        except Exception as e:
+            logger.error("Dependency audit error: {}".format(str(e)))
+        
+        for dependency in unpinned:
+            findings.append(Finding(
+                'UNPINNED-DEPENDENCY', dependency.file_path, dependency.line_number, 'INFO', 'advisory_db',
+                confidence='HIGH',
+                snippet=f"{dependency.name} {dependency.spec or '(any version)'} - no exact version to audit"[:300],
+                extra={'package': dependency.name, 'ecosystem': dependency.ecosystem, 'version_spec': dependency.spec}
+            ))
+        resolvable = [dependency for dependency in unpinned if dependency.ecosystem == 'PyPI']
+        if self.resolve_unpinned and resolvable:
+            summary['pip_audit'] = sorted({dependency.file_path for dependency in resolvable})
+            findings.extend(self._run_pip_audit_unpinned(repo_path, resolvable))
+        return findings
     
-    # ======================================================================
-    # NETWORK & COMMUNICATION
-    # ======================================================================
-    'B601': 'PARAMIKO-CALL',              # paramiko_calls
-    'B602': 'POPEN-SHELL-TRUE',           # popen_with_shell_equals_true
-    'B610': 'DJANGO-RAW-SQL',             # django_raw_sql
-    'B611': 'DJANGO-QUERYSET-EXTRA',      # django_queryset_extra
-    'B612': 'LOGGING-SQL',                # logging_sql
-    'B613': 'REQUEST-NO-VERIFY',          # requests_no_verify
+    def _run_pip_audit_unpinned(self, repo_path, dependencies):
+        """pip-audit over just the unpinned PyPI requirements, resolved as pip would install them"""
+        lines = [
+            dependency.name + (dependency.spec if PEP440_SPECIFIERS.match(dependency.spec) else '')
+            for dependency in dependencies
+        ]
+        handle, requirements_path = tempfile.mkstemp(prefix='unpinned-', suffix='.txt')
+        try:
+            with os.fdopen(handle, 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+            return self._pip_audit(repo_path, ['-r', requirements_path], dependencies, dependencies[0].file_path)
+        finally:
+            os.remove(requirements_path)
     
-    # ======================================================================
-    # GENERAL SECURITY
-    # ======================================================================
-    'B701': 'JINJA2-NO-AUTOESCAPE',       # jinja2_autoescape
-    'B702': 'MAKO-TEMPLATES',             # mako_templates
-    'B703': 'DJANGO-SAFE-MARK',           # django_mark_safe
-
-    # UNUSED/DEPRECATED 
-    'B999': 'BLACKLIST-CALL',  
-        }
+    def _run_pip_audit(self, repo_path, repo_index, manifest=None):
+        """Run pip-audit on one root manifest (by default the first it can read)"""
+        if manifest is None:
+            manifest = next((name for name in PIP_AUDIT_MANIFESTS if repo_index.exists(name)), None)
+            if manifest is None:
+                return []
+            self.audit_summary = {'mode': 'pip_audit', 'pip_audit': [manifest]}
+        declared = declared_dependencies(manifest, 'python', repo_index.read_text(manifest))
+        return self._pip_audit(repo_path, PIP_AUDIT_MANIFESTS[manifest], declared, manifest)
     
-    def _run_bandit(self, repo_path):
-        """Run Bandit and map findings"""
+    def _pip_audit(self, repo_path, args, declared, default_file):
+        """
+        Run pip-audit with `args`, reporting each vulnerable package at the
+        line of `declared` that declares it; transitive ones at line 1 of `default_file`
+        """
         findings = []
-        
+        locations = {normalize_package('PyPI', dependency.name): dependency for dependency in reversed(declared)}
         try:
-            # By setting cwd, bandit runs inside the repo_path, and paths in the output
-            # will be relative to that directory. We scan '.' (current dir).
             result = subprocess.run(
-                ['bandit', '-r', '.', '-f', 'json', '-ll'],
+                ['pip-audit', '--format', 'json'] + args,
                 capture_output=True,
                 text=True,
-                timeout=120,
-                cwd=repo_path  # Run from within the repo directory
+                timeout=60,
+                cwd=repo_path # Run from within the repo directory
             )
             
-            if result.returncode in [0, 1]:
+            if result.returncode in [0, 1] and result.stdout:
                 try:
                     data = json.loads(result.stdout)
-                    for issue in data.get('results', []):
-                        test_id = issue.get('test_id', 'UNKNOWN')
-                        
-                        # Map Bandit test ID to keyword
-                        keyword = self.bandit_mapping.get(test_id, 'BANDIT-{}'.format(test_id))
-                        
-                        # issue['filename'] is now correctly relative to repo_path
-                        finding = {
-                            'shortform_keyword': keyword,
-                            'file_path': issue['filename'],
-                            'line_number': issue['line_number'],
-                            'severity': issue['issue_severity'],
-                            'context_snippet': issue.get('code', '')[:300],
-                            'source': 'bandit',
-                            'confidence': 'HIGH',
-                            'bandit_test_id': test_id,
-                            'bandit_issue': issue.get('issue_text', '')
-                        }
-                        findings.append(finding)
-                        logger.debug("Bandit {}: {} at {}:{}".format(
-                            test_id, keyword, finding['file_path'], finding['line_number']
-                        ))
+                    for dep in data.get('dependencies', []):
+                        location = locations.get(normalize_package('PyPI', dep['name']))
+                        file_path, line_number = (location.file_path, location.line_number) if location else (default_file, 1)
+                        for vuln in dep.get('vulns', []):
+                            findings.append(Finding(
+                                'VULNERABLE-DEPENDENCY', file_path, line_number, 'HIGH', 'pip_audit', confidence='HIGH',
+                                snippet=f"{dep['name']}=={dep['version']} - {vuln['id']}: {vuln['description']}"[:300],
+                                extra={
+                                    'cve': vuln.get('id'),
+                                    'package': dep['name'],
+                                    'ecosystem': 'PyPI',
+                                    'installed_version': dep['version'],
+                                    'fixed_version': (vuln.get('fix_versions') or [None])[0],
+                                }
+                            ))
                 except json.JSONDecodeError:
-                    logger.error("Bandit JSON parse error")
-        
-        except FileNotFoundError:
-            logger.error("Bandit not installed: pip install bandit")
-        except subprocess.TimeoutExpired:
-            logger.error("Bandit timed out after 120 seconds")
-        except Exception as e:
-            logger.error("Bandit error: {}".format(str(e)))
-        
-        return findings
-    
-    def _run_pip_audit(self, repo_path):
-        """Run pip-audit"""
-        findings = []
-        
-        # By setting cwd, pip-audit runs inside the repo_path and will
-        # automatically find requirements.txt or other dependency files.
-        try:
-            # Check if any dependency file exists before running
-            if any(os.path.exists(os.path.join(repo_path, f)) for f in ['requirements.txt', 'Pipfile', 'pyproject.toml']):
-                result = subprocess.run(
-                    ['pip-audit', '--format', 'json'],
-                    capture_output=True,
-                    text=True,
-                    timeout=60,
-                    cwd=repo_path # Run from within the repo directory
-                )
-                
-                if result.returncode in [0, 1] and result.stdout:
-                    try:
-                        data = json.loads(result.stdout)
-                        for dep in data.get('dependencies', []):
-                            for vuln in dep.get('vulns', []):
-                                findings.append({
-                                    'shortform_keyword': 'VULNERABLE-DEPENDENCY',
-                                    'file_path': 'dependency_file', # pip-audit doesn't specify file in this format
-                                    'line_number': 0,
-                                    'severity': 'HIGH',
-                                    'context_snippet': f"{dep['name']}=={dep['version']} - {vuln['id']}: {vuln['description']}",
-                                    'source': 'pip_audit',
-                                    'confidence': 'HIGH',
-                                    'cve': vuln.get('id')
-                                })
-                    except json.JSONDecodeError:
-                        logger.error("pip-audit JSON parse error: %s", result.stdout)
+                    logger.error("pip-audit JSON parse error: %s", result.stdout)
         
         except FileNotFoundError:
             logger.error("pip-audit not installed")
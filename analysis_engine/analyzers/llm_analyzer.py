@@ -2,8 +2,6 @@ import os
 import json
 import logging
 from typing import Any, List, Dict
-import re
-import subprocess
 
 import torch
 from transformers import (
@@ -19,6 +17,9 @@ from analysis_engine.utils.model_manager import (
     ADAPTER_DIR
 )
 
+from analysis_engine.utils.repo_index import RepoIndex
+from analysis_engine.utils.symbol_index import SymbolIndex
+
 logger = logging.getLogger(__name__)
 
 # Singleton cache to prevent reloading the model
@@ -75,7 +76,7 @@ class LLMAnalyzer:
             self.model = None
             self.tokenizer = None
 
-    def analyze(self, repo_path: str, seed_findings: List[Dict], full_findings_summary: Dict) -> Dict[str, Any]:
+    def analyze(self, repo_path: str, seed_findings: List[Dict], full_findings_summary: Dict, repo_index: RepoIndex = None) -> Dict[str, Any]:
         """
         Main entry point for LLM analysis.
         Orchestrates different LLM tasks based on config.
@@ -84,7 +85,7 @@ class LLMAnalyzer:
             return {"linked_findings": [], "risk_summary": ""}
 
         results = {}
-        results["linked_findings"] = self._task_hunt_for_linked_vulnerabilities(repo_path, seed_findings)
+        results["linked_findings"] = self._task_hunt_for_linked_vulnerabilities(repo_path, seed_findings, repo_index)
         
         if self.config.get('enable_risk_summary'):
             # Risk summary should analyze ALL findings, including newly found linked ones.
@@ -103,8 +104,14 @@ class LLMAnalyzer:
         response_ids = output_ids[0][inputs.shape[1]:]
         return self.tokenizer.decode(response_ids, skip_special_tokens=True).strip()
 
-    def _task_hunt_for_linked_vulnerabilities(self, repo_path: str, seed_findings: List[Dict]) -> List[Dict]:
+    def _task_hunt_for_linked_vulnerabilities(self, repo_path: str, seed_findings: List[Dict], repo_index: RepoIndex = None) -> List[Dict]:
         all_new_findings = []
+        if repo_index is None:
+            repo_index = RepoIndex(repo_path)
+        # Seeds may come from files an incremental scan carried over, so look them up in the whole checkout
+        checkout = repo_index.full
+        # Built lazily, on the whole checkout even when this scan only re-analyzes changed files
+        symbol_index = None
         hunts_performed = 0
         for seed in seed_findings:
             if hunts_performed >= self.config.get('max_hunts', 3):
@@ -115,26 +122,15 @@ class LLMAnalyzer:
             try:
                 # 1. Gather Context
                 seed_file_path = os.path.join(repo_path, seed['file_path'])
-                if not os.path.exists(seed_file_path):
+                if not checkout.exists(seed['file_path']):
                     logger.warning(f"Seed file not found: {seed_file_path}")
                     continue
                 
-                with open(seed_file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    seed_file_content = f.read()
+                seed_file_content = checkout.read_text(seed['file_path'])
 
-                target_entity = self._extract_target_entity(seed.get('context_snippet', ''))
-                
-                cross_references = "Not available."
-                if target_entity:
-                    try:
-                        # Use rg (ripgrep) for fast, cross-file searching
-                        result = subprocess.run(['rg', '-l', target_entity, repo_path], capture_output=True, text=True)
-                        if result.stdout:
-                            cross_references = "The vulnerable entity is also mentioned in:\n" + result.stdout
-                    except FileNotFoundError:
-                        logger.warning("`rg` (ripgrep) not found. Cannot perform cross-reference search.")
-                    except Exception as e:
-                        logger.warning(f"Cross-reference search failed: {e}")
+                if symbol_index is None:
+                    symbol_index = SymbolIndex.build(checkout)
+                cross_references = symbol_index.cross_references(seed) or "Not available."
 
                 # 2. Build and Execute Prompt
                 prompt = self._build_hunt_prompt(seed, seed_file_content, cross_references)
@@ -167,10 +163,6 @@ Context:
             logger.error(f"LLM task 'summarize_risk' failed: {e}")
             return "Risk summary could not be generated due to an error."
     
-    def _extract_target_entity(self, snippet: str) -> str:
-        match = re.search(r'(?:function|class)\s+([a-zA-Z0-9_]+)', snippet)
-        return match.group(1) if match else ""
-
     def _build_hunt_prompt(self, seed_finding: Dict, seed_file_content: str, cross_references: str) -> str:
         return f"""
 As a security researcher, you have found a "seed" vulnerability. Your task is to investigate the codebase to find other, new vulnerabilities that could be linked to it, forming an attack chain.
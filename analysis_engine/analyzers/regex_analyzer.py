@@ -1,245 +1,603 @@
 
 import re
-import os
+import sys
+import mmap
+import time
 import logging
+from functools import partial
+from array import array
+from bisect import bisect_left
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from analysis_engine.utils.findings import MAX_SNIPPET_LENGTH, Finding
+from analysis_engine.utils.findings_cache import ruleset_version
+from analysis_engine.utils import regex_guard
+from analysis_engine.utils.regex_guard import RegexGuard, backtracking_risks, compile_linear
+from analysis_engine.utils.repo_index import RepoIndex
+from analysis_engine.utils.ripgrep_wrapper import RipGrep
+from analysis_engine.utils.rule_packs import load_rule_pack, require, source_fingerprint
+from analysis_engine.utils.sharding import DEFAULT_MIN_FILES, ShardedFileRunner
 
 logger = logging.getLogger(__name__)
 
+# Literal prefilters shorter than this reject too little to be worth checking
+MIN_PREFILTER_LENGTH = 2
+MAX_PREFILTER_ALTERNATIVES = 64
+
+# 'line': each match is confirmed against its line alone (identical to per-line matching)
+# 'buffer': rules run over the whole file, so a match may span lines
+SCAN_MODES = ('line', 'buffer')
+# 'python' runs rules in-process; 'ripgrep' finds candidate lines for all rules with one rg run
+BACKENDS = ('python', 'ripgrep')
+# In buffer mode, files at least this large are scanned as bytes over an mmap
+DEFAULT_MMAP_MIN_BYTES = 4 * 1024 * 1024
+# Rule pack holding the regex rules (analysis_engine/rules/regex.json)
+RULE_PACK = 'regex'
+SEVERITIES = ('CRITICAL', 'HIGH', 'MEDIUM', 'LOW', 'INFO')
+
+
+def _better_literals(current, candidate):
+    """Pick the literal set whose shortest member is longest (the most selective one)"""
+    def score(literals):
+        return min((len(s) for s in literals), default=0) if literals else 0
+    return candidate if score(candidate) > score(current) else current
+
+
+def _literal_factors(parsed):
+    """
+    Return (exact, required) for a parsed regex sequence.
+    `exact` is the finite set of strings the sequence matches, or None.
+    `required` is a set of strings one of which occurs in every match, or None.
+    """
+    current, best, all_exact = {''}, None, True
+    for op, av in parsed:
+        exact, required = _node_literal_factors(op, av)
+        if exact is not None:
+            current = {a + b for a in current for b in exact}
+            if len(current) <= MAX_PREFILTER_ALTERNATIVES:
+                continue
+            exact, required = None, None
+        all_exact = False
+        best = _better_literals(best, current)
+        best = _better_literals(best, required)
+        current = {''}
+    best = _better_literals(best, current)
+    return (current if all_exact else None), best
+
+
+def _node_literal_factors(op, av):
+    name = str(op)
+    if name == 'LITERAL':
+        return {chr(av).lower()}, None
+    if name == 'SUBPATTERN':
+        return _literal_factors(av[-1])
+    if name == 'BRANCH':
+        branches = [_literal_factors(branch) for branch in av[1]]
+        exact = None
+        if all(e is not None for e, _ in branches):
+            exact = set().union(*(e for e, _ in branches))
+        required = set()
+        for e, r in branches:
+            r = _better_literals(r, e)
+            if not r or '' in r:
+                return exact, None
+            required |= r
+        return exact, required
+    if name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT'):
+        low, high, item = av
+        if low == high == 1:
+            return _literal_factors(item)
+        return None, (_literal_factors(item)[1] if low >= 1 else None)
+    if name in ('AT', 'ASSERT', 'ASSERT_NOT'):
+        return {''}, None
+    return None, None
+
+
+def required_literals(regex):
+    """
+    Lowercase literals, one of which must appear in any line the regex matches
+    (case-insensitively). Returns None when the rule has no selective literal.
+    """
+    try:
+        _, literals = _literal_factors(sre_parse.parse(regex, re.IGNORECASE))
+    except (re.error, RecursionError):
+        return None
+    if not literals or min(len(s) for s in literals) < MIN_PREFILTER_LENGTH:
+        return None
+    if not all(s.isascii() for s in literals):
+        return None
+    return tuple(sorted(literals))
+
+
+# Characters the Rust regex syntax (used by rg) treats as meta and allows escaping
+RUST_META_CHARACTERS = set('\\.+*?()|[]{}^$#&-~')
+RUST_CATEGORIES = {
+    'CATEGORY_DIGIT': r'\d', 'CATEGORY_NOT_DIGIT': r'\D',
+    'CATEGORY_SPACE': r'\s', 'CATEGORY_NOT_SPACE': r'\S',
+    'CATEGORY_WORD': r'\w', 'CATEGORY_NOT_WORD': r'\W',
+}
+RUST_REPEATS = {(0, sre_parse.MAXREPEAT): '*', (1, sre_parse.MAXREPEAT): '+', (0, 1): '?'}
+RUST_ANCHORS = {'AT_BEGINNING': '^', 'AT_END': '$', 'AT_BOUNDARY': r'\b', 'AT_NON_BOUNDARY': r'\B'}
+
+
+class UnsupportedSyntax(Exception):
+    """A regex construct with no Rust regex equivalent (lookaround, backreferences, ...)"""
+
+
+def _rust_char(code):
+    char = chr(code)
+    if char in RUST_META_CHARACTERS:
+        return '\\' + char
+    return char if char.isprintable() else '\\x{{{:x}}}'.format(code)
+
+
+def _rust_sequence(parsed):
+    return ''.join(_rust_node(op, av) for op, av in parsed)
+
+
+def _rust_node(op, av):
+    name = str(op)
+    if name == 'LITERAL':
+        return _rust_char(av)
+    if name == 'NOT_LITERAL':
+        return '[^{}]'.format(_rust_char(av))
+    if name == 'ANY':
+        return '.'
+    if name == 'IN':
+        items = []
+        for item_op, item_av in av:
+            item_name = str(item_op)
+            if item_name == 'NEGATE':
+                items.insert(0, '^')
+            elif item_name == 'LITERAL':
+                items.append(_rust_char(item_av))
+            elif item_name == 'RANGE':
+                items.append('{}-{}'.format(_rust_char(item_av[0]), _rust_char(item_av[1])))
+            elif item_name == 'CATEGORY':
+                items.append(RUST_CATEGORIES[str(item_av)])
+            else:
+                raise UnsupportedSyntax(item_name)
+        if len(items) == 1 and items[0] in RUST_CATEGORIES.values():
+            return items[0]
+        return '[{}]'.format(''.join(items))
+    if name == 'BRANCH':
+        return '(?:{})'.format('|'.join(_rust_sequence(branch) for branch in av[1]))
+    if name == 'SUBPATTERN':
+        _, add_flags, del_flags, parsed = av
+        if add_flags or del_flags:
+            raise UnsupportedSyntax('inline flags')
+        return '(?:{})'.format(_rust_sequence(parsed))
+    if name in ('MAX_REPEAT', 'MIN_REPEAT'):
+        low, high, item = av
+        if (low, high) in RUST_REPEATS:
+            bounds = RUST_REPEATS[(low, high)]
+        elif high == sre_parse.MAXREPEAT:
+            bounds = '{{{},}}'.format(low)
+        else:
+            bounds = '{{{},{}}}'.format(low, high)
+        return '(?:{}){}{}'.format(_rust_sequence(item), bounds, '?' if name == 'MIN_REPEAT' else '')
+    if name == 'AT' and str(av) in RUST_ANCHORS:
+        return RUST_ANCHORS[str(av)]
+    raise UnsupportedSyntax(name)
+
+
+def ripgrep_pattern(regex):
+    """
+    An rg (Rust regex) pattern matching at least every line `regex` matches.
+    Rules translate directly when they can; rules using lookaround or other
+    Python-only syntax fall back to their required literals, which every
+    matching line contains. Candidates are always confirmed with `re`, so a
+    broader pattern only costs extra candidate lines. None if neither works.
+    """
+    try:
+        return _rust_sequence(sre_parse.parse(regex, re.IGNORECASE))
+    except (UnsupportedSyntax, KeyError, re.error, RecursionError):
+        pass
+    literals = required_literals(regex)
+    if not literals:
+        return None
+    return '|'.join(''.join(_rust_char(ord(c)) for c in literal) for literal in literals)
+
+
+class LineIndex:
+    """
+    Newline offsets of a text or bytes buffer, used to turn match offsets into
+    1-based line numbers with a bisect. Built on the first lookup, so files
+    without matches never pay for it.
+    """
+
+    def __init__(self, buffer, newline):
+        self.buffer = buffer
+        self.newline = newline
+        self._offsets = None
+
+    def _build(self):
+        offsets = array('q')
+        find = self.buffer.find
+        pos = find(self.newline)
+        while pos != -1:
+            offsets.append(pos)
+            pos = find(self.newline, pos + 1)
+        self._offsets = offsets
+
+    def line_number(self, offset: int) -> int:
+        if self._offsets is None:
+            self._build()
+        return bisect_left(self._offsets, offset) + 1
+
+    def bounds(self, line_number: int):
+        """(start, end) offsets of a line, excluding its newline"""
+        if self._offsets is None:
+            self._build()
+        start = self._offsets[line_number - 2] + 1 if line_number > 1 else 0
+        end = self._offsets[line_number - 1] if line_number <= len(self._offsets) else len(self.buffer)
+        return start, end
+
+
+# -----------------------------
+# RULE PACK
+# -----------------------------
+def validate_rules(rules):
+    for pattern_name, config in rules.items():
+        require(isinstance(config, dict), RULE_PACK, pattern_name, "not a table")
+        require(isinstance(config.get('keyword'), str) and config['keyword'], RULE_PACK, pattern_name, "missing keyword")
+        require(config.get('severity') in SEVERITIES, RULE_PACK, pattern_name,
+                "severity must be one of {}".format(SEVERITIES))
+        require(isinstance(config.get('regex'), str), RULE_PACK, pattern_name, "missing regex")
+        try:
+            re.compile(config['regex'], re.IGNORECASE | re.MULTILINE)
+        except re.error as e:
+            require(False, RULE_PACK, pattern_name, "regex does not compile: {}".format(e))
+
+
+def compile_rule_tables(rules):
+    """Per-rule literal prefilters, backtracking risks and rg translations, stored in the artifact"""
+    return {
+        'prefilters': {name: required_literals(config['regex']) for name, config in rules.items()},
+        'risks': {name: backtracking_risks(config['regex']) for name, config in rules.items()},
+        'ripgrep': {name: ripgrep_pattern(config['regex']) for name, config in rules.items()},
+    }
+
+
+def load_regex_rules(path=None):
+    return load_rule_pack(
+        RULE_PACK, validate_rules, compile_rule_tables,
+        compiler_key=source_fingerprint(sys.modules[__name__], regex_guard), path=path,
+    )
+
+
 class RegexAnalyzer:
     """Pattern-based security vulnerability detection"""
     
-    def __init__(self):
-        self.patterns = self._load_patterns()
+    cache_name = 'regex'
+    
+    def __init__(self, workers=1, min_shard_files=DEFAULT_MIN_FILES, cache=None,
+                 scan_mode='line', mmap_min_bytes=DEFAULT_MMAP_MIN_BYTES, backend='python', guard=None,
+                 rule_pack_path=None):
+        if scan_mode not in SCAN_MODES:
+            raise ValueError("Unknown regex scan mode '{}' (expected one of {})".format(scan_mode, SCAN_MODES))
+        if backend not in BACKENDS:
+            raise ValueError("Unknown regex backend '{}' (expected one of {})".format(backend, BACKENDS))
+        self.runner = ShardedFileRunner(workers, min_shard_files, cache)
+        self.scan_mode = scan_mode
+        self.mmap_min_bytes = mmap_min_bytes
+        self.guard = guard if guard is not None else RegexGuard()
+        self.rule_pack = load_regex_rules(rule_pack_path)
+        self.patterns = self.rule_pack.rules
+        self.guard.risky_rules = self._lint_patterns(self.rule_pack.tables['risks'])
+        self.compiled_patterns = self._compile_patterns(self.patterns)
+        self.bytes_patterns = self._compile_bytes_patterns(self.patterns) if scan_mode == 'buffer' else None
+        self.prefilters = self.rule_pack.tables['prefilters']
+        # Buffer mode can report matches line mode cannot, so cached results are kept apart
+        self.ruleset_version = ruleset_version(
+            self.cache_name, self.rule_pack.content_hash, scan_mode, self.guard.settings()
+        )
+        self.backend = backend
+        self.ripgrep_patterns = self._ripgrep_patterns() if backend == 'ripgrep' else None
     
-    def analyze(self, repo_path):
+    def cache_identity(self):
+        """Findings-cache key: any change to the patterns invalidates cached results"""
+        return self.cache_name, self.ruleset_version
+    
+    def analyze(self, repo_path, repo_index=None):
         """Run regex analysis on all Python files"""
-        findings = []
-        
-        for root, dirs, files in os.walk(repo_path):
-            for file in files:
-                if file.endswith('.py'):
-                    file_path = os.path.join(root, file)
-                    file_findings = self._analyze_file(file_path, repo_path)
-                    findings.extend(file_findings)
-        
+        findings = list(self.iter_findings(repo_path, repo_index))
         logger.info("RegexAnalyzer found {} findings".format(len(findings)))
         return findings
     
-    def _analyze_file(self, file_path, repo_path):
+    def iter_findings(self, repo_path, repo_index=None):
+        """Findings in file order, yielded as each file is scanned"""
+        if repo_index is None:
+            repo_index = RepoIndex(repo_path)
+        self.guard.reset()
+        
+        ripgrep = self._ripgrep(repo_index.repo_path)
+        if ripgrep is not None:
+            try:
+                # One rg run covers every file, so its results arrive all at once
+                findings = self.runner.run(
+                    self, repo_index, repo_index.iter_files(language='python'),
+                    batch=partial(self._ripgrep_files, ripgrep)
+                )
+            except RuntimeError as e:
+                logger.warning("ripgrep backend failed, falling back to the Python engine: {}".format(e))
+            else:
+                yield from findings
+                return
+        
+        yield from self.runner.iter_run(self, repo_index, repo_index.iter_files(language='python'))
+    
+    def _ripgrep(self, repo_path):
+        """RipGrep for this scan, or None when the Python engine should run instead"""
+        if not self.ripgrep_patterns:
+            return None
+        if self.scan_mode != 'line':
+            logger.info("ripgrep backend only supports line scans; using the Python engine")
+            return None
+        try:
+            return RipGrep(repo_path)
+        except RuntimeError as e:
+            logger.info("ripgrep unavailable, using the Python engine: {}".format(e))
+            return None
+    
+    def _ripgrep_patterns(self):
+        patterns = []
+        for pattern_name, pattern in self.rule_pack.tables['ripgrep'].items():
+            if pattern is None:
+                logger.warning("Rule '{}' has no rg equivalent; the ripgrep backend is disabled".format(pattern_name))
+                return None
+            patterns.append(pattern)
+        return patterns
+    
+    def _ripgrep_files(self, ripgrep, rel_paths, repo_index):
+        """
+        Batch entry point for the runner: one rg run finds every line any rule
+        could match, then each candidate line is confirmed per rule with `re`,
+        under the same file and rule time budgets as the Python engine.
+        Findings come out in the same order and shape as the Python engine's.
+        """
+        candidates = {rel_path: [] for rel_path in rel_paths}
+        for rel_path, line_number, line in ripgrep.match_lines(self.ripgrep_patterns, rel_paths):
+            candidates.setdefault(rel_path, []).append((line_number, line))
+        
+        cap = self.guard.max_line_length
+        by_file = {}
+        for rel_path, lines in candidates.items():
+            findings = by_file[rel_path] = []
+            if not lines:
+                continue
+            if cap and any(len(line) > cap for _, line in lines):
+                self.guard.record_truncated(rel_path)
+            started = time.perf_counter()
+            for pattern_name, (_, line_regex) in self.compiled_patterns.items():
+                if self.guard.file_over_budget(started):
+                    self.guard.record_skipped(rel_path, "file time budget exhausted before rule '{}'".format(pattern_name))
+                    break
+                config = self.patterns[pattern_name]
+                matches = (
+                    (line_number, line) for line_number, line in lines
+                    if line_regex.search(line[:cap] if cap else line)
+                )
+                for line_number, line in self._budgeted(rel_path, pattern_name, matches):
+                    findings.append(Finding(
+                        config['keyword'], rel_path, line_number, config['severity'], 'regex',
+                        confidence='MEDIUM', snippet=line.strip()[:MAX_SNIPPET_LENGTH], pattern_name=pattern_name
+                    ))
+        return by_file
+    
+    def _analyze_file(self, rel_path, repo_index):
         """Analyze single file"""
         findings = []
         
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-                lines = content.split('\n')
+            indexed = repo_index.get(rel_path)
+            if self.bytes_patterns and indexed is not None and indexed.size >= self.mmap_min_bytes:
+                return self._analyze_mapped(rel_path, indexed.abs_path)
             
-            for pattern_name, config in self.patterns.items():
-                regex = config['regex']
-                
-                for i, line in enumerate(lines, 1):
-                    if re.search(regex, line, re.IGNORECASE):
-                        finding = {
-                            'shortform_keyword': config['keyword'],
-                            'file_path': os.path.relpath(file_path, repo_path),
-                            'line_number': i,
-                            'severity': config['severity'],
-                            'context_snippet': line.strip()[:300],
-                            'source': 'regex',
-                            'pattern_name': pattern_name,
-                            'confidence': 'MEDIUM'
-                        }
-                        findings.append(finding)
+            content = repo_index.read_text(rel_path)
+            capped = self.guard.has_long_lines(content)
+            if capped:
+                self.guard.record_truncated(rel_path)
+            lines = LineIndex(content, '\n') if self.scan_mode == 'buffer' and not capped else None
+            
+            # Case-insensitive literal checks are only exact on ASCII text
+            folded = content.lower() if content.isascii() else None
+            
+            started = time.perf_counter()
+            for pattern_name, (buffer_regex, line_regex) in self.compiled_patterns.items():
+                literals = self.prefilters[pattern_name]
+                if folded is not None and literals and not any(lit in folded for lit in literals):
+                    continue
+                if self.guard.file_over_budget(started):
+                    self.guard.record_skipped(rel_path, "file time budget exhausted before rule '{}'".format(pattern_name))
+                    break
+                config = self.patterns[pattern_name]
+                if capped:
+                    matches = self._capped_lines(content, line_regex, '\n')
+                elif lines is None:
+                    matches = self._matching_lines(content, buffer_regex, line_regex)
+                else:
+                    matches = self._buffer_matches(content, buffer_regex, lines)
+                for i, line_start, line_end in self._budgeted(rel_path, pattern_name, matches):
+                    # The snippet (the stripped line) is kept as a span into the file's text
+                    offset, length = self._snippet_span(content, line_start, line_end)
+                    findings.append(Finding.with_span(
+                        config['keyword'], rel_path, i, config['severity'], 'regex',
+                        offset, length, confidence='MEDIUM', pattern_name=pattern_name
+                    ))
         
         except Exception as e:
             logger.warning("Error in regex analysis: {}".format(str(e)))
         
         return findings
     
-    def _load_patterns(self):
-        """Load all 35 regex patterns"""
-        return {
-            'sql_injection': {
-            'keyword': 'SQL-INJECTION-REGEX',
-            'severity': 'HIGH',
-            'regex': r'execute\s*\(\s*f["\']|\.execute\s*\(".*"\s*\+\s*|execute\s*\(".*%s"\s*%\s*'
-        },
-        'nosql_injection': {
-            'keyword': 'NOSQL-INJECTION',
-            'severity': 'HIGH',
-            'regex': r'\.find\s*\(\s*\{.*[\$where|mapReduce|group].*\}|\.collection\s*\(\s*["\'].*\+.*["\']'
-        },
-        'ldap_injection': {
-            'keyword': 'LDAP-INJECTION',
-            'severity': 'HIGH',
-            'regex': r'ldap\.search_s\s*\(.*,\s*ldap\.SCOPE_SUBTREE,\s*f["\']'
-        },
-        'xss_template': {
-            'keyword': 'XSS-UNESC-OUTPUT',
-            'severity': 'HIGH',
-            'regex': r'render_template_string\s*\(|Markup\s*\(.*request\.'
-        },
-
-        # === Authentication & Session Management ===
-        'weak_password_hash': {
-            'keyword': 'WEAK-CRYPTO-HASH',
-            'severity': 'MEDIUM',
-            'regex': r'hashlib\.md5|hashlib\.sha1'
-        },
-        'insecure_token_generation': {
-            'keyword': 'INSECURE-RANDOMNESS',
-            'severity': 'LOW',
-            'regex': r'random\.randint|random\.random'
-        },
-        'missing_httponly_cookie': {
-            'keyword': 'MISSING-COOKIE-HTTPONLY',
-            'severity': 'MEDIUM',
-            'regex': r'\.set_cookie\s*\(.*httponly\s*=\s*False'
-        },
-        'missing_secure_cookie': {
-            'keyword': 'MISSING-COOKIE-SECURE',
-            'severity': 'MEDIUM',
-            'regex': r'\.set_cookie\s*\(.*secure\s*=\s*False'
-        },
-        'session_fixation': {
-            'keyword': 'SESSION-FIXATION',
-            'severity': 'MEDIUM',
-            'regex': r'session\.regenerate\s*\(\s*\)' # This would be a check for the ABSENCE of this, best handled by AST or manual review
-        },
-
-        # === Insecure Configuration & Deployment ===
-        'debug_mode_enabled': {
-            'keyword': 'DEBUG-MODE-ENABLED',
-            'severity': 'HIGH',
-            'regex': r'app\.run\s*\(.*debug\s*=\s*True'
-        },
-        'verbose_error_message': {
-            'keyword': 'SENSITIVE-DATA-EXPOSURE-IN-ERROR',
-            'severity': 'LOW',
-            'regex': r'return\s+.*str\(\s*e\s*\)'
-        },
-        'weak_ssl_tls': {
-            'keyword': 'WEAK-SSL-TLS',
-            'severity': 'HIGH',
-            'regex': r'ssl\.CERT_NONE|requests\..*\(\s*.*verify\s*=\s*False'
-        },
-        'missing_security_headers': {
-            'keyword': 'MISSING-SECURITY-HEADERS',
-            'severity': 'LOW',
-            'regex': r'@app\.after_request' # Absence of this is the indicator
-        },
-
-        # === Cryptography & Secrets Management ===
-        'hardcoded_secret': {
-            'keyword': 'HARDCODED-SECRET',
-            'severity': 'CRITICAL',
-            'regex': r'(password|passwd|pwd|secret|api_key|apikey|token)\s*=\s*["\'][^"\']{8,}["\']'
-        },
-        'hardcoded_encryption_key': {
-            'keyword': 'HARDCODED-ENCRYPTION-KEY',
-            'severity': 'CRITICAL',
-            'regex': r'(encryption_key|cipher_key|aes_key)\s*=\s*["\'].*["\']'
-        },
-        'ecb_mode_usage': {
-            'keyword': 'WEAK-CRYPTO-ECB',
-            'severity': 'HIGH',
-            'regex': r'AES\.MODE_ECB'
-        },
-        'exposed_api_key_in_code': {
-            'keyword': 'EXPOSED-API-KEY',
-            'severity': 'CRITICAL',
-            'regex': r'["\'](AIza[0-9A-Za-z-_]{35}|sk-[0-9a-zA-Z]{48})["\']' # Common Google/OpenAI patterns
-        },
-        
-        # === Command & Deserialization Vulnerabilities ===
-        'shell_true': {
-            'keyword': 'SUBPROCESS-SHELL-TRUE',
-            'severity': 'HIGH',
-            'regex': r'subprocess\.(run|call|Popen).*shell\s*=\s*True|os\.system\s*\('
-        },
-        'pickle_unsafe': {
-            'keyword': 'PICKLE-UNSAFE',
-            'severity': 'HIGH',
-            'regex': r'pickle\.loads?\s*\(|marshal\.loads?\s*\('
-        },
-        'yaml_unsafe': {
-            'keyword': 'YAML-LOAD-UNSAFE',
-            'severity': 'HIGH',
-            'regex': r'yaml\.load\s*\((?!.*Loader=)' # Looks for yaml.load without a specified Loader
-        },
-        'eval_usage': {
-            'keyword': 'EVAL-EXEC-USE',
-            'severity': 'CRITICAL',
-            'regex': r'\beval\s*\(|\bexec\s*\('
-        },
-        'xxe_patterns': {
-            'keyword': 'XXE-VULNERABILITY',
-            'severity': 'HIGH',
-            'regex': r'xml\.etree\.ElementTree\.parse|lxml\.etree\.parse'
-        },
-
-        # === Server-Side & Data Handling Vulnerabilities ===
-        'ssrf_patterns': {
-            'keyword': 'SSRF-VULNERABILITY',
-            'severity': 'HIGH',
-            'regex': r'requests\.(get|post)\s*\(.*request\..*\)'
-        },
-        'sensitive_data_in_logs': {
-            'keyword': 'SENSITIVE-DATA-IN-LOGS',
-            'severity': 'MEDIUM',
-            'regex': r'logger\.(info|debug)\s*\(.*(password|credit_card|ssn).*'
-        },
-        'unsafe_redirect': {
-            'keyword': 'UNSAFE-REDIRECT',
-            'severity': 'MEDIUM',
-            'regex': r'redirect\s*\(\s*request\.'
-        },
-        'exposed_internal_ip': {
-            'keyword': 'EXPOSED-INTERNAL-IP',
-            'severity': 'LOW',
-            'regex': r'["\'](192\.168\.[0-9]+\.[0-9]+|10\.[0-9]+\.[0-9]+\.[0-9]+|172\.(1[6-9]|2[0-9]|3[0-1])\.[0-9]+\.[0-9]+)["\']'
-        },
-
-        # === General Python & Web Security ===
-        'csrf_protection_missing': {
-            'keyword': 'CSRF-PROTECTION-MISSING',
-            'severity': 'MEDIUM',
-            'regex': r'app\.config\[\s*["\']WTF_CSRF_ENABLED["\']\s*\]\s*=\s*False'
-        },
-        'insecure_tempfile': {
-            'keyword': 'INSECURE-TEMPFILE',
-            'severity': 'MEDIUM',
-            'regex': r'/tmp/|tempfile\.mktemp\('
-        },
-        'unsafe_assert': {
-            'keyword': 'UNSAFE-ASSERT',
-            'severity': 'LOW',
-            'regex': r'assert\s+.*request\.'
-        },
-        'unsafe_getattr': {
-            'keyword': 'UNSAFE-GETATTR',
-            'severity': 'HIGH',
-            'regex': r'getattr\s*\(.*,\s*request\.'
-        },
-        'monkey_patching': {
-            'keyword': 'MONKEY-PATCHING',
-            'severity': 'LOW',
-            'regex': r'\w+\.\w+\s*=\s*\w+'
-        },
-        'missing_rate_limiting': {
-            'keyword': 'MISSING-RATE-LIMITING',
-            'severity': 'LOW',
-            'regex': r'@limiter\.limit' # Absence is the indicator
-        },
-        'missing_dnssec': {
-            'keyword': 'DNSSEC-NOT-ENABLED',
-            'severity': 'INFO',
-            'regex': r'# placeholder: no reliable regex for python code'
-        },
-        'unsafe_input_usage': {
-            'keyword': 'UNSAFE-INPUT-USAGE',
-            'severity': 'HIGH',
-            'regex': r'\binput\s*\('
-        }
-        }
-# Additional patterns can be added here 
\ No newline at end of file
+    def _analyze_mapped(self, rel_path, abs_path):
+        """
+        Buffer-mode scan of a large file as bytes over an mmap: the file is never
+        decoded or copied into memory as a whole. Snippets are decoded per match.
+        """
+        findings = []
+        with open(abs_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            capped = self.guard.has_long_lines(buffer)
+            if capped:
+                self.guard.record_truncated(rel_path)
+            lines = LineIndex(buffer, b'\n')
+            started = time.perf_counter()
+            for pattern_name, regex in self.bytes_patterns.items():
+                if self.guard.file_over_budget(started):
+                    self.guard.record_skipped(rel_path, "file time budget exhausted before rule '{}'".format(pattern_name))
+                    break
+                config = self.patterns[pattern_name]
+                if capped:
+                    matches = self._capped_lines(buffer, regex, b'\n')
+                else:
+                    matches = self._buffer_matches(buffer, regex, lines)
+                for i, line_start, line_end in self._budgeted(rel_path, pattern_name, matches):
+                    line = buffer[line_start:line_end].decode('utf-8', errors='ignore')
+                    findings.append(Finding(
+                        config['keyword'], rel_path, i, config['severity'], 'regex',
+                        confidence='MEDIUM', snippet=line.strip()[:MAX_SNIPPET_LENGTH], pattern_name=pattern_name
+                    ))
+        return findings
+    
+    def _budgeted(self, rel_path, pattern_name, matches):
+        """Pass a rule's matches through until its time budget for this file runs out"""
+        started = time.perf_counter()
+        try:
+            for match in matches:
+                yield match
+                if self.guard.rule_over_budget(started):
+                    self.guard.record_skipped(
+                        rel_path, "rule '{}' exceeded its {}s budget".format(pattern_name, self.guard.rule_budget)
+                    )
+                    return
+        finally:
+            self.guard.add_rule_time(pattern_name, time.perf_counter() - started)
+    
+    def _capped_lines(self, buffer, regex, newline):
+        """
+        Yield (line_number, line_start, line_end) for every line whose first
+        `max_line_length` characters the rule matches. Used for files with
+        over-long lines (minified or generated code), where a search over the
+        full line could backtrack for a very long time.
+        """
+        cap = self.guard.max_line_length
+        size = len(buffer)
+        pos = 0
+        line_number = 1
+        while pos <= size:
+            line_end = buffer.find(newline, pos)
+            if line_end == -1:
+                line_end = size
+            if regex.search(buffer[pos:min(line_end, pos + cap)]):
+                yield line_number, pos, line_end
+            pos = line_end + 1
+            line_number += 1
+    
+    def _snippet_span(self, content, line_start, line_end):
+        """(offset, length) of the stripped line, capped like the snippets always were"""
+        line = content[line_start:line_end]
+        stripped = line.lstrip()
+        return line_start + len(line) - len(stripped), min(len(stripped.rstrip()), MAX_SNIPPET_LENGTH)
+    
+    def _buffer_matches(self, buffer, regex, lines):
+        """
+        Yield (line_number, line_start, line_end) for the line each match starts
+        on, searching the whole buffer so matches may run across lines. A line
+        is reported once per rule, like in line mode.
+        """
+        pos = 0
+        size = len(buffer)
+        while pos <= size:
+            match = regex.search(buffer, pos)
+            if not match:
+                return
+            line_number = lines.line_number(match.start())
+            line_start, line_end = lines.bounds(line_number)
+            yield line_number, line_start, line_end
+            pos = max(line_end + 1, match.end())
+    
+    def _matching_lines(self, content, buffer_regex, line_regex):
+        """
+        Yield (line_number, line_start, line_end) for every line the rule matches.
+        The buffer-level search skips straight to candidate lines, so a rule that
+        never fires costs a single C-level scan of the file instead of a Python
+        loop over every line. Candidates are confirmed against the line alone,
+        which keeps results identical to line-by-line matching.
+        """
+        pos = 0
+        line_number = 1
+        counted_to = 0
+        while True:
+            match = buffer_regex.search(content, pos)
+            if not match:
+                return
+            line_start = content.rfind('\n', 0, match.start()) + 1
+            line_end = content.find('\n', match.start())
+            if line_end == -1:
+                line_end = len(content)
+            line_number += content.count('\n', counted_to, line_start)
+            counted_to = line_start
+            line = content[line_start:line_end]
+            if line_regex.search(line):
+                yield line_number, line_start, line_end
+            pos = line_end + 1
+            if pos > len(content):
+                return
+    
+    def _compile_patterns(self, patterns):
+        """
+        Compile every rule once: a multiline variant for buffer scans and a
+        per-line confirm. With the guard's linear engine enabled, rules RE2 can
+        express are compiled with it instead.
+        """
+        compiled = {}
+        self.guard.linear_rules = []
+        for pattern_name, config in patterns.items():
+            if self.guard.linear_engine:
+                linear = (compile_linear(config['regex'], multiline=True), compile_linear(config['regex']))
+                if all(linear):
+                    compiled[pattern_name] = linear
+                    self.guard.linear_rules.append(pattern_name)
+                    continue
+            compiled[pattern_name] = (
+                re.compile(config['regex'], re.IGNORECASE | re.MULTILINE),
+                re.compile(config['regex'], re.IGNORECASE)
+            )
+        if self.guard.linear_engine and not self.guard.linear_rules:
+            logger.warning("Linear regex engine requested but RE2 is unavailable (pip install google-re2)")
+        return compiled
+    
+    def __getstate__(self):
+        # RE2 objects may not pickle; workers recompile the rules instead
+        state = self.__dict__.copy()
+        state['compiled_patterns'] = None
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.compiled_patterns = self._compile_patterns(self.patterns)
+    
+    def _lint_patterns(self, risks_by_rule):
+        """Rules whose structure risks catastrophic backtracking, with the reasons"""
+        risky = {}
+        for pattern_name, risks in risks_by_rule.items():
+            if risks:
+                risky[pattern_name] = risks
+                logger.warning("Regex rule '{}' may backtrack heavily: {}".format(pattern_name, '; '.join(risks)))
+        return risky
+    
+    def _compile_bytes_patterns(self, patterns):
+        """Bytes variants for mmap scans; None (no mmap scanning) if any rule cannot be compiled as bytes"""
+        try:
+            return {
+                pattern_name: re.compile(config['regex'].encode('utf-8'), re.IGNORECASE | re.MULTILINE)
+                for pattern_name, config in patterns.items()
+            }
+        except re.error as e:
+            logger.warning("Regex rules cannot run over bytes, large files will be decoded instead: {}".format(e))
+            return None
@@ -0,0 +1,316 @@
+import re
+import sys
+import math
+import logging
+from collections import Counter
+from typing import Dict, List, NamedTuple
+
+try:
+    import numpy as np
+except ImportError:  # entropy is then scored one token at a time
+    np = None
+
+from analysis_engine.analyzers.regex_analyzer import SEVERITIES, LineIndex
+from analysis_engine.utils.findings import MAX_SNIPPET_LENGTH, Finding
+from analysis_engine.utils.findings_cache import ruleset_version
+from analysis_engine.utils.repo_index import RepoIndex
+from analysis_engine.utils.rule_packs import load_rule_pack, require, source_fingerprint
+from analysis_engine.utils.sharding import ShardedFileRunner
+
+logger = logging.getLogger(__name__)
+
+# Rule pack holding the credential formats (analysis_engine/rules/secrets.json)
+RULE_PACK = 'secrets'
+# Candidate tokens: runs of base64 / base64url characters, padding included
+TOKEN = re.compile(r'[A-Za-z0-9+/_\-]{16,}={0,2}')
+# Longer runs are encoded blobs (images, fixtures), not credentials
+MAX_TOKEN_LENGTH = 512
+# Tokens scored per vectorized batch; bounds the (tokens x 128) count table
+DEFAULT_BATCH_TOKENS = 8192
+# Head of a file checked for NUL bytes to skip binary files
+BINARY_SNIFF_CHARS = 8192
+
+# Character classes, OR-ed per token
+LOWER, UPPER, DIGIT = 1, 2, 4
+MIXED = LOWER | UPPER | DIGIT
+CHAR_CLASSES = bytes(
+    LOWER if 97 <= code <= 122 else UPPER if 65 <= code <= 90 else DIGIT if 48 <= code <= 57 else 0
+    for code in range(256)
+)
+
+# Shannon entropy (bits per character) a value assigned to a secret-named key must reach
+KEYED_MIN_ENTROPY = 3.0
+# Unnamed string literals must look random: mixed case and digits, near-maximal entropy
+MIN_RANDOM_LENGTH = 20
+RANDOM_MIN_ENTROPY = 4.5
+# Short tokens cannot reach 4.5 bits; they need this share of log2(length) instead
+RANDOM_ENTROPY_RATIO = 0.9
+
+# A secret-named key immediately before the token (`api_key = "`, `"token": "`, `Authorization: Bearer `)
+KEY_CONTEXT = re.compile(
+    r'(?:passw(?:or)?d|pwd|secret|token|api[_-]?key|access[_-]?key|private[_-]?key|credentials?|auth)'
+    r'[\w.\-]*["\'\]]?\s*(?::=|=>|[:=])\s*["\'`]?\s*(?:(?:bearer|basic|token)\s+)?$',
+    re.IGNORECASE
+)
+# Lines whose random-looking strings are hashes, ids or inline data
+IGNORED_CONTEXT = re.compile(r'sha\d|hash|digest|checksum|integrity|fingerprint|nonce|uuid|base64,', re.IGNORECASE)
+# Documentation and test values, and alphabets, that are not live credentials
+PLACEHOLDER = re.compile(r'example|sample|dummy|placeholder|changeme|redacted|xxxx|fake|test|abcdefg|0123456', re.IGNORECASE)
+QUOTES = '"\'`'
+PRIVATE_KEY = re.compile(r'-----BEGIN (?:[A-Z0-9]+ )*PRIVATE KEY(?: BLOCK)?-----')
+
+
+def validate_rules(rules):
+    for name, config in rules.items():
+        require(isinstance(config, dict), RULE_PACK, name, "not a table")
+        require(isinstance(config.get('keyword'), str) and config['keyword'], RULE_PACK, name, "missing keyword")
+        require(config.get('severity') in SEVERITIES, RULE_PACK, name, "severity must be one of {}".format(SEVERITIES))
+        prefixes = config.get('prefixes')
+        require(isinstance(prefixes, list) and prefixes, RULE_PACK, name, "missing prefixes")
+        for prefix in prefixes:
+            require(isinstance(prefix, str) and len(prefix) >= 2 and TOKEN.fullmatch(prefix.ljust(16, 'A')),
+                    RULE_PACK, name, "prefix {!r} cannot start a candidate token".format(prefix))
+        require(isinstance(config.get('regex'), str), RULE_PACK, name, "missing regex")
+        try:
+            re.compile(config['regex'])
+        except re.error as e:
+            require(False, RULE_PACK, name, "regex does not compile: {}".format(e))
+
+
+def compile_rule_tables(rules):
+    """One alternation naming each format, and the two-character token heads that select it"""
+    return {
+        'formats': '|'.join('(?P<{}>{})'.format(name, config['regex']) for name, config in rules.items()),
+        'heads': sorted({prefix[:2] for config in rules.values() for prefix in config['prefixes']}),
+    }
+
+
+def load_secret_rules(path=None):
+    return load_rule_pack(
+        RULE_PACK, validate_rules, compile_rule_tables,
+        compiler_key=source_fingerprint(sys.modules[__name__]), path=path,
+    )
+
+
+class ScannedText(NamedTuple):
+    rel_path: str
+    text: str
+    lines: LineIndex
+
+
+def _head_code(token: str) -> int:
+    return ord(token[0]) << 8 | ord(token[1])
+
+
+class TokenScores:
+    """Per-token verdicts of one batch; only `candidates()` are looked at again"""
+
+    __slots__ = ('entropy', 'formatted', 'keyed', 'random')
+
+    def __init__(self, entropy, formatted, keyed, random):
+        self.entropy = entropy
+        self.formatted = formatted
+        self.keyed = keyed
+        self.random = random
+
+    def candidates(self) -> List[int]:
+        if np is not None and isinstance(self.entropy, np.ndarray):
+            return np.flatnonzero(self.formatted | self.keyed | self.random).tolist()
+        return [i for i in range(len(self.entropy)) if self.formatted[i] or self.keyed[i] or self.random[i]]
+
+
+def score_tokens_vectorized(tokens: List[str], heads) -> TokenScores:
+    """
+    Entropy, character classes and format heads of a batch of ASCII tokens
+    in a handful of array operations over the tokens concatenated into one
+    byte buffer. Entropy is log2(L) - sum(n * log2 n) / L over a token's
+    character counts n; the sum equals log2(count of the byte) added up over
+    the token's bytes, so one bincount of (token, byte) cells and one
+    segmented sum give every token's entropy without a per-token loop.
+    """
+    count = len(tokens)
+    lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=count)
+    codes = np.frombuffer(''.join(tokens).encode('ascii'), dtype=np.uint8)
+    starts = np.cumsum(lengths) - lengths
+
+    cells = np.repeat(np.arange(count) * 128, lengths) + codes
+    counts = np.bincount(cells, minlength=count * 128)
+    entropy = np.log2(lengths) - np.add.reduceat(np.log2(counts[cells]), starts) / lengths
+
+    classes = np.bitwise_or.reduceat(np.frombuffer(CHAR_CLASSES, dtype=np.uint8)[codes], starts)
+    head_codes = codes[starts].astype(np.uint16) << 8 | codes[starts + 1]
+
+    scored = lengths <= MAX_TOKEN_LENGTH
+    formatted = scored & np.isin(head_codes, heads)
+    keyed = scored & (entropy >= KEYED_MIN_ENTROPY) & ((classes & DIGIT) != 0) & ((classes & (LOWER | UPPER)) != 0)
+    random = (
+        scored & (lengths >= MIN_RANDOM_LENGTH) & ((classes & MIXED) == MIXED)
+        & (entropy >= np.minimum(RANDOM_MIN_ENTROPY, RANDOM_ENTROPY_RATIO * np.log2(lengths)))
+    )
+    return TokenScores(entropy, formatted, keyed, random)
+
+
+def score_tokens(tokens: List[str], heads) -> TokenScores:
+    """Same verdicts as `score_tokens_vectorized`, computed token by token"""
+    heads = set(heads)
+    entropy, formatted, keyed, random = [], [], [], []
+    for token in tokens:
+        length = len(token)
+        bits = math.log2(length) - sum(n * math.log2(n) for n in Counter(token).values()) / length
+        classes = 0
+        for value in set(token.encode('ascii').translate(CHAR_CLASSES)):
+            classes |= value
+        scored = length <= MAX_TOKEN_LENGTH
+        entropy.append(bits)
+        formatted.append(scored and _head_code(token) in heads)
+        keyed.append(scored and bits >= KEYED_MIN_ENTROPY and bool(classes & DIGIT) and bool(classes & (LOWER | UPPER)))
+        random.append(
+            scored and length >= MIN_RANDOM_LENGTH and classes & MIXED == MIXED
+            and bits >= min(RANDOM_MIN_ENTROPY, RANDOM_ENTROPY_RATIO * math.log2(length))
+        )
+    return TokenScores(entropy, formatted, keyed, random)
+
+
+def _redact(line: str, column: int, token: str) -> str:
+    """The line up to the token's first characters; the rest of the value may hold more of the secret"""
+    return line[:column] + token[:4] + '*' * 8
+
+
+class SecretsAnalyzer:
+    """
+    Hardcoded credential detection over every text file of the checkout, not
+    just Python sources. Each file is tokenized with one regex pass; tokens
+    from many files are then scored together, in batches, for Shannon
+    entropy, character mix and known credential formats. Only the few tokens
+    a batch flags are looked at again, to confirm their format or the key
+    they are assigned to.
+    """
+
+    cache_name = 'secrets'
+
+    def __init__(self, cache=None, batch_tokens=DEFAULT_BATCH_TOKENS, vectorized=True, rule_pack_path=None):
+        self.runner = ShardedFileRunner(1, cache=cache)
+        self.batch_tokens = batch_tokens
+        if vectorized and np is None:
+            logger.warning("numpy is not installed; secret tokens are scored one at a time")
+        self.vectorized = vectorized and np is not None
+        self.rule_pack = load_secret_rules(rule_pack_path)
+        self.formats = re.compile(self.rule_pack.tables['formats'])
+        head_codes = [_head_code(head) for head in self.rule_pack.tables['heads']]
+        self.heads = np.array(head_codes, dtype=np.uint16) if self.vectorized else head_codes
+        self.ruleset_version = ruleset_version(self.cache_name, self.rule_pack.content_hash, (
+            MAX_TOKEN_LENGTH, KEYED_MIN_ENTROPY, MIN_RANDOM_LENGTH, RANDOM_MIN_ENTROPY, RANDOM_ENTROPY_RATIO,
+        ))
+        self.stats = dict.fromkeys(('files', 'tokens', 'batches', 'candidates'), 0)
+
+    def cache_identity(self):
+        """Findings-cache key: formats and scoring thresholds"""
+        return self.cache_name, self.ruleset_version
+
+    def analyze(self, repo_path, repo_index=None):
+        findings = list(self.iter_findings(repo_path, repo_index))
+        logger.info("SecretsAnalyzer found {} findings ({})".format(
+            len(findings), ', '.join('{} {}'.format(value, key) for key, value in self.stats.items())
+        ))
+        return findings
+
+    def iter_findings(self, repo_path, repo_index=None):
+        if repo_index is None:
+            repo_index = RepoIndex(repo_path)
+        self.stats = dict.fromkeys(self.stats, 0)
+        # Batches span files, so uncached files are scanned together rather than one by one
+        yield from self.runner.iter_run(self, repo_index, repo_index.iter_files(), batch=self._scan_files)
+
+    def _analyze_file(self, rel_path, repo_index):
+        return self._scan_files([rel_path], repo_index)[rel_path]
+
+    # -----------------------------
+    # BATCHES
+    # -----------------------------
+    def _scan_files(self, rel_paths, repo_index) -> Dict[str, List[Finding]]:
+        by_file = {rel_path: [] for rel_path in rel_paths}
+        sources: List[ScannedText] = []
+        tokens, offsets, owners = [], [], []
+        for rel_path in rel_paths:
+            try:
+                text = repo_index.read_text(rel_path)
+            except OSError as e:
+                logger.debug("Cannot scan {} for secrets: {}".format(rel_path, e))
+                continue
+            if '\0' in text[:BINARY_SNIFF_CHARS]:
+                continue
+            self.stats['files'] += 1
+            source = ScannedText(rel_path, text, LineIndex(text, '\n'))
+            if '-----BEGIN' in text:
+                by_file[rel_path].extend(self._private_keys(source))
+            owner = len(sources)
+            sources.append(source)
+            for match in TOKEN.finditer(text):
+                tokens.append(match.group())
+                offsets.append(match.start())
+                owners.append(owner)
+            if len(tokens) >= self.batch_tokens:
+                self._flush(by_file, sources, tokens, offsets, owners)
+                sources, tokens, offsets, owners = [], [], [], []
+        if tokens:
+            self._flush(by_file, sources, tokens, offsets, owners)
+        return by_file
+
+    def _flush(self, by_file, sources, tokens, offsets, owners):
+        score = score_tokens_vectorized if self.vectorized else score_tokens
+        for start in range(0, len(tokens), self.batch_tokens):
+            batch = tokens[start:start + self.batch_tokens]
+            scores = score(batch, self.heads)
+            self.stats['batches'] += 1
+            self.stats['tokens'] += len(batch)
+            for index in scores.candidates():
+                self.stats['candidates'] += 1
+                source = sources[owners[start + index]]
+                finding = self._confirm(source, batch[index], offsets[start + index], scores, index)
+                if finding is not None:
+                    by_file[source.rel_path].append(finding)
+
+    def _confirm(self, source, token, offset, scores, index):
+        """The finding for a flagged token, once its format or surroundings back the verdict"""
+        if PLACEHOLDER.search(token):
+            return None
+        text = source.text
+        line_start = text.rfind('\n', 0, offset) + 1
+        line_end = text.find('\n', offset)
+        if line_end == -1:
+            line_end = len(text)
+        flagged = (source, token, offset, text[line_start:line_end], offset - line_start,
+                   round(float(scores.entropy[index]), 2))
+
+        if scores.formatted[index]:
+            match = self.formats.fullmatch(token)
+            if match:
+                config = self.rule_pack.rules[match.lastgroup]
+                return self._finding(config['keyword'], config['severity'], 'HIGH', match.lastgroup, *flagged)
+
+        if scores.keyed[index] and KEY_CONTEXT.search(text, line_start, offset):
+            return self._finding('HARDCODED-SECRET', 'CRITICAL', 'HIGH', 'secret_assignment', *flagged)
+
+        if scores.random[index]:
+            end = offset + len(token)
+            quoted = offset > 0 and text[offset - 1] in QUOTES and end < len(text) and text[end] in QUOTES
+            if quoted and not IGNORED_CONTEXT.search(text, line_start, line_end):
+                return self._finding('HARDCODED-SECRET', 'HIGH', 'MEDIUM', 'high_entropy_string', *flagged)
+        return None
+
+    @staticmethod
+    def _finding(keyword, severity, confidence, pattern_name, source, token, offset, line, column, entropy):
+        # The token itself is masked, so reports and the findings cache never hold the secret
+        return Finding(
+            keyword, source.rel_path, source.lines.line_number(offset), severity, 'secrets', confidence=confidence,
+            snippet=_redact(line, column, token).strip()[:MAX_SNIPPET_LENGTH], pattern_name=pattern_name,
+            extra={'entropy': entropy},
+        )
+
+    @staticmethod
+    def _private_keys(source) -> List[Finding]:
+        return [
+            Finding('HARDCODED-SECRET', source.rel_path, source.lines.line_number(match.start()), 'CRITICAL',
+                    'secrets', confidence='HIGH', snippet=match.group(), pattern_name='private_key')
+            for match in PRIVATE_KEY.finditer(source.text)
+        ]
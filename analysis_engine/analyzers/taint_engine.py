@@ -0,0 +1,887 @@
+import os
+import ast
+import sys
+import time
+import logging
+from collections import deque
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from analysis_engine.utils.findings import Finding
+from analysis_engine.utils.findings_cache import ruleset_version
+from analysis_engine.utils.rule_packs import source_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Names whose attributes, items and method results are user input (`request.args['id']`, `request.get_json()`)
+SOURCE_NAMES = {'request'}
+# Argparse namespaces: only their attributes are input (`args.user_id`, not `args[0]` of a *args)
+NAMESPACE_NAMES = {'args'}
+# Decorators of framework route handlers, whose parameters come from the URL
+ROUTE_DECORATORS = {'route', 'get', 'post', 'put', 'patch', 'delete', 'api_route', 'websocket'}
+# Calls whose result no longer carries its input's taint
+SANITIZERS = {'int', 'float', 'bool', 'len', 'abs', 'round', 'escape', 'quote', 'quote_plus', 'secure_filename',
+              'escape_string'}
+# Methods whose first argument is run as SQL
+SQL_SINKS = {'execute', 'executemany', 'executescript', 'query', 'raw'}
+# Lookups by a caller-supplied key (`Invoice.query.get(id)`, `User.objects.get(pk=id)`), on receivers named like these
+LOOKUP_SINKS = {'get', 'get_or_404', 'find', 'find_one'}
+LOOKUP_RECEIVERS = {'query', 'objects', 'session', 'collection'}
+# On any other receiver (`repo.get(id)`, `db.find(filter)`) only the key argument counts, with less confidence
+LOOKUP_CONFIDENCE = 'HIGH'
+UNKNOWN_LOOKUP_CONFIDENCE = 'MEDIUM'
+# Methods that store their arguments in the receiver (`parts.append(value)` taints `parts`)
+MUTATORS = {'append', 'appendleft', 'extend', 'insert', 'add', 'update', 'setdefault', 'write'}
+# Methods of builtin types: `items.sort()` is not taken for a call of some repo class's `sort`
+BUILTIN_METHODS = frozenset(name for type_ in (str, bytes, list, dict, set, tuple, int, object) for name in dir(type_))
+
+# Definitions a call may resolve to by name before it is treated as a call into unknown code
+MAX_TARGETS = 3
+# Sinks a summary remembers per parameter; further paths to other sinks are dropped
+MAX_SINKS_PER_PARAM = 8
+# Helper calls a reported path may pass through
+MAX_CALL_DEPTH = 6
+# Worklist visits per flow-graph node before a function is given up on
+MAX_VISITS_PER_NODE = 50
+# Summary evaluations per function before the interprocedural pass stops refining
+MAX_EVALUATIONS_PER_FUNCTION = 20
+
+# Value labels: read from a source, a parameter (its index), or a call's result (-2 - call index)
+SOURCE = -1
+EMPTY = frozenset()
+SOURCE_LABELS = frozenset((SOURCE,))
+
+TRY_NODES = (ast.Try,) + ((ast.TryStar,) if hasattr(ast, 'TryStar') else ())
+MATCH_NODE = getattr(ast, 'Match', None)
+FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)
+
+
+def _call_label(index: int) -> int:
+    return -2 - index
+
+
+# Labels in a model are sorted sequences: only iterated once extracted, and stored as JSON lists as they are
+Labels = Tuple[int, ...]
+
+
+class CallModel(NamedTuple):
+    name: str
+    line: int
+    attribute: bool           # `obj.name(...)` rather than `name(...)`
+    receiver: Optional[str]   # `obj` when it is a plain name
+    receiver_labels: Labels
+    args: Tuple[Labels, ...]
+    kwargs: Dict[str, Labels]
+    text: str
+
+
+class SinkModel(NamedTuple):
+    keyword: str
+    confidence: str
+    line: int
+    labels: Labels
+    text: str
+
+
+class FunctionModel(NamedTuple):
+    """
+    What one function does with its inputs, independent of every other
+    function: the labels of each call's arguments, of each sink's argument
+    and of the returned value. Call results stay symbolic until the
+    interprocedural pass substitutes the callee's summary.
+    """
+    qualname: str
+    name: str
+    line: int
+    bound: bool               # first parameter is the receiver (self / cls)
+    params: Tuple[str, ...]
+    calls: Tuple[CallModel, ...]
+    sinks: Tuple[SinkModel, ...]
+    returns: Labels
+
+
+class FileModel(NamedTuple):
+    functions: Tuple[FunctionModel, ...]
+    imports: Dict[str, str]   # name bound by `import x.y as z` -> top-level module
+    aliases: Dict[str, str]   # `from m import a as b`: b -> a
+
+
+class Summary(NamedTuple):
+    returns: FrozenSet[int]   # SOURCE and/or indices of parameters that reach the return value
+    sinks: Dict[int, Dict[Tuple, Tuple[str, ...]]]  # param -> {sink: helpers passed through}
+
+
+EMPTY_SUMMARY = Summary(EMPTY, {})
+
+
+# -----------------------------
+# CONTROL FLOW
+# -----------------------------
+class _FlowGraph:
+    """Statement-level control-flow graph of one function body"""
+
+    def __init__(self, body):
+        self.nodes: List[Tuple[str, object]] = []
+        self.succ: List[List[int]] = []
+        self.pred: List[List[int]] = []
+        self._loops: List[Tuple[int, List[int]]] = []
+        self._add('entry', None, ())
+        self._block(body, [0])
+
+    def _add(self, kind, payload, preds) -> int:
+        node = len(self.nodes)
+        self.nodes.append((kind, payload))
+        self.succ.append([])
+        self.pred.append([])
+        self._link(preds, node)
+        return node
+
+    def _link(self, preds, node):
+        for pred in preds:
+            self.succ[pred].append(node)
+            self.pred[node].append(pred)
+
+    def _block(self, stmts, preds) -> List[int]:
+        for stmt in stmts:
+            if not preds:
+                break  # unreachable after return / raise / break
+            preds = self._stmt(stmt, preds)
+        return preds
+
+    def _stmt(self, stmt, preds) -> List[int]:
+        if isinstance(stmt, ast.If):
+            test = self._add('eval', stmt.test, preds)
+            return self._block(stmt.body, [test]) + (self._block(stmt.orelse, [test]) if stmt.orelse else [test])
+        if isinstance(stmt, (ast.While, ast.For, ast.AsyncFor)):
+            header = self._add('eval', stmt.test, preds) if isinstance(stmt, ast.While) else self._add('for', stmt, preds)
+            breaks = []
+            self._loops.append((header, breaks))
+            self._link(self._block(stmt.body, [header]), header)
+            self._loops.pop()
+            return self._block(stmt.orelse, [header]) + breaks
+        if isinstance(stmt, (ast.With, ast.AsyncWith)):
+            for item in stmt.items:
+                preds = [self._add('with', item, preds)]
+            return self._block(stmt.body, preds)
+        if isinstance(stmt, TRY_NODES):
+            first = len(self.nodes)
+            body = self._block(stmt.body, preds)
+            # Any statement of the body may raise into a handler
+            raising = list(preds) + list(range(first, len(self.nodes)))
+            outs = self._block(stmt.orelse, body)
+            for handler in stmt.handlers:
+                outs = outs + self._block(handler.body, [self._add('except', handler, raising)])
+            return self._block(stmt.finalbody, outs) if stmt.finalbody else outs
+        if MATCH_NODE is not None and isinstance(stmt, MATCH_NODE):
+            subject = self._add('eval', stmt.subject, preds)
+            outs = [subject]
+            for case in stmt.cases:
+                outs = outs + self._block(case.body, [self._add('case', (case, stmt.subject), [subject])])
+            return outs
+        if isinstance(stmt, ast.Break) and self._loops:
+            self._loops[-1][1].extend(preds)
+            return []
+        if isinstance(stmt, ast.Continue) and self._loops:
+            self._link(preds, self._loops[-1][0])
+            return []
+        node = self._add('stmt', stmt, preds)
+        return [] if isinstance(stmt, (ast.Return, ast.Raise)) else [node]
+
+
+# -----------------------------
+# INTRAPROCEDURAL
+# -----------------------------
+def is_source(node) -> bool:
+    """`request.args[...]`, `request.get_json()`, `self.request.GET`, `args.user_id`"""
+    while isinstance(node, (ast.Attribute, ast.Subscript, ast.Call)):
+        if isinstance(node, ast.Attribute):
+            if isinstance(node.value, ast.Name) and (
+                    node.value.id in NAMESPACE_NAMES or (node.attr == 'request' and node.value.id == 'self')):
+                return True
+            node = node.value
+        elif isinstance(node, ast.Subscript):
+            node = node.value
+        else:
+            node = node.func
+    return isinstance(node, ast.Name) and node.id in SOURCE_NAMES
+
+
+def _path(node) -> Optional[str]:
+    """'self.conn' for a chain of attributes on a plain name"""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return '.'.join(reversed(parts))
+
+
+def _join_into(state: Dict[str, FrozenSet[int]], other: Dict[str, FrozenSet[int]]):
+    for name, labels in other.items():
+        current = state.get(name)
+        state[name] = labels if current is None or current is labels else current | labels
+
+
+class _FunctionFlow:
+    """
+    Worklist dataflow over one function's flow graph. The state maps each
+    local (and `obj.attr` path) to the labels of the values it may hold;
+    assignments replace, branches join by union, and loops are iterated until
+    no state changes. Calls, sinks and returns are recorded with the labels
+    their arguments had once the states settled.
+    """
+
+    def __init__(self, external_modules):
+        self.external_modules = external_modules
+        self.calls: List[list] = []
+        self._call_ids: Dict[int, int] = {}
+        self.sinks: Dict[int, list] = {}
+        self.returns = EMPTY
+
+    def run(self, body, initial: Dict[str, FrozenSet[int]]):
+        graph = _FlowGraph(body)
+        count = len(graph.nodes)
+        outs: List[Optional[Dict]] = [None] * count
+        queue, queued = deque(range(count)), [True] * count
+        budget = MAX_VISITS_PER_NODE * count
+        while queue and budget:
+            budget -= 1
+            node = queue.popleft()
+            queued[node] = False
+            if node == 0:
+                state = dict(initial)
+            else:
+                state = {}
+                for pred in graph.pred[node]:
+                    if outs[pred] is not None:
+                        _join_into(state, outs[pred])
+            self._transfer(graph.nodes[node], state)
+            if state != outs[node]:
+                outs[node] = state
+                for succ in graph.succ[node]:
+                    if not queued[succ]:
+                        queued[succ] = True
+                        queue.append(succ)
+        if queue:
+            logger.debug("Taint flow did not settle within {} node visits".format(MAX_VISITS_PER_NODE * count))
+
+    def model(self, qualname, name, line, bound, params) -> FunctionModel:
+        """
+        The recorded flow, minus calls that can never matter: those passed
+        nothing labelled whose result is not used either (most logging and
+        bookkeeping calls). The remaining calls are renumbered.
+        """
+        used = set(self.returns)
+        for sink in self.sinks.values():
+            used.update(sink[3])
+        for call in self.calls:
+            used.update(call[4])
+            for labels in call[5]:
+                used.update(labels)
+            for labels in call[6].values():
+                used.update(labels)
+        renumbered = {}
+        for index, call in enumerate(self.calls):
+            if _call_label(index) in used or call[4] or any(call[5]) or any(call[6].values()):
+                renumbered[_call_label(index)] = _call_label(len(renumbered))
+
+        def relabel(labels):
+            return tuple(sorted(renumbered.get(label, label) for label in labels))
+
+        calls = tuple(
+            CallModel(name_, line_, attribute, receiver, relabel(receiver_labels), tuple(relabel(a) for a in args),
+                      {key: relabel(value) for key, value in kwargs.items()}, text)
+            for index, (name_, line_, attribute, receiver, receiver_labels, args, kwargs, text) in enumerate(self.calls)
+            if _call_label(index) in renumbered
+        )
+        sinks = tuple(SinkModel(keyword, confidence, line_, relabel(labels), text)
+                      for keyword, confidence, line_, labels, text in self.sinks.values())
+        return FunctionModel(qualname, name, line, bound, tuple(params), calls, sinks, relabel(self.returns))
+
+    # Transfer functions
+    def _transfer(self, node, state):
+        kind, payload = node
+        if kind == 'stmt':
+            self._statement(payload, state)
+        elif kind == 'eval':
+            self._eval(payload, state)
+        elif kind == 'for':
+            self._assign(payload.target, self._eval(payload.iter, state), state)
+        elif kind == 'with':
+            labels = self._eval(payload.context_expr, state)
+            if payload.optional_vars is not None:
+                self._assign(payload.optional_vars, labels, state)
+        elif kind == 'except':
+            if payload.name:
+                state[payload.name] = EMPTY
+        elif kind == 'case':
+            case, subject = payload
+            labels = self._eval(subject, state)
+            for child in ast.walk(case.pattern):
+                name = getattr(child, 'name', None) or getattr(child, 'rest', None)
+                if isinstance(name, str):
+                    state[name] = labels
+            if case.guard is not None:
+                self._eval(case.guard, state)
+
+    def _statement(self, stmt, state):
+        if isinstance(stmt, ast.Assign):
+            labels = self._eval(stmt.value, state)
+            for target in stmt.targets:
+                self._assign(target, labels, state)
+        elif isinstance(stmt, ast.AnnAssign):
+            if stmt.value is not None:
+                self._assign(stmt.target, self._eval(stmt.value, state), state)
+        elif isinstance(stmt, ast.AugAssign):
+            self._assign(stmt.target, self._eval(stmt.value, state) | self._eval(stmt.target, state), state)
+        elif isinstance(stmt, ast.Return):
+            if stmt.value is not None:
+                self.returns = self.returns | self._eval(stmt.value, state)
+        elif isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            state[stmt.name] = EMPTY
+        elif isinstance(stmt, (ast.Import, ast.ImportFrom)):
+            for alias in stmt.names:
+                state[alias.asname or alias.name.split('.', 1)[0]] = EMPTY
+        elif isinstance(stmt, ast.Delete):
+            for target in stmt.targets:
+                if isinstance(target, ast.Name):
+                    state.pop(target.id, None)
+        else:
+            for child in ast.iter_child_nodes(stmt):
+                if isinstance(child, ast.expr):
+                    self._eval(child, state)
+
+    def _assign(self, target, labels, state):
+        if isinstance(target, ast.Name):
+            state[target.id] = labels
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for element in target.elts:
+                self._assign(element, labels, state)
+        elif isinstance(target, ast.Starred):
+            self._assign(target.value, labels, state)
+        elif isinstance(target, ast.Attribute):
+            path = _path(target)
+            if path is not None:
+                state[path] = labels
+            else:
+                self._eval(target.value, state)
+        elif isinstance(target, ast.Subscript):
+            # Storing into a container taints the container
+            self._eval(target.slice, state)
+            path = _path(target.value)
+            if path is not None:
+                state[path] = state.get(path, EMPTY) | labels
+
+    # Expressions
+    def _eval(self, node, state) -> FrozenSet[int]:
+        if isinstance(node, ast.Name):
+            return state.get(node.id, EMPTY)
+        if isinstance(node, ast.Constant) or node is None:
+            return EMPTY
+        if isinstance(node, ast.Call):
+            return self._call(node, state)
+        if isinstance(node, ast.Attribute):
+            if is_source(node):
+                return SOURCE_LABELS
+            path = _path(node)
+            if path is not None and path in state:
+                return state[path]
+            return self._eval(node.value, state)
+        if isinstance(node, ast.Subscript):
+            self._eval(node.slice, state)
+            return SOURCE_LABELS if is_source(node) else self._eval(node.value, state)
+        if isinstance(node, ast.BinOp):
+            return self._eval(node.left, state) | self._eval(node.right, state)
+        if isinstance(node, ast.Compare) or (isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not)):
+            # Comparisons and `not x` yield booleans
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, ast.expr):
+                    self._eval(child, state)
+            return EMPTY
+        if isinstance(node, ast.IfExp):
+            self._eval(node.test, state)
+            return self._eval(node.body, state) | self._eval(node.orelse, state)
+        if isinstance(node, ast.NamedExpr):
+            labels = self._eval(node.value, state)
+            self._assign(node.target, labels, state)
+            return labels
+        if isinstance(node, COMPREHENSIONS):
+            scope = dict(state)
+            for generator in node.generators:
+                self._assign(generator.target, self._eval(generator.iter, scope), scope)
+                for condition in generator.ifs:
+                    self._eval(condition, scope)
+            if isinstance(node, ast.DictComp):
+                return self._eval(node.key, scope) | self._eval(node.value, scope)
+            return self._eval(node.elt, scope)
+        if isinstance(node, ast.Lambda):
+            return EMPTY
+        if isinstance(node, (ast.Yield, ast.YieldFrom)):
+            self._eval(node.value, state)
+            return EMPTY
+        # Containers, f-strings, boolean operators, starred and awaited values carry their parts
+        labels = EMPTY
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.expr):
+                labels = labels | self._eval(child, state)
+        return labels
+
+    def _call(self, node, state) -> FrozenSet[int]:
+        func = node.func
+        args = [self._eval(arg.value if isinstance(arg, ast.Starred) else arg, state) for arg in node.args]
+        kwargs = {}
+        for keyword in node.keywords:
+            labels = self._eval(keyword.value, state)
+            if keyword.arg:
+                kwargs[keyword.arg] = labels
+        if is_source(node):
+            return SOURCE_LABELS
+
+        receiver, receiver_labels = None, EMPTY
+        if isinstance(func, ast.Name):
+            name, attribute, text = func.id, False, func.id
+        elif isinstance(func, ast.Attribute):
+            name, attribute = func.attr, True
+            receiver_labels = self._eval(func.value, state)
+            receiver = func.value.id if isinstance(func.value, ast.Name) else None
+            text = _path(func) or '(...).{}'.format(func.attr)
+        else:
+            # Calls of computed callables pass their inputs through
+            labels = self._eval(func, state)
+            for value in args + list(kwargs.values()):
+                labels = labels | value
+            return labels
+        if name in SANITIZERS:
+            return EMPTY
+        if attribute and name in MUTATORS:
+            path = _path(func.value)
+            if path is not None:
+                stored = state.get(path, EMPTY)
+                for value in args + list(kwargs.values()):
+                    stored = stored | value
+                state[path] = stored
+
+        index = self._call_ids.get(id(node))
+        if index is None:
+            index = self._call_ids[id(node)] = len(self.calls)
+            self.calls.append([name, node.lineno, attribute, receiver, receiver_labels, args, kwargs, text])
+        else:
+            # Revisited in a later worklist round: labels only grow
+            call = self.calls[index]
+            call[4] = call[4] | receiver_labels
+            call[5] = [old | new for old, new in zip(call[5], args)]
+            for key, labels in kwargs.items():
+                call[6][key] = call[6].get(key, EMPTY) | labels
+
+        if attribute and receiver not in self.external_modules:
+            if name in SQL_SINKS and args:
+                self._sink(node, 'TAINTED-DATA-FLOW', 'HIGH', args[0], text)
+            elif name in LOOKUP_SINKS and self._is_lookup_receiver(func.value):
+                labels = EMPTY
+                for value in args + list(kwargs.values()):
+                    labels = labels | value
+                self._sink(node, 'IDOR-VULNERABILITY', LOOKUP_CONFIDENCE, labels, text)
+            elif name in LOOKUP_SINKS and args:
+                self._sink(node, 'IDOR-VULNERABILITY', UNKNOWN_LOOKUP_CONFIDENCE, args[0], text)
+        return frozenset((_call_label(index),))
+
+    @staticmethod
+    def _is_lookup_receiver(node) -> bool:
+        owner = node.attr if isinstance(node, ast.Attribute) else node.id if isinstance(node, ast.Name) else ''
+        return owner in LOOKUP_RECEIVERS or owner.endswith('_collection')
+
+    def _sink(self, node, keyword, confidence, labels, text):
+        sink = self.sinks.get(id(node))
+        if sink is None:
+            self.sinks[id(node)] = [keyword, confidence, node.lineno, labels, text]
+        else:
+            sink[3] = sink[3] | labels
+
+
+def _statements(body):
+    """Every statement in `body`, nested ones included, without descending into expressions"""
+    stack = list(reversed(body))
+    while stack:
+        stmt = stack.pop()
+        yield stmt
+        nested = []
+        for field in ('body', 'orelse', 'finalbody'):
+            nested.extend(getattr(stmt, field, None) or ())
+        for clause in getattr(stmt, 'handlers', None) or getattr(stmt, 'cases', None) or ():
+            nested.extend(clause.body)
+        stack.extend(reversed(nested))
+
+
+class _ModelBuilder:
+    """Builds the FunctionModel of every function in a module, plus one for the module body"""
+
+    def __init__(self, tree):
+        self.imports, self.aliases = {}, {}
+        for node in _statements(tree.body):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    root = alias.name.split('.', 1)[0]
+                    self.imports[alias.asname or root] = root
+            elif isinstance(node, ast.ImportFrom):
+                for alias in node.names:
+                    if alias.asname and alias.name != '*':
+                        self.aliases[alias.asname] = alias.name
+        self.functions: List[FunctionModel] = []
+        self._analyze('<module>', '<module>', 1, False, (), {}, tree.body)
+        self._definitions(tree.body, '', False)
+
+    def _definitions(self, body, prefix, in_class):
+        # Statements only: expressions are never walked recursively here
+        for stmt in body:
+            if isinstance(stmt, FUNCTION_NODES):
+                self._function(stmt, prefix, in_class)
+            elif isinstance(stmt, ast.ClassDef):
+                self._definitions(stmt.body, prefix + stmt.name + '.', True)
+            else:
+                for field in ('body', 'orelse', 'finalbody'):
+                    self._definitions(getattr(stmt, field, None) or (), prefix, in_class)
+                for nested in getattr(stmt, 'handlers', None) or getattr(stmt, 'cases', None) or ():
+                    self._definitions(nested.body, prefix, in_class)
+
+    def _function(self, node, prefix, in_class):
+        bound = in_class and not any(isinstance(d, ast.Name) and d.id == 'staticmethod' for d in node.decorator_list)
+        arguments = node.args
+        positional = arguments.posonlyargs + arguments.args
+        params = [arg.arg for arg in positional + arguments.kwonlyargs]
+        initial = {param: frozenset((index,)) for index, param in enumerate(params)}
+        if self._is_route(node):
+            # Framework-injected dependencies (`db=Depends(get_db)`) are not URL input
+            defaults = dict(zip([arg.arg for arg in positional[len(positional) - len(arguments.defaults):]], arguments.defaults))
+            defaults.update((arg.arg, default) for arg, default in zip(arguments.kwonlyargs, arguments.kw_defaults) if default)
+            for index, param in enumerate(params):
+                if index >= bound and not isinstance(defaults.get(param), ast.Call):
+                    initial[param] = initial[param] | SOURCE_LABELS
+        self._analyze(prefix + node.name, node.name, node.lineno, bound, params, initial, node.body)
+        self._definitions(node.body, prefix + node.name + '.', False)
+
+    @staticmethod
+    def _is_route(node) -> bool:
+        for decorator in node.decorator_list:
+            func = decorator.func if isinstance(decorator, ast.Call) else None
+            name = func.attr if isinstance(func, ast.Attribute) else func.id if isinstance(func, ast.Name) else None
+            if name in ROUTE_DECORATORS:
+                return True
+        return False
+
+    def _analyze(self, qualname, name, line, bound, params, initial, body):
+        flow = _FunctionFlow(self.imports)
+        try:
+            flow.run(body, initial)
+        except RecursionError:
+            logger.debug("Expression nesting too deep to track taint in {}".format(qualname))
+            return
+        self.functions.append(flow.model(qualname, name, line, bound, params))
+
+    def model(self) -> FileModel:
+        return FileModel(tuple(self.functions), self.imports, self.aliases)
+
+
+def extract_models(tree) -> FileModel:
+    return _ModelBuilder(tree).model()
+
+
+# -----------------------------
+# CACHE RECORDS
+# -----------------------------
+def model_to_record(model: FileModel) -> Dict:
+    # NamedTuples serialize as JSON arrays in field order
+    return {'functions': model.functions, 'imports': model.imports, 'aliases': model.aliases}
+
+
+def model_from_record(record: Dict) -> FileModel:
+    """Inverse of `model_to_record`; labels stay the lists JSON produced"""
+    functions = []
+    for qualname, name, line, bound, params, calls, sinks, returns in record['functions']:
+        functions.append(FunctionModel(
+            qualname, name, line, bound, params,
+            tuple(map(CallModel._make, calls)), tuple(map(SinkModel._make, sinks)), returns,
+        ))
+    return FileModel(tuple(functions), record['imports'], record['aliases'])
+
+
+# -----------------------------
+# INTERPROCEDURAL
+# -----------------------------
+class _Program:
+    """Every function model of a checkout, with calls resolved to their possible definitions"""
+
+    def __init__(self, models: Dict[str, FileModel]):
+        self.files = models
+        self.functions: List[Tuple[str, FunctionModel]] = []
+        self.by_name: Dict[str, List[int]] = {}
+        for rel_path in sorted(models):
+            for fn in models[rel_path].functions:
+                self.by_name.setdefault(fn.name, []).append(len(self.functions))
+                self.functions.append((rel_path, fn))
+        # Top-level packages and modules of the checkout, which `import x` may refer to
+        self.local_roots = {os.path.splitext(rel_path.split(os.sep, 1)[0])[0] for rel_path in models}
+        self.targets = [[self._resolve(rel_path, fn, call) for call in fn.calls] for rel_path, fn in self.functions]
+        self.callers: List[List[int]] = [[] for _ in self.functions]
+        for caller, targets in enumerate(self.targets):
+            for callee in {t for call_targets in targets for t in call_targets}:
+                self.callers[callee].append(caller)
+
+    def _resolve(self, rel_path, fn, call) -> Tuple[int, ...]:
+        """Definitions a call may run, by name (same file first); () for unknown code"""
+        module = self.files[rel_path]
+        if call.attribute:
+            root = module.imports.get(call.receiver)
+            if root is not None and root not in self.local_roots:
+                return ()
+            candidates = self.by_name.get(call.name, ())
+            if call.receiver in ('self', 'cls') and fn.bound:
+                owner = fn.qualname.rsplit('.', 1)[0] + '.' + call.name
+                same_class = tuple(t for t in candidates if self.functions[t][0] == rel_path and self.functions[t][1].qualname == owner)
+                if same_class:
+                    return same_class
+            elif call.name in BUILTIN_METHODS:
+                return ()
+        else:
+            name = module.aliases.get(call.name, call.name)
+            candidates = [t for t in self.by_name.get(name, ()) if not self.functions[t][1].bound]
+        local = tuple(t for t in candidates if self.functions[t][0] == rel_path)
+        if local:
+            return local[:MAX_TARGETS]
+        return tuple(candidates) if len(candidates) <= MAX_TARGETS else ()
+
+    def argument(self, call: CallModel, callee: int, param: int) -> Optional[FrozenSet[int]]:
+        """Labels a call passes for the callee's `param`, None if it passes nothing"""
+        fn = self.functions[callee][1]
+        offset = 1 if fn.bound and call.attribute else 0
+        if param < offset:
+            return call.receiver_labels
+        position = param - offset
+        if position < len(call.args):
+            return call.args[position]
+        return call.kwargs.get(fn.params[param]) if param < len(fn.params) else None
+
+    def callees_first(self) -> List[int]:
+        """Post-order over the call graph, so most summaries are final before their callers run"""
+        order, seen = [], [False] * len(self.functions)
+        for root in range(len(self.functions)):
+            if seen[root]:
+                continue
+            seen[root] = True
+            stack = [(root, iter({t for targets in self.targets[root] for t in targets}))]
+            while stack:
+                node, children = stack[-1]
+                for child in children:
+                    if not seen[child]:
+                        seen[child] = True
+                        stack.append((child, iter({t for targets in self.targets[child] for t in targets})))
+                        break
+                else:
+                    stack.pop()
+                    order.append(node)
+        return order
+
+
+class TaintEngine:
+    """
+    Interprocedural taint tracking from request input to query and object
+    lookup sinks. Each function is first reduced, by a worklist dataflow over
+    its own control-flow graph, to a model that is independent of other
+    functions; models depend only on their file's content, so they are cached
+    per blob across scans. A second worklist then computes one summary per
+    function (which parameters reach its return value and which reach a sink,
+    through any helpers), re-evaluating a function only when the summary of
+    something it calls changed. Summaries are memoized, so a helper called
+    from a thousand places is analyzed once and applied at every call site.
+    Calls are resolved by name, like the symbol index does it.
+    """
+
+    cache_name = 'taint'
+
+    def __init__(self, cache=None):
+        self.cache = cache
+        self.version = ruleset_version(self.cache_name, source_fingerprint(sys.modules[__name__]))
+        self.stats = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['stats'] = {}
+        return state
+
+    def models(self, repo_index) -> Dict[str, FileModel]:
+        """Function models of every Python file, from the cache where the blob was seen before"""
+        files = list(repo_index.iter_files(language='python'))
+        shas, cached = {}, {}
+        if self.cache is not None:
+            for indexed in files:
+                try:
+                    shas[indexed.rel_path] = repo_index.blob_sha(indexed.rel_path)
+                except OSError as e:
+                    logger.debug("Cannot hash {}: {}".format(indexed.rel_path, e))
+            try:
+                cached = self.cache.get_many(self.cache_name, self.version, shas.values())
+            except Exception as e:
+                logger.warning("Taint model cache unavailable, extracting every file: {}".format(e))
+
+        models, fresh = {}, {}
+        for indexed in files:
+            rel_path = indexed.rel_path
+            record = cached.get(shas.get(rel_path))
+            if record is not None:
+                models[rel_path] = model_from_record(record)
+                continue
+            try:
+                model = extract_models(repo_index.parse_ast(rel_path))
+            except (SyntaxError, ValueError):
+                model = FileModel((), {}, {})
+            except OSError as e:
+                logger.debug("Cannot read {} for taint models: {}".format(rel_path, e))
+                continue
+            models[rel_path] = model
+            if rel_path in shas:
+                fresh[shas[rel_path]] = model_to_record(model)
+
+        if fresh:
+            try:
+                self.cache.put_many(self.cache_name, self.version, fresh)
+            except Exception as e:
+                logger.warning("Could not update taint model cache: {}".format(e))
+        self.stats.update({'files': len(models), 'models_cached': sum(1 for sha in shas.values() if sha in cached)})
+        return models
+
+    def analyze(self, repo_index) -> List[Finding]:
+        started = time.time()
+        program = _Program(self.models(repo_index))
+        extracted = time.time()
+
+        count = len(program.functions)
+        summaries = [EMPTY_SUMMARY] * count
+        found: List[Dict] = [{}] * count
+        order = program.callees_first()
+        queue, queued = deque(order), [True] * count
+        evaluations, budget = 0, MAX_EVALUATIONS_PER_FUNCTION * count
+        while queue and evaluations < budget:
+            fid = queue.popleft()
+            queued[fid] = False
+            evaluations += 1
+            summary, found[fid] = self._evaluate(program, fid, summaries)
+            if self._signature(summary) != self._signature(summaries[fid]):
+                for caller in program.callers[fid]:
+                    if not queued[caller]:
+                        queued[caller] = True
+                        queue.append(caller)
+            summaries[fid] = summary
+        if queue:
+            logger.warning("Taint summaries still changing after {} evaluations; reporting what was found".format(evaluations))
+
+        findings = []
+        for fid, flows in enumerate(found):
+            rel_path = program.functions[fid][0]
+            for (keyword, line), (confidence, text, sink, via) in flows.items():
+                findings.append(self._finding(rel_path, keyword, line, confidence, text, sink, via))
+        findings.sort(key=lambda f: (f.file_path, f.line_number, f.shortform_keyword))
+        self.stats.update({
+            'functions': count,
+            'evaluations': evaluations,
+            'findings': len(findings),
+            'model_seconds': round(extracted - started, 3),
+            'solve_seconds': round(time.time() - extracted, 3),
+        })
+        logger.info("TaintEngine: {} functions, {} summary evaluations, {} flows in {:.2f}s".format(
+            count, evaluations, len(findings), time.time() - started
+        ))
+        return findings
+
+    @staticmethod
+    def _signature(summary: Summary):
+        # Which sinks a parameter reaches decides callers' results; the path shown does not
+        return summary.returns, {param: frozenset(paths) for param, paths in summary.sinks.items()}
+
+    def _evaluate(self, program: _Program, fid: int, summaries: List[Summary]):
+        """This function's summary and source-to-sink flows, given the current callee summaries"""
+        rel_path, fn = program.functions[fid]
+        targets = program.targets[fid]
+        resolved = [EMPTY] * len(fn.calls)
+
+        def resolve(labels):
+            out = EMPTY
+            for label in labels:
+                out = out | (resolved[-2 - label] if label < SOURCE else frozenset((label,)))
+            return out
+
+        # Call results may feed earlier calls through loops; repeat until they settle
+        for _ in range(len(fn.calls) + 1):
+            changed = False
+            for index, call in enumerate(fn.calls):
+                value = resolved[index] | self._call_result(program, call, targets[index], summaries, resolve)
+                if value != resolved[index]:
+                    resolved[index] = value
+                    changed = True
+            if not changed:
+                break
+
+        previous = summaries[fid]
+        sinks = {param: dict(paths) for param, paths in previous.sinks.items()}
+        flows = {}
+
+        def reach(labels, keyword, line, confidence, text, sink, via):
+            if SOURCE in labels:
+                flows.setdefault((keyword, line), (confidence, text, sink, via))
+            if len(via) < MAX_CALL_DEPTH:
+                for param in labels:
+                    if param >= 0:
+                        paths = sinks.setdefault(param, {})
+                        if sink not in paths and len(paths) < MAX_SINKS_PER_PARAM:
+                            paths[sink] = via
+
+        for sink in fn.sinks:
+            labels = resolve(sink.labels)
+            if labels:
+                location = (sink.keyword, sink.confidence, rel_path, sink.line, sink.text)
+                reach(labels, sink.keyword, sink.line, sink.confidence, sink.text, location, ())
+        for index, call in enumerate(fn.calls):
+            for callee in targets[index]:
+                qualname = program.functions[callee][1].qualname
+                for param, paths in summaries[callee].sinks.items():
+                    passed = program.argument(call, callee, param)
+                    labels = resolve(passed) if passed else EMPTY
+                    if not labels:
+                        continue
+                    for location, via in paths.items():
+                        reach(labels, location[0], call.line, location[1], call.text, location, (qualname,) + via)
+
+        return Summary(previous.returns | resolve(fn.returns), sinks), flows
+
+    @staticmethod
+    def _call_result(program, call, targets, summaries, resolve) -> FrozenSet[int]:
+        if not targets:
+            # Unknown code (libraries, builtins) is assumed to pass its inputs through
+            labels = resolve(call.receiver_labels)
+            for value in call.args:
+                labels = labels | resolve(value)
+            for value in call.kwargs.values():
+                labels = labels | resolve(value)
+            return labels
+        labels = EMPTY
+        for callee in targets:
+            for label in summaries[callee].returns:
+                if label == SOURCE:
+                    labels = labels | SOURCE_LABELS
+                else:
+                    passed = program.argument(call, callee, label)
+                    if passed:
+                        labels = labels | resolve(passed)
+        return labels
+
+    @staticmethod
+    def _finding(rel_path, keyword, line, confidence, text, sink, via) -> Finding:
+        if not via:
+            return Finding(keyword, rel_path, line, 'HIGH', 'taint', confidence=confidence,
+                           snippet='User input reaches {}()'.format(text))
+        _, _, sink_path, sink_line, sink_text = sink
+        return Finding(
+            keyword, rel_path, line, 'HIGH', 'taint', confidence=confidence,
+            snippet='User input passed to {}() reaches {}() at {}:{}'.format(text, sink_text, sink_path, sink_line),
+            extra={'taint_path': list(via), 'taint_sink': '{}:{}'.format(sink_path, sink_line)},
+        )
@@ -0,0 +1,129 @@
+import os
+import re
+import random
+import shutil
+import tempfile
+import time
+import logging
+import argparse
+
+from analysis_engine.analyzers.regex_analyzer import RegexAnalyzer
+from analysis_engine.utils.findings import finding_to_dict
+from analysis_engine.utils.repo_index import RepoIndex
+
+logger = logging.getLogger(__name__)
+
+# Lines that trip a variety of rules, mixed into otherwise benign code
+VULNERABLE_LINES = [
+    'cursor.execute(f"SELECT * FROM users WHERE id = {user_id}")',
+    'digest = hashlib.md5(data).hexdigest()',
+    'token = random.randint(0, 999999)',
+    'app.run(host="0.0.0.0", debug=True)',
+    'api_key = "abcd1234efgh5678"',
+    'subprocess.run(cmd, shell=True)',
+    'obj = pickle.loads(payload)',
+    'config = yaml.load(stream)',
+    'result = eval(expression)',
+    'resp = requests.get(request.args["url"])',
+    'logger.info("login with password %s", password)',
+    'path = "/tmp/upload.bin"',
+    'module.attribute = replacement',
+]
+
+BENIGN_LINES = [
+    'def handler(event, context):',
+    '    items = [x for x in range(10) if x % 2 == 0]',
+    '    return {"status": "ok", "count": len(items)}',
+    'class Repository:',
+    '    """Simple data access object."""',
+    '    def __init__(self, session):',
+    '        self.session = session',
+    '        values = sorted(set(values))',
+    'import json',
+    'from typing import Dict, List',
+    '    # TODO: handle pagination',
+    '    total = sum(item["price"] for item in basket)',
+    '',
+]
+
+
+class LegacyRegexAnalyzer(RegexAnalyzer):
+    """Reference implementation: every pattern re-searched against every line"""
+
+    def _analyze_file(self, rel_path, repo_index):
+        findings = []
+        with open(repo_index.abs_path(rel_path), 'r', encoding='utf-8', errors='ignore') as f:
+            lines = f.read().split('\n')
+
+        for pattern_name, config in self.patterns.items():
+            for i, line in enumerate(lines, 1):
+                if re.search(config['regex'], line, re.IGNORECASE):
+                    findings.append({
+                        'shortform_keyword': config['keyword'],
+                        'file_path': rel_path,
+                        'line_number': i,
+                        'severity': config['severity'],
+                        'context_snippet': line.strip()[:300],
+                        'source': 'regex',
+                        'pattern_name': pattern_name,
+                        'confidence': 'MEDIUM'
+                    })
+        return findings
+
+
+def build_synthetic_tree(root, file_count, lines_per_file, seed=1337):
+    """Write `file_count` Python files spread across nested packages"""
+    rng = random.Random(seed)
+    for n in range(file_count):
+        package_dir = os.path.join(root, 'pkg_{}'.format(n % 100), 'sub_{}'.format(n % 7))
+        os.makedirs(package_dir, exist_ok=True)
+        lines = []
+        for _ in range(lines_per_file):
+            pool = VULNERABLE_LINES if rng.random() < 0.03 else BENIGN_LINES
+            lines.append(rng.choice(pool))
+        with open(os.path.join(package_dir, 'module_{}.py'.format(n)), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines))
+
+
+def _time(analyzer, repo_path):
+    start = time.perf_counter()
+    repo_index = RepoIndex(repo_path)
+    findings = analyzer.analyze(repo_path, repo_index)
+    elapsed = time.perf_counter() - start
+    return elapsed, [finding_to_dict(finding, repo_index.read_text) for finding in findings]
+
+
+def _sort_key(finding):
+    return (finding['file_path'], finding['pattern_name'], finding['line_number'])
+
+
+def run_benchmark(file_count=10000, lines_per_file=60, repo_path=None):
+    owns_tree = repo_path is None
+    if owns_tree:
+        repo_path = tempfile.mkdtemp(prefix='regex_bench_')
+        print("Building synthetic tree: {} files x {} lines in {}".format(file_count, lines_per_file, repo_path))
+        build_synthetic_tree(repo_path, file_count, lines_per_file)
+
+    try:
+        legacy_time, legacy_findings = _time(LegacyRegexAnalyzer(), repo_path)
+        engine_time, engine_findings = _time(RegexAnalyzer(), repo_path)
+
+        identical = sorted(legacy_findings, key=_sort_key) == sorted(engine_findings, key=_sort_key)
+        print("Legacy per-line search : {:.2f}s ({} findings)".format(legacy_time, len(legacy_findings)))
+        print("Compiled prefilter     : {:.2f}s ({} findings)".format(engine_time, len(engine_findings)))
+        print("Speedup                : {:.1f}x | identical findings: {}".format(legacy_time / engine_time, identical))
+        return {'legacy': legacy_time, 'engine': engine_time, 'identical': identical}
+    finally:
+        if owns_tree:
+            shutil.rmtree(repo_path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark RegexAnalyzer against the legacy per-line engine")
+    parser.add_argument('--files', type=int, default=10000)
+    parser.add_argument('--lines', type=int, default=60)
+    parser.add_argument('--repo', help="Benchmark an existing checkout instead of a synthetic tree")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    run_benchmark(args.files, args.lines, args.repo)
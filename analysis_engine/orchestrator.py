@@ -1,15 +1,60 @@
 import logging
+import multiprocessing
+import subprocess
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from copy import deepcopy
 from typing import List, Dict
 
-from analysis_engine.analyzers.regex_analyzer import RegexAnalyzer
+from analysis_engine.analyzers.regex_analyzer import DEFAULT_MMAP_MIN_BYTES, RegexAnalyzer
+from analysis_engine.analyzers.secrets_analyzer import DEFAULT_BATCH_TOKENS, SecretsAnalyzer
 from analysis_engine.analyzers.ast_analyzers import ASTAnalyzer
 from analysis_engine.analyzers.external_tool_analyzer import ExternalToolAnalyzer
 from analysis_engine.analyzers.llm_gemini_analyzer import LLMAnalyzer
+from analysis_engine.utils.advisory_db import DEFAULT_DB_PATH as DEFAULT_ADVISORY_DB_PATH
+from analysis_engine.utils.aggregation import (
+    DEFAULT_MAX_LINES, DEFAULT_MAX_PER_FILE, DEFAULT_MAX_PER_RULE, DEFAULT_MIN_OCCURRENCES,
+    aggregate_findings, occurrences,
+)
+from analysis_engine.utils.ast_cache import combine_stats
+from analysis_engine.utils.correlation import CorrelationIndex
+from analysis_engine.utils.findings import finding_to_dict
+from analysis_engine.utils.findings_stream import counted, deduplicate, drop_low_confidence, rank_by_severity
+from analysis_engine.utils.findings_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES, FindingsCache
+from analysis_engine.utils.regex_guard import (
+    DEFAULT_FILE_BUDGET, DEFAULT_MAX_LINE_LENGTH, DEFAULT_RULE_BUDGET, RegexGuard,
+)
+from analysis_engine.utils.path_policy import DEFAULT_MAX_FILE_BYTES, PathPolicy
+from analysis_engine.utils.repo_index import RepoIndex
+from analysis_engine.utils.sharding import DEFAULT_MIN_FILES
 
 logger = logging.getLogger(__name__)
 
+# Static stages in reporting order
+STATIC_STAGES = ('regex', 'secrets', 'ast', 'external_tools')
+# CPU-bound pure-Python stages; the rest mostly wait on subprocesses or the network
+PROCESS_STAGES = {'regex', 'secrets', 'ast'}
+
+
+def _run_stage(analyzer, repo_path, repo_index):
+    """Stage entry point, importable so it can run inside a worker process"""
+    start = time.time()
+    findings = analyzer.analyze(repo_path, repo_index)
+    stats = {
+        'repo_index': repo_index.stats(),
+        'ast_cache': repo_index.ast_cache.stats(),
+    }
+    cache = getattr(getattr(analyzer, 'runner', None), 'cache', None)
+    if cache is not None:
+        stats['findings_cache'] = cache.stats()
+    guard = getattr(analyzer, 'guard', None)
+    if guard is not None:
+        stats['regex_guard'] = guard.summary()
+    if getattr(analyzer, 'audit_summary', None) is not None:
+        stats['dependency_audit'] = analyzer.audit_summary
+    return findings, time.time() - start, stats
+
+
 class AnalysisOrchestrator:
     """
     Master orchestrator that runs all analysis methods and aggregates results.
@@ -22,9 +67,12 @@ class AnalysisOrchestrator:
         self._apply_plan_overrides()
 
         self.regex_analyzer = None
+        self.secrets_analyzer = None
         self.ast_analyzer = None
         self.external_tool_analyzer = None
         self.llm_analyzer = None
+        self.findings_cache = None
+        self.correlation_index = None
 
         self._load_analyzers()
         logger.info("AnalysisOrchestrator initialized | plan=%s | config=%s", self.plan, self.config)
@@ -32,15 +80,66 @@ class AnalysisOrchestrator:
     def _default_config(self):
         """Default analysis configuration with new LLM task controls."""
         return {
-            'regex': {'enabled': True, 'timeout': 30},
-            'ast': {'enabled': True, 'timeout': 120},
-            'external_tools': {'enabled': True, 'timeout': 180},
+            'regex': {
+                'enabled': True,
+                'timeout': 30,
+                'scan_mode': 'line',           # 'line' or 'buffer' (whole-file matching, mmap for big files)
+                'mmap_min_bytes': DEFAULT_MMAP_MIN_BYTES,
+                'backend': 'python',           # 'python' or 'ripgrep' (falls back to python without rg)
+                'max_line_length': DEFAULT_MAX_LINE_LENGTH,  # Longer lines are matched on a prefix
+                'file_budget': DEFAULT_FILE_BUDGET,          # Seconds per file (0: unlimited)
+                'rule_budget': DEFAULT_RULE_BUDGET,          # Seconds per rule per file (0: unlimited)
+                'linear_engine': False,        # Run rules through RE2 where possible (needs google-re2)
+            },
+            'secrets': {
+                'enabled': True,
+                'timeout': 30,
+                'batch_tokens': DEFAULT_BATCH_TOKENS,  # Candidate tokens entropy-scored together
+                'vectorized': True,            # NumPy batch scoring (token-by-token without numpy)
+            },
+            'ast': {
+                'enabled': True,
+                'timeout': 120,
+                'taint': True,                 # Interprocedural flows from request input to query / lookup sinks
+            },
+            'external_tools': {
+                'enabled': True,
+                'timeout': 180,
+                'bandit_mode': 'in_process',   # 'in_process' (reuses parsed ASTs) or 'subprocess' (bandit CLI)
+                'dependency_audit': 'advisory_db',       # 'advisory_db' (offline, synced separately) or 'pip_audit'
+                'advisory_db_path': DEFAULT_ADVISORY_DB_PATH,
+                'resolve_unpinned': True,      # Also audit unpinned PyPI requirements with pip-audit (network)
+            },
             'llm': {
                 'enabled': True,
                 'enable_hunt_mode': True,      # New: Main toggle for LLM hunting
                 'enable_risk_summary': True,   # New: Toggle for final summary
                 'max_hunts': 3,                # New: Max number of seeds to investigate
             },
+            'execution': {
+                'mode': 'concurrent',          # 'concurrent' or 'sequential'
+                'use_processes': True,         # CPU-bound stages in a process pool
+                'workers': None,               # Per-stage file shard workers (None: one per CPU)
+                'shard_min_files': DEFAULT_MIN_FILES,
+            },
+            'paths': {
+                'max_file_bytes': DEFAULT_MAX_FILE_BYTES,  # Larger files are not scanned (0: no cap)
+                'detect_generated': True,      # Skip files whose head marks them as generated/minified
+                'measure_pruned': False,       # Walk pruned directories (node_modules, .venv) to count their bytes
+            },
+            'findings_cache': {
+                'enabled': True,               # Reuse per-file findings for unchanged blobs
+                'path': DEFAULT_CACHE_PATH,
+                'max_bytes': DEFAULT_MAX_BYTES,
+            },
+            'correlation': {'enabled': True},  # Merge equivalent findings from different sources
+            'aggregation': {
+                'enabled': True,               # Collapse repeated (rule, file) hits into grouped records
+                'min_occurrences': DEFAULT_MIN_OCCURRENCES,
+                'max_lines': DEFAULT_MAX_LINES,          # Line numbers listed per grouped record
+                'max_per_rule': DEFAULT_MAX_PER_RULE,    # Records kept per rule (0: no cap)
+                'max_per_file': DEFAULT_MAX_PER_FILE,    # Records kept per file (0: no cap)
+            },
             'deduplicate': True,
             'filter_low_confidence': True
         }
@@ -63,13 +162,64 @@ class AnalysisOrchestrator:
         return {}
 
     def _load_analyzers(self):
-        if self.config.get('regex', {}).get('enabled'): self.regex_analyzer = RegexAnalyzer()
-        if self.config.get('ast', {}).get('enabled'): self.ast_analyzer = ASTAnalyzer()
-        if self.config.get('external_tools', {}).get('enabled'): self.external_tool_analyzer = ExternalToolAnalyzer()
+        execution = self.config.get('execution', {})
+        sharding = {
+            'workers': execution.get('workers') if execution.get('use_processes', True) else 1,
+            'min_shard_files': execution.get('shard_min_files', DEFAULT_MIN_FILES),
+        }
+        cache_config = self.config.get('findings_cache', {})
+        if cache_config.get('enabled'):
+            self.findings_cache = FindingsCache(
+                cache_config.get('path', DEFAULT_CACHE_PATH), cache_config.get('max_bytes', DEFAULT_MAX_BYTES)
+            )
+        regex_config = self.config.get('regex', {})
+        if regex_config.get('enabled'):
+            self.regex_analyzer = RegexAnalyzer(
+                **sharding, cache=self.findings_cache,
+                scan_mode=regex_config.get('scan_mode', 'line'),
+                mmap_min_bytes=regex_config.get('mmap_min_bytes', DEFAULT_MMAP_MIN_BYTES),
+                backend=regex_config.get('backend', 'python'),
+                guard=RegexGuard(
+                    max_line_length=regex_config.get('max_line_length', DEFAULT_MAX_LINE_LENGTH),
+                    file_budget=regex_config.get('file_budget', DEFAULT_FILE_BUDGET),
+                    rule_budget=regex_config.get('rule_budget', DEFAULT_RULE_BUDGET),
+                    linear_engine=regex_config.get('linear_engine', False),
+                )
+            )
+        secrets_config = self.config.get('secrets', {})
+        if secrets_config.get('enabled'):
+            self.secrets_analyzer = SecretsAnalyzer(
+                cache=self.findings_cache,
+                batch_tokens=secrets_config.get('batch_tokens', DEFAULT_BATCH_TOKENS),
+                vectorized=secrets_config.get('vectorized', True),
+            )
+        ast_config = self.config.get('ast', {})
+        if ast_config.get('enabled'):
+            self.ast_analyzer = ASTAnalyzer(**sharding, cache=self.findings_cache, taint=ast_config.get('taint', True))
+        external_config = self.config.get('external_tools', {})
+        if external_config.get('enabled'):
+            self.external_tool_analyzer = ExternalToolAnalyzer(
+                **sharding, cache=self.findings_cache,
+                bandit_mode=external_config.get('bandit_mode', 'in_process'),
+                dependency_audit=external_config.get('dependency_audit', 'advisory_db'),
+                advisory_db_path=external_config.get('advisory_db_path', DEFAULT_ADVISORY_DB_PATH),
+                resolve_unpinned=external_config.get('resolve_unpinned', True),
+            )
         if self.config.get('llm', {}).get('enabled'):
             self.llm_analyzer = LLMAnalyzer(config=self.config.get('llm'))
+        if self.config.get('correlation', {}).get('enabled'):
+            self.correlation_index = CorrelationIndex()
+
+    def build_index(self, repo_path) -> RepoIndex:
+        """File index of a checkout under this configuration's path policy (`paths` settings)"""
+        return RepoIndex(repo_path, policy=PathPolicy.for_repo(repo_path, **self.config.get('paths', {})))
 
-    def analyze(self, repo_path, repository_info=None):
+    def analyze(self, repo_path, repository_info=None, repo_index=None, carried_findings=None):
+        """
+        Run every enabled stage over `repo_index`. For incremental rescans the
+        index covers only changed files and `carried_findings` holds the base
+        scan's findings for the untouched ones; both are post-processed together.
+        """
         logger.info("=" * 70)
         logger.info("STARTING COMPREHENSIVE SECURITY ANALYSIS")
         logger.info("=" * 70)
@@ -78,12 +228,24 @@ class AnalysisOrchestrator:
         initial_findings = []
         metrics = {'by_source': {}, 'execution_times': {}, 'llm_risk_summary': '', 'llm_attack_chains': []}
         
+        # The file index is shared by every stage so the tree is walked once per scan
+        if repo_index is None:
+            index_start = time.time()
+            repo_index = self.build_index(repo_path)
+            metrics['execution_times']['repo_index'] = time.time() - index_start
+        
         # --- STAGES 1-3: Initial Static Analysis ---
-        if self.regex_analyzer: self._run_sub_analyzer(initial_findings, metrics, 'regex', self.regex_analyzer, repo_path)
-        if self.ast_analyzer: self._run_sub_analyzer(initial_findings, metrics, 'ast', self.ast_analyzer, repo_path)
-        if self.external_tool_analyzer: self._run_sub_analyzer(initial_findings, metrics, 'external_tools', self.external_tool_analyzer, repo_path)
+        stages = [(name, analyzer) for name, analyzer in self._static_stages() if analyzer]
+        if self.config.get('execution', {}).get('mode') == 'concurrent' and len(stages) > 1:
+            self._run_stages_concurrently(initial_findings, metrics, stages, repo_path, repo_index)
+        else:
+            for name, analyzer in stages:
+                self._run_sub_analyzer(initial_findings, metrics, name, analyzer, repo_path, repo_index)
         
         all_findings = list(initial_findings)
+        if carried_findings:
+            all_findings.extend(carried_findings)
+            metrics['by_source']['carried_over'] = len(carried_findings)
         
         # --- STAGE 4: LLM Vulnerability Hunting ---
         llm_config = self.config.get('llm', {})
@@ -92,11 +254,11 @@ class AnalysisOrchestrator:
             llm_start = time.time()
             
             # Select high-confidence findings as "seeds" for the hunt
-            seed_findings = self._select_seed_findings(all_findings)
+            seed_findings = self._select_seed_findings(all_findings, repo_index)
             
             # The LLM now returns a dictionary of results
             full_findings_summary = self._summarize_findings(all_findings)
-            llm_results = self.llm_analyzer.analyze(repo_path, seed_findings, full_findings_summary)
+            llm_results = self.llm_analyzer.analyze(repo_path, seed_findings, full_findings_summary, repo_index=repo_index)
             
             linked_findings = llm_results.get('linked_findings', [])
             if linked_findings:
@@ -112,13 +274,23 @@ class AnalysisOrchestrator:
             logger.info(f"✅ LLM Hunt completed in {llm_time:.1f}s")
 
         # --- Post-Processing ---
-        final_findings = self._post_process_findings(all_findings)
+        final_findings = self._post_process_findings(all_findings, metrics)
         
         # --- Final Metrics ---
-        metrics['total_findings'] = len(final_findings)
-        metrics['by_severity'] = self._count_by_severity(final_findings)
         total_time = time.time() - start_time
         metrics['total_time'] = total_time
+        metrics['repo_index'] = repo_index.stats()
+        metrics['rule_packs'] = self.rule_packs()
+        metrics['analyzer_versions'] = self.analyzer_versions()
+        if self.findings_cache is not None:
+            metrics['findings_cache'] = combine_stats(
+                [self.findings_cache.stats()] +
+                [stats['findings_cache'] for stats in metrics.get('worker_stats', {}).values() if 'findings_cache' in stats]
+            )
+        metrics['ast_cache'] = combine_stats(
+            [repo_index.ast_cache.stats()] +
+            [stats['ast_cache'] for stats in metrics.get('worker_stats', {}).values()]
+        )
         
         logger.info("=" * 70)
         logger.info("ANALYSIS COMPLETE | Total Time: {:.1f}s".format(total_time))
@@ -129,41 +301,214 @@ class AnalysisOrchestrator:
         
         return final_findings, metrics
     
-    def _select_seed_findings(self, findings: List[Dict]) -> List[Dict]:
-        """Select high-confidence findings to act as seeds for the LLM hunt."""
-        seeds = [f for f in findings if f.get('severity') in ['CRITICAL', 'HIGH']]
+    def _select_seed_findings(self, findings: List[Dict], repo_index) -> List[Dict]:
+        """Select high-confidence findings to act as seeds for the LLM hunt (as plain dicts)."""
+        # Incremental scans analyze a subset view, but carried-over seeds live in untouched files
+        checkout = repo_index.full
+        seeds = [
+            f for f in findings
+            if f.get('severity') in ['CRITICAL', 'HIGH'] and f.get('file_path') and checkout.exists(f.get('file_path'))
+        ]
         # Sort by severity to prioritize the most critical seeds
         sorted_seeds = sorted(seeds, key=lambda x: self._severity_rank(x.get('severity')), reverse=True)
         max_hunts = self.config.get('llm', {}).get('max_hunts', 3)
         logger.info(f"Selected {min(len(sorted_seeds), max_hunts)} high-confidence findings as seeds for LLM hunt.")
-        return sorted_seeds[:max_hunts]
+        return [finding_to_dict(seed, checkout.read_text) for seed in sorted_seeds[:max_hunts]]
+
+    def rule_packs(self) -> Dict:
+        """Version and content hash of each rule pack the enabled stages loaded"""
+        packs = {
+            stage.rule_pack.name: stage.rule_pack.describe()
+            for stage in (self.regex_analyzer, self.secrets_analyzer, self.external_tool_analyzer, self.correlation_index)
+            if stage is not None
+        }
+        if self.external_tool_analyzer is not None and self.external_tool_analyzer.advisory_db is not None:
+            # Dependency findings are only as current as the last advisory sync
+            packs['advisories'] = self.external_tool_analyzer.advisory_db.describe()
+        return packs
 
-    def _run_sub_analyzer(self, all_findings, metrics, name, analyzer, repo_path):
+    def analyzer_versions(self) -> Dict:
+        """
+        Code and tool version of each enabled static stage (AST rule sources,
+        taint engine, Bandit, ...), which the rule-pack hashes do not cover
+        """
+        versions = {}
+        for name, analyzer in self._static_stages():
+            if analyzer is None:
+                continue
+            try:
+                versions[name] = analyzer.cache_identity()[1]
+            except (OSError, subprocess.SubprocessError) as e:
+                logger.warning("Cannot determine the {} analyzer version: {}".format(name, e))
+                versions[name] = None
+        taint = getattr(self.ast_analyzer, 'taint', None)
+        if taint is not None:
+            versions['taint'] = taint.version
+        return versions
+
+    def _static_stages(self):
+        analyzers = {
+            'regex': self.regex_analyzer,
+            'secrets': self.secrets_analyzer,
+            'ast': self.ast_analyzer,
+            'external_tools': self.external_tool_analyzer,
+        }
+        return [(name, analyzers[name]) for name in STATIC_STAGES]
+
+    def _run_stages_concurrently(self, all_findings, metrics, stages, repo_path, repo_index):
+        """
+        Run independent static stages in parallel: CPU-bound analyzers in a process
+        pool, subprocess-driven tools on threads. Each stage is bounded by its
+        configured `timeout`; findings are merged in the fixed stage order.
+        """
+        use_processes = self.config.get('execution', {}).get('use_processes', True)
+        if use_processes and multiprocessing.current_process().daemon:
+            # Celery prefork workers are daemonic and may not spawn children
+            logger.info("Running inside a daemonic worker; CPU-bound stages fall back to threads")
+            use_processes = False
+
+        # Sharded analyzers manage their own process pool, so they only need a thread here
+        process_stages = [
+            name for name, analyzer in stages
+            if use_processes and name in PROCESS_STAGES and not self._is_sharded(analyzer)
+        ]
+        process_pool = ProcessPoolExecutor(max_workers=len(process_stages)) if process_stages else None
+        thread_pool = ThreadPoolExecutor(max_workers=len(stages), thread_name_prefix='analysis-stage')
+
+        logger.info("Running {} stages concurrently (processes: {})".format(
+            ', '.join(name.upper() for name, _ in stages), process_stages or 'none'))
+        submitted = {}
+        analyzer_by_name = dict(stages)
+        timed_out = False
+        try:
+            for name, analyzer in stages:
+                pool = process_pool if name in process_stages else thread_pool
+                submitted[name] = (pool.submit(_run_stage, analyzer, repo_path, repo_index), time.time())
+
+            for name, _ in stages:
+                future, started = submitted[name]
+                timeout = self.config.get(name, {}).get('timeout')
+                remaining = max(0.0, started + timeout - time.time()) if timeout else None
+                try:
+                    findings, elapsed, worker_stats = future.result(timeout=remaining)
+                    guard_summary = worker_stats.pop('regex_guard', None)
+                    audit_summary = worker_stats.pop('dependency_audit', None)
+                except FutureTimeoutError:
+                    future.cancel()
+                    if self._is_sharded(analyzer_by_name[name]):
+                        analyzer_by_name[name].runner.cancel()
+                    timed_out = timed_out or name in process_stages
+                    metrics['execution_times'][name] = time.time() - started
+                    metrics.setdefault('timed_out_stages', []).append(name)
+                    logger.error(f"❌ {name.title()} analysis exceeded its {timeout}s timeout; results discarded")
+                    continue
+                except Exception as e:
+                    logger.error(f"❌ {name.title()} analysis failed: {e}", exc_info=True)
+                    continue
+
+                all_findings.extend(findings)
+                metrics['execution_times'][name] = elapsed
+                metrics['by_source'][name] = len(findings)
+                if guard_summary is not None:
+                    metrics['regex_guard'] = guard_summary
+                if audit_summary is not None:
+                    metrics['dependency_audit'] = audit_summary
+                if name in process_stages:
+                    # Work done in a child process never touches this process's caches
+                    metrics.setdefault('worker_stats', {})[name] = worker_stats
+                self._record_shard_stats(metrics, name, analyzer_by_name[name])
+                logger.info(f"✅ {name.title()}: {len(findings)} findings in {elapsed:.1f}s")
+        finally:
+            thread_pool.shutdown(wait=False, cancel_futures=True)
+            if process_pool:
+                if timed_out:
+                    # A stuck stage would otherwise keep burning a core after we stop waiting
+                    for process in list(getattr(process_pool, '_processes', {}).values()):
+                        process.terminate()
+                process_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _is_sharded(self, analyzer):
+        runner = getattr(analyzer, 'runner', None)
+        return runner is not None and runner.parallel
+
+    def _record_shard_stats(self, metrics, name, analyzer):
+        runner = getattr(analyzer, 'runner', None)
+        if runner is None or not runner.stats.get('shards'):
+            return
+        metrics.setdefault('sharding', {})[name] = {
+            key: value for key, value in runner.stats.items() if key not in ('repo_index', 'ast_cache')
+        }
+        metrics.setdefault('worker_stats', {})[name] = {
+            'repo_index': runner.stats['repo_index'],
+            'ast_cache': runner.stats['ast_cache'],
+        }
+
+    def _run_sub_analyzer(self, all_findings, metrics, name, analyzer, repo_path, repo_index):
         logger.info(f"Running {name.upper()} Analysis...")
         start = time.time()
         try:
-            findings = analyzer.analyze(repo_path)
-            all_findings.extend(findings)
+            # Streaming analyzers feed the combined list directly, without a per-stage list
+            before = len(all_findings)
+            iter_findings = getattr(analyzer, 'iter_findings', None)
+            all_findings.extend(iter_findings(repo_path, repo_index) if iter_findings else analyzer.analyze(repo_path, repo_index))
+            found = len(all_findings) - before
             elapsed = time.time() - start
             metrics['execution_times'][name] = elapsed
-            metrics['by_source'][name] = len(findings)
-            logger.info(f"✅ {name.title()}: {len(findings)} findings in {elapsed:.1f}s")
+            metrics['by_source'][name] = found
+            if getattr(analyzer, 'guard', None) is not None:
+                metrics['regex_guard'] = analyzer.guard.summary()
+            if getattr(analyzer, 'audit_summary', None) is not None:
+                metrics['dependency_audit'] = analyzer.audit_summary
+            self._record_shard_stats(metrics, name, analyzer)
+            logger.info(f"✅ {name.title()}: {found} findings in {elapsed:.1f}s")
         except Exception as e:
             logger.error(f"❌ {name.title()} analysis failed: {e}", exc_info=True)
 
-    def _post_process_findings(self, findings):
+    def _post_process_findings(self, findings, metrics):
+        """
+        Streaming post-processing: deduplication and filtering handle one finding
+        at a time, correlation and aggregation (which need every record of a file
+        or rule) work on the single buffered list, and ranking buckets findings by
+        severity instead of sorting a copy.
+        """
+        counts = {}
+        findings = counted(findings, counts, 'input')
         if self.config.get('deduplicate'):
-            original_count = len(findings)
-            findings = self._deduplicate_findings(findings)
-            logger.info(f"[Post-Processing] Deduplicated: {original_count} → {len(findings)} findings")
+            findings = counted(deduplicate(findings), counts, 'deduplicated')
+        
+        if self.correlation_index is not None:
+            findings, metrics['correlation'] = self.correlation_index.correlate(list(findings))
         
         if self.config.get('filter_low_confidence'):
-            original_count = len(findings)
-            findings = self._filter_findings(findings)
-            logger.info(f"[Post-Processing] Filtered low-confidence: {original_count} → {len(findings)} findings")
+            findings = counted(drop_low_confidence(findings), counts, 'confident')
         
-        logger.info("[Post-Processing] Ranking findings by severity...")
-        return sorted(findings, key=lambda x: self._severity_rank(x.get('severity')), reverse=True)
+        # Totals count every hit, before grouping and caps shrink the list
+        ranked = rank_by_severity(findings, weight=occurrences)
+        findings = ranked['findings']
+        metrics['total_findings'] = ranked['total']
+        metrics['by_severity'] = ranked['by_severity']
+        
+        aggregation = self.config.get('aggregation', {})
+        if aggregation.get('enabled'):
+            findings, metrics['aggregation'] = aggregate_findings(
+                findings,
+                min_occurrences=aggregation.get('min_occurrences', DEFAULT_MIN_OCCURRENCES),
+                max_lines=aggregation.get('max_lines', DEFAULT_MAX_LINES),
+                max_per_rule=aggregation.get('max_per_rule', DEFAULT_MAX_PER_RULE),
+                max_per_file=aggregation.get('max_per_file', DEFAULT_MAX_PER_FILE),
+            )
+        else:
+            findings = list(findings)
+        
+        counts['records'] = len(findings)
+        if 'correlation' in metrics:
+            counts['correlated'] = metrics['correlation']['records']
+        metrics['post_processing'] = counts
+        logger.info("[Post-Processing] {}".format(
+            " → ".join("{} {}".format(counts[key], key) for key in
+                       ('input', 'deduplicated', 'correlated', 'confident', 'records') if key in counts)
+        ))
+        return findings
 
     def _summarize_findings(self, findings):
         return {
@@ -173,38 +518,22 @@ class AnalysisOrchestrator:
             'samples': [f"{f.get('shortform_keyword')} in {f.get('file_path')}:L{f.get('line_number')}" for f in findings[:15]]
         }
 
-    def _deduplicate_findings(self, findings):
-        seen, unique = set(), []
-        for finding in findings:
-            # LLM-hunted findings are unique and shouldn't be deduplicated against file-specific ones
-            if finding.get('source') == 'llm-hunter':
-                unique.append(finding)
-                continue
-            key = (finding.get('file_path'), finding.get('line_number'), finding.get('shortform_keyword'))
-            if key not in seen:
-                seen.add(key)
-                unique.append(finding)
-        return unique
-
-    def _filter_findings(self, findings):
-        return [f for f in findings if f.get('confidence', 'MEDIUM') != 'LOW']
-
     def _count_by_severity(self, findings):
         counts = {'CRITICAL': 0, 'HIGH': 0, 'MEDIUM': 0, 'LOW': 0, 'INFO': 0}
         for f in findings:
             sev = f.get('severity', 'MEDIUM')
-            if sev in counts: counts[sev] += 1
+            if sev in counts: counts[sev] += occurrences(f)
         return counts
 
     def _count_by_type(self, findings):
         counts = {}
         for f in findings:
             keyword = f.get('shortform_keyword', 'UNKNOWN')
-            counts[keyword] = counts.get(keyword, 0) + 1
+            counts[keyword] = counts.get(keyword, 0) + occurrences(f)
         return counts
 
     def _severity_rank(self, severity):
         return {'CRITICAL': 5, 'HIGH': 4, 'MEDIUM': 3, 'LOW': 2, 'INFO': 1}.get(severity, 0)
 
-    def run(self, repo_path, repository_info):
-        return self.analyze(repo_path, repository_info)
+    def run(self, repo_path, repository_info, repo_index=None, carried_findings=None):
+        return self.analyze(repo_path, repository_info, repo_index, carried_findings)
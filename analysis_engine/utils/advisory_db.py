@@ -0,0 +1,373 @@
+import os
+import re
+import json
+import time
+import bisect
+import shutil
+import sqlite3
+import logging
+import zipfile
+import argparse
+import tempfile
+import threading
+import urllib.parse
+import urllib.request
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from analysis_engine.utils.manifests import ECOSYSTEMS
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_DB_PATH = os.path.join(BASE_DIR, "cache", "advisories.sqlite3")
+# OSV publishes one archive of every advisory per ecosystem
+OSV_ARCHIVE_URL = "https://osv-vulnerabilities.storage.googleapis.com/{ecosystem}/all.zip"
+DOWNLOAD_TIMEOUT = 300
+# SQLite's default limit on host parameters per statement is 999
+QUERY_BATCH = 500
+# Range types whose events are comparable versions (GIT ranges are commit hashes)
+VERSION_RANGE_TYPES = {'ECOSYSTEM', 'SEMVER'}
+# Advisory severity labels mapped onto finding severities
+SEVERITY_LABELS = {'CRITICAL': 'CRITICAL', 'HIGH': 'HIGH', 'MODERATE': 'MEDIUM', 'MEDIUM': 'MEDIUM', 'LOW': 'LOW'}
+# What pip-audit findings were always reported as when an advisory carries no label
+DEFAULT_SEVERITY = 'HIGH'
+
+# Version words that sort before a release, in order; unknown words sort after it (post-releases)
+PRE_RELEASE = {'dev': 0, 'snapshot': 0, 'a': 1, 'alpha': 1, 'b': 2, 'beta': 2, 'c': 3, 'rc': 3, 'cr': 3, 'pre': 3, 'preview': 3, 'm': 3}
+# Words that mean "the release itself" (Maven's 1.0.Final)
+RELEASE_WORDS = {'final', 'ga', 'release'}
+VERSION_TOKEN = re.compile(r'\d+|[a-zA-Z]+')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS advisories (
+    id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    aliases TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS affected (
+    ecosystem TEXT NOT NULL,
+    package TEXT NOT NULL,
+    advisory_id TEXT NOT NULL,
+    introduced TEXT,
+    fixed TEXT,
+    last_affected TEXT
+);
+CREATE INDEX IF NOT EXISTS affected_package ON affected (ecosystem, package);
+CREATE TABLE IF NOT EXISTS sync_state (
+    ecosystem TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL,
+    advisories INTEGER NOT NULL,
+    source TEXT NOT NULL
+);
+"""
+
+
+class Advisory(NamedTuple):
+    id: str
+    summary: str
+    severity: str
+    aliases: List[str]
+    fixed: Optional[str]
+
+    @property
+    def cve(self) -> str:
+        return next((alias for alias in self.aliases if alias.startswith('CVE-')), self.id)
+
+
+@lru_cache(maxsize=65536)
+def version_key(version: str) -> Tuple:
+    """
+    Ecosystem-agnostic ordering key for version strings. Numeric parts compare
+    numerically and trailing zeros are insignificant (1.0 == 1.0.0);
+    pre-releases sort before their release (1.0.dev0 < 1.0a1 < 1.0rc1 < 1.0),
+    post-releases after it (1.0 < 1.0.post1 < 1.0.1). Build metadata after '+'
+    is ignored.
+    """
+    tokens = []
+    for token in VERSION_TOKEN.findall(version.lower().split('+', 1)[0].lstrip('v')):
+        if token.isdigit():
+            tokens.append((2, int(token)))
+            continue
+        if token in RELEASE_WORDS:
+            continue
+        while tokens and tokens[-1] == (2, 0):
+            tokens.pop()
+        rank = PRE_RELEASE.get(token)
+        tokens.append((0, rank, token) if rank is not None else (1, 0, token))
+    while tokens and tokens[-1] == (2, 0):
+        tokens.pop()
+    tokens.append((1,))
+    return tuple(tokens)
+
+
+def lower_bound_key(version: Optional[str]) -> Tuple:
+    """Key of an `introduced` version; "0" (and no bound) sorts before every version"""
+    return () if version in (None, '0') else version_key(version)
+
+
+def normalize_package(ecosystem: str, name: str) -> str:
+    if ecosystem == 'PyPI':
+        # PEP 503: Flask_Cors, flask.cors and flask-cors are one project
+        return re.sub(r'[-_.]+', '-', name).lower()
+    if ecosystem in ('npm', 'Packagist', 'NuGet'):
+        return name.lower()
+    return name
+
+
+def affected_ranges(affected: Dict) -> List[Tuple[Optional[str], Optional[str], Optional[str]]]:
+    """(introduced, fixed, last_affected) intervals of one OSV `affected` entry"""
+    intervals = []
+    for version_range in affected.get('ranges') or ():
+        if version_range.get('type') not in VERSION_RANGE_TYPES:
+            continue
+        events = []
+        for event in version_range.get('events') or ():
+            for kind in ('introduced', 'fixed', 'last_affected'):
+                if kind in event:
+                    events.append((kind, event[kind]))
+        events.sort(key=lambda event: lower_bound_key(event[1]))
+        start = None
+        for kind, version in events:
+            if kind == 'introduced':
+                if start is None:
+                    start = version
+            elif start is not None:
+                intervals.append((start, version, None) if kind == 'fixed' else (start, None, version))
+                start = None
+        if start is not None:
+            intervals.append((start, None, None))
+    if not intervals:
+        # Only commit ranges: fall back to the enumerated affected versions
+        intervals = [(version, None, version) for version in affected.get('versions') or ()]
+    return intervals
+
+
+def advisory_severity(advisory: Dict, affected: Dict) -> str:
+    for source in (advisory.get('database_specific'), affected.get('ecosystem_specific'), affected.get('database_specific')):
+        label = (source or {}).get('severity')
+        if isinstance(label, str) and label.upper() in SEVERITY_LABELS:
+            return SEVERITY_LABELS[label.upper()]
+    return DEFAULT_SEVERITY
+
+
+class AdvisoryDB:
+    """
+    Local store of OSV vulnerability advisories, synced separately from scans
+    (see `sync`) and queried offline. Affected version ranges are indexed by
+    (ecosystem, package); a lookup loads each package's ranges once, sorted by
+    their lower bound, and bisects them, so auditing a few hundred pinned
+    dependencies is a handful of indexed queries. Like the findings cache, the
+    database is opened lazily per process.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+        # (ecosystem, package) -> (lower-bound keys, ranges) in lower-bound order
+        self._ranges: Dict[Tuple[str, str], Tuple[List, List]] = {}
+        self._synced_at = None
+
+    # -----------------------------
+    # CONNECTION
+    # -----------------------------
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_lock'] = None
+        state['_ranges'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def synced(self) -> bool:
+        """Whether any ecosystem has been synced (never creates the database)"""
+        if not os.path.exists(self.path):
+            return False
+        return bool(self.describe()['ecosystems'])
+
+    def describe(self) -> Dict:
+        """Synced ecosystems and their sync times; changes whenever advisories are re-synced"""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT ecosystem, synced_at, advisories FROM sync_state ORDER BY ecosystem"
+            ).fetchall()
+        return {
+            'ecosystems': {ecosystem: int(synced_at) for ecosystem, synced_at, _ in rows},
+            'advisories': sum(count for _, _, count in rows),
+        }
+
+    # -----------------------------
+    # LOOKUP
+    # -----------------------------
+    def lookup(self, dependencies: Iterable) -> List[Tuple]:
+        """(dependency, Advisory) for every advisory affecting a dependency's pinned version"""
+        dependencies = list(dependencies)
+        by_ecosystem: Dict[str, set] = {}
+        for dependency in dependencies:
+            by_ecosystem.setdefault(dependency.ecosystem, set()).add(normalize_package(dependency.ecosystem, dependency.name))
+        with self._lock:
+            conn = self._connection()
+            synced_at = conn.execute("SELECT max(synced_at) FROM sync_state").fetchone()[0]
+            if synced_at != self._synced_at:
+                # Re-synced (possibly by another process) since ranges were loaded
+                self._ranges = {}
+                self._synced_at = synced_at
+            for ecosystem, packages in by_ecosystem.items():
+                self._load_ranges(conn, ecosystem, packages)
+
+            matches = []
+            for dependency in dependencies:
+                package = normalize_package(dependency.ecosystem, dependency.name)
+                lower_keys, ranges = self._ranges.get((dependency.ecosystem, package), ((), ()))
+                key = version_key(dependency.version)
+                for lower, upper, inclusive, advisory_id, fixed in ranges[:bisect.bisect_right(lower_keys, key)]:
+                    if upper is None or key < upper or (inclusive and key == upper):
+                        matches.append((dependency, advisory_id, fixed))
+            advisories = self._advisories(conn, {advisory_id for _, advisory_id, _ in matches})
+
+        found = []
+        for dependency, advisory_id, fixed in matches:
+            summary, severity, aliases = advisories.get(advisory_id, ('', DEFAULT_SEVERITY, []))
+            found.append((dependency, Advisory(advisory_id, summary, severity, aliases, fixed)))
+        return found
+
+    def _load_ranges(self, conn, ecosystem: str, packages: set):
+        wanted = [package for package in packages if (ecosystem, package) not in self._ranges]
+        for start in range(0, len(wanted), QUERY_BATCH):
+            batch = wanted[start:start + QUERY_BATCH]
+            rows = conn.execute(
+                "SELECT package, advisory_id, introduced, fixed, last_affected FROM affected "
+                "WHERE ecosystem = ? AND package IN ({})".format(','.join('?' * len(batch))),
+                [ecosystem] + batch
+            ).fetchall()
+            loaded: Dict[str, List] = {package: [] for package in batch}
+            for package, advisory_id, introduced, fixed, last_affected in rows:
+                lower = lower_bound_key(introduced)
+                upper = fixed if fixed is not None else last_affected
+                loaded[package].append((
+                    lower, None if upper is None else version_key(upper), fixed is None, advisory_id, fixed
+                ))
+            for package, ranges in loaded.items():
+                ranges.sort(key=lambda entry: entry[0])
+                self._ranges[(ecosystem, package)] = ([entry[0] for entry in ranges], ranges)
+
+    def _advisories(self, conn, advisory_ids) -> Dict[str, Tuple]:
+        wanted = list(advisory_ids)
+        found = {}
+        for start in range(0, len(wanted), QUERY_BATCH):
+            batch = wanted[start:start + QUERY_BATCH]
+            for advisory_id, summary, severity, aliases in conn.execute(
+                "SELECT id, summary, severity, aliases FROM advisories WHERE id IN ({})".format(','.join('?' * len(batch))),
+                batch
+            ):
+                found[advisory_id] = (summary, severity, json.loads(aliases))
+        return found
+
+    # -----------------------------
+    # SYNC
+    # -----------------------------
+    def sync(self, ecosystem: str, archive_path: Optional[str] = None) -> int:
+        """
+        Replace one ecosystem's advisories with OSV's current archive (or a
+        previously downloaded `all.zip`). Returns the number of advisories stored.
+        """
+        if archive_path is not None:
+            return self.import_archive(ecosystem, archive_path, source=archive_path)
+        url = OSV_ARCHIVE_URL.format(ecosystem=urllib.parse.quote(ecosystem))
+        fd, tmp_path = tempfile.mkstemp(suffix='.zip')
+        try:
+            logger.info("Downloading {} advisories from {}".format(ecosystem, url))
+            with os.fdopen(fd, 'wb') as f, urllib.request.urlopen(url, timeout=DOWNLOAD_TIMEOUT) as response:
+                shutil.copyfileobj(response, f)
+            return self.import_archive(ecosystem, tmp_path, source=url)
+        finally:
+            os.unlink(tmp_path)
+
+    def import_archive(self, ecosystem: str, archive_path: str, source: str = '') -> int:
+        advisories, affected = [], []
+        with zipfile.ZipFile(archive_path) as archive:
+            for name in archive.namelist():
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    advisory = json.loads(archive.read(name))
+                except ValueError as e:
+                    logger.warning("Skipping malformed advisory {}: {}".format(name, e))
+                    continue
+                if advisory.get('withdrawn'):
+                    continue
+                rows = self._affected_rows(ecosystem, advisory)
+                if not rows:
+                    continue
+                severity = advisory_severity(advisory, next(
+                    (entry for entry in advisory.get('affected') or () if entry.get('package', {}).get('ecosystem') == ecosystem), {}
+                ))
+                summary = advisory.get('summary') or (advisory.get('details') or '').strip().split('\n', 1)[0]
+                advisories.append((advisory['id'], summary[:500], severity, json.dumps(advisory.get('aliases') or [])))
+                affected.extend(rows)
+
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM affected WHERE ecosystem = ?", (ecosystem,))
+                conn.executemany("INSERT OR REPLACE INTO advisories VALUES (?, ?, ?, ?)", advisories)
+                conn.executemany("INSERT INTO affected VALUES (?, ?, ?, ?, ?, ?)", affected)
+                conn.execute("DELETE FROM advisories WHERE id NOT IN (SELECT advisory_id FROM affected)")
+                conn.execute(
+                    "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                    (ecosystem, time.time(), len(advisories), source)
+                )
+            self._ranges = {}
+        logger.info("Synced {} {} advisories ({} affected ranges)".format(len(advisories), ecosystem, len(affected)))
+        return len(advisories)
+
+    @staticmethod
+    def _affected_rows(ecosystem: str, advisory: Dict) -> List[Tuple]:
+        rows = []
+        for affected in advisory.get('affected') or ():
+            package = affected.get('package') or {}
+            # Ecosystems may carry a release suffix (e.g. "Debian:12"); the archive is per base ecosystem
+            if package.get('ecosystem', '').split(':', 1)[0] != ecosystem or not package.get('name'):
+                continue
+            name = normalize_package(ecosystem, package['name'])
+            for introduced, fixed, last_affected in affected_ranges(affected):
+                rows.append((ecosystem, name, advisory['id'], introduced, fixed, last_affected))
+        return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync the offline vulnerability advisory database from OSV")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH)
+    parser.add_argument('--ecosystem', action='append', choices=sorted(set(ECOSYSTEMS.values())),
+                        help="Ecosystem to sync (repeatable; default: every ecosystem the scanner reads manifests for)")
+    parser.add_argument('--archive', help="Import a downloaded OSV all.zip instead of fetching it (needs one --ecosystem)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    ecosystems = args.ecosystem or sorted(set(ECOSYSTEMS.values()))
+    if args.archive and len(ecosystems) != 1:
+        parser.error("--archive needs exactly one --ecosystem")
+    db = AdvisoryDB(args.db)
+    for name in ecosystems:
+        db.sync(name, args.archive)
+    print(json.dumps(db.describe(), indent=2))
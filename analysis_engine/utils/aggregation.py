@@ -0,0 +1,113 @@
+import logging
+from typing import Dict, List, Tuple
+
+from analysis_engine.utils.findings import Finding
+
+logger = logging.getLogger(__name__)
+
+# A rule's hits in one file are collapsed once it fires this many times there
+DEFAULT_MIN_OCCURRENCES = 2
+# Line numbers listed per grouped record (the count stays exact)
+DEFAULT_MAX_LINES = 100
+# Records kept per rule across the repository, and per file; 0 disables a cap
+DEFAULT_MAX_PER_RULE = 500
+DEFAULT_MAX_PER_FILE = 200
+# Rules listed in the aggregation metrics
+REPORTED_RULES = 20
+
+# Findings that are never grouped or capped
+UNGROUPED_SOURCES = {'llm-hunter'}
+
+
+def occurrences(finding) -> int:
+    """How many raw hits a (possibly grouped) finding stands for"""
+    return finding.get('occurrences') or 1
+
+
+def _lines(finding) -> List[int]:
+    lines = finding.get('line_numbers')
+    if lines:
+        return list(lines)
+    line_number = finding.get('line_number')
+    return [line_number] if line_number is not None else []
+
+
+def _rule(finding) -> Tuple:
+    return finding.get('source'), finding.get('pattern_name') or finding.get('shortform_keyword')
+
+
+def _grouped(finding, count: int, lines: List[int]):
+    group = {'occurrences': count, 'line_numbers': lines}
+    if isinstance(finding, Finding):
+        return finding.with_extra(group)
+    return dict(finding, **group)
+
+
+def aggregate_findings(findings: List, min_occurrences: int = DEFAULT_MIN_OCCURRENCES,
+                       max_lines: int = DEFAULT_MAX_LINES, max_per_rule: int = DEFAULT_MAX_PER_RULE,
+                       max_per_file: int = DEFAULT_MAX_PER_FILE) -> Tuple[List, Dict]:
+    """
+    Collapse repeated hits of one rule in one file into a single record that
+    keeps the first hit's snippet plus `occurrences` and `line_numbers`, then
+    cap the records kept per rule and per file. Input order is preserved, so
+    on severity-ranked input the caps drop the least severe records first.
+    Returns the records and statistics on what was collapsed or omitted.
+    """
+    groups: Dict[Tuple, List] = {}
+    order = []
+    for finding in findings:
+        file_path = finding.get('file_path')
+        if finding.get('source') in UNGROUPED_SOURCES or not file_path:
+            order.append((None, finding))
+            continue
+        key = _rule(finding) + (file_path,)
+        members = groups.get(key)
+        if members is None:
+            groups[key] = members = []
+            order.append((key, None))
+        members.append(finding)
+
+    stats = {'input_findings': 0, 'records': 0, 'grouped_records': 0, 'collapsed_findings': 0,
+             'omitted_records': 0, 'omitted_findings': 0, 'capped_rules': {}}
+    per_rule: Dict[Tuple, int] = {}
+    per_file: Dict[str, int] = {}
+    records = []
+    for key, finding in order:
+        if key is None:
+            emitted = [finding]
+        else:
+            members = groups[key]
+            count = sum(occurrences(member) for member in members)
+            if min_occurrences and count >= min_occurrences and (len(members) > 1 or count > 1):
+                lines = sorted({line for member in members for line in _lines(member)})
+                emitted = [_grouped(members[0], count, lines[:max_lines] if max_lines else lines)]
+                stats['grouped_records'] += 1
+                stats['collapsed_findings'] += count - 1
+            else:
+                emitted = members
+
+        for finding in emitted:
+            stats['input_findings'] += occurrences(finding)
+            if finding.get('source') not in UNGROUPED_SOURCES:
+                rule, file_path = _rule(finding), finding.get('file_path')
+                over_rule = max_per_rule and per_rule.get(rule, 0) >= max_per_rule
+                over_file = max_per_file and file_path and per_file.get(file_path, 0) >= max_per_file
+                if over_rule or over_file:
+                    stats['omitted_records'] += 1
+                    stats['omitted_findings'] += occurrences(finding)
+                    name = rule[1] or 'UNKNOWN'
+                    stats['capped_rules'][name] = stats['capped_rules'].get(name, 0) + occurrences(finding)
+                    continue
+                per_rule[rule] = per_rule.get(rule, 0) + 1
+                if file_path:
+                    per_file[file_path] = per_file.get(file_path, 0) + 1
+            records.append(finding)
+
+    stats['records'] = len(records)
+    capped = sorted(stats['capped_rules'].items(), key=lambda item: -item[1])
+    stats['capped_rules'] = dict(capped[:REPORTED_RULES])
+    if stats['omitted_records']:
+        logger.warning("Finding caps omitted {} records ({} findings)".format(
+            stats['omitted_records'], stats['omitted_findings']
+        ))
+    return records, stats
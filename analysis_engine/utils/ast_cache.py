@@ -0,0 +1,122 @@
+import ast
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# Rough in-memory size of a parsed tree relative to its source text
+AST_BYTES_PER_SOURCE_BYTE = 12
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class ASTCache:
+    """
+    Per-scan cache of parsed Python modules keyed by (path, content hash).
+    Every AST consumer (ASTAnalyzer, endpoint extractors, ...) parses through
+    it so each file is parsed once per scan. Memory is bounded by an estimate
+    of tree size and the least recently used trees are evicted first.
+    Cached trees are shared: consumers must not mutate them. The one exception
+    is the in-process Bandit run, which annotates nodes with parent/sibling
+    links while it visits a tree (no other consumer reads those attributes or
+    depends on a node's __dict__) and removes them again. Stages running
+    on threads share one cache, so its bookkeeping is guarded by a lock; the
+    parse itself runs outside it.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self.parses = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.syntax_errors = 0
+        self._lock = threading.Lock()
+
+    def parse(self, path: str, source: str) -> ast.AST:
+        """Return the tree for `source`, parsing it only on a cache miss"""
+        key = (path, content_digest(source))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+                self.parses += 1
+        if entry is not None:
+            tree, _ = entry
+            if isinstance(tree, SyntaxError):
+                raise tree
+            return tree
+
+        try:
+            tree = ast.parse(source)
+        except SyntaxError as e:
+            # Remember failures too so broken files are not re-parsed by every consumer
+            with self._lock:
+                self.syntax_errors += 1
+                self._store(key, e, len(source))
+            raise
+        with self._lock:
+            self._store(key, tree, len(source) * AST_BYTES_PER_SOURCE_BYTE)
+        return tree
+
+    def _store(self, key, tree, cost):
+        """Insert under the lock; a key another thread stored meanwhile is replaced, not counted twice"""
+        if cost > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= previous[1]
+        self._entries[key] = (tree, cost)
+        self._size += cost
+        while self._size > self.max_bytes:
+            _, (_, evicted_cost) = self._entries.popitem(last=False)
+            self._size -= evicted_cost
+            self.evictions += 1
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'parses': self.parses,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'syntax_errors': self.syntax_errors,
+            'cached_trees': len(self._entries),
+            'estimated_bytes': self._size,
+        }
+
+
+def combine_stats(stats_list) -> Dict:
+    """Sum cache stats from several processes (the parent plus its stage workers)"""
+    combined = {}
+    for stats in stats_list:
+        for key, value in stats.items():
+            if key != 'hit_rate':
+                combined[key] = combined.get(key, 0) + value
+    lookups = combined.get('hits', 0) + combined.get('misses', 0)
+    combined['hit_rate'] = round(combined.get('hits', 0) / lookups, 4) if lookups else 0.0
+    return combined
+
+
+def content_digest(source: str) -> str:
+    return hashlib.blake2b(source.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
@@ -0,0 +1,115 @@
+import io
+import ast
+import logging
+import tokenize
+from typing import Dict, List, Optional
+
+try:
+    import bandit
+    from bandit.core import config as b_config
+    from bandit.core import manager as b_manager
+    from bandit.core import metrics as b_metrics
+    from bandit.core import node_visitor as b_node_visitor
+except ImportError:  # the bandit CLI is used instead
+    bandit = None
+
+logger = logging.getLogger(__name__)
+
+# Same thresholds as `bandit -ll` (medium severity and up, any confidence)
+MIN_SEVERITY = 'MEDIUM'
+MIN_CONFIDENCE = 'LOW'
+# Code lines around each issue, as `bandit -n 3` (the CLI default) reports them
+CONTEXT_LINES = 3
+# Links BanditNodeVisitor writes onto every node it visits; removed again from the scan's shared trees
+BANDIT_NODE_ATTRIBUTES = ('_bandit_parent', '_bandit_sibling')
+
+
+def available() -> bool:
+    return bandit is not None
+
+
+def bandit_version() -> str:
+    """Version line in the form `bandit --version` prints first"""
+    return 'bandit {}'.format(bandit.__version__)
+
+
+class BanditRunner:
+    """
+    Bandit driven through its manager API instead of the CLI. The manager
+    only supplies the configured test set; each file is then visited with
+    Bandit's own node visitor, over the module the scan already parsed when
+    one is given, so there is no subprocess, no second parse and no JSON
+    round trip. Issues come back as the dicts Bandit's JSON formatter emits.
+    """
+
+    def __init__(self):
+        if bandit is None:
+            raise RuntimeError("bandit is not installed")
+        self.manager = b_manager.BanditManager(b_config.BanditConfig(), 'file', quiet=True)
+
+    def scan(self, filename: str, source: str, tree=None) -> List[Dict]:
+        """
+        Issues in one file, at or above the -ll thresholds. `filename` is what
+        the issues report; `tree`, if given, must be `ast.parse(source)`.
+        Raises SyntaxError for files Bandit cannot parse.
+        """
+        data = source.encode('utf-8')
+        fdata = io.BytesIO(data)
+        metrics = b_metrics.Metrics()
+        metrics.begin(filename)
+        metrics.count_locs(data.splitlines())
+        visitor = b_node_visitor.BanditNodeVisitor(
+            filename, fdata, self.manager.b_ma, self.manager.b_ts, False, self._nosec_lines(fdata), metrics
+        )
+        if tree is None:
+            visitor.process(data)
+        else:
+            self._visit(visitor, tree)
+
+        lines = source.splitlines(True)
+        return [
+            self._issue_dict(issue, filename, lines) for issue in visitor.tester.results
+            if issue.filter(MIN_SEVERITY, MIN_CONFIDENCE)
+        ]
+
+    def _nosec_lines(self, fdata) -> Dict[int, Optional[set]]:
+        nosec_lines = {}
+        try:
+            fdata.seek(0)
+            for toktype, tokval, (lineno, _), _, _ in tokenize.tokenize(fdata.readline):
+                if toktype == tokenize.COMMENT:
+                    nosec_lines[lineno] = b_manager._parse_nosec_comment(tokval)
+        except tokenize.TokenError:
+            pass
+        fdata.seek(0)
+        return nosec_lines
+
+    @staticmethod
+    def _visit(visitor, tree):
+        # BanditNodeVisitor.process() minus its ast.parse: AST tests, then whole-file tests
+        try:
+            visitor.generic_visit(tree)
+            visitor.context = {
+                'file_data': visitor.fdata,
+                'filename': visitor.fname,
+                'lineno': 0,
+                'linerange': [0, 1],
+                'col_offset': 0,
+            }
+            visitor.update_scores(visitor.tester.run_tests(visitor.context, 'File'))
+        finally:
+            # The tree is the ASTCache's shared copy: leave it as parsed, and without
+            # parent <-> child cycles that would keep an evicted tree alive until the cycle GC
+            for node in ast.walk(tree):
+                for name in BANDIT_NODE_ATTRIBUTES:
+                    node.__dict__.pop(name, None)
+
+    @staticmethod
+    def _issue_dict(issue, filename, lines) -> Dict:
+        # as_dict() would read the code through linecache, keeping every scanned file in memory
+        data = issue.as_dict(with_code=False)
+        data['filename'] = filename
+        lmin = max(1, issue.lineno - CONTEXT_LINES // 2)
+        lmax = lmin + len(issue.linerange) + CONTEXT_LINES - 1
+        data['code'] = ''.join('%i %s' % (n, lines[n - 1]) for n in range(lmin, min(lmax, len(lines) + 1)))
+        return data
@@ -0,0 +1,162 @@
+import sys
+import logging
+from collections import deque
+from typing import Dict, List, Tuple
+
+from analysis_engine.utils.findings import Finding
+from analysis_engine.utils.rule_packs import load_rule_pack, require, source_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Rule pack of equivalent keywords (analysis_engine/rules/correlation.json)
+RULE_PACK = 'correlation'
+# Lines apart two findings may be and still describe one occurrence, unless a class sets its own
+DEFAULT_WINDOW = 2
+
+SEVERITY_RANK = {'CRITICAL': 5, 'HIGH': 4, 'MEDIUM': 3, 'LOW': 2, 'INFO': 1}
+CONFIDENCE_RANK = {'HIGH': 3, 'MEDIUM': 2, 'LOW': 1}
+# Which finding represents a merged record when severity and confidence tie
+SOURCE_PREFERENCE = {'taint': 5, 'ast': 4, 'bandit': 3, 'secrets': 3, 'regex': 2, 'llm-hunter': 1}
+
+
+def validate_rules(rules):
+    seen = {}
+    for name, rule in rules.items():
+        require(isinstance(rule, dict) and isinstance(rule.get('keywords'), list) and rule['keywords'],
+                RULE_PACK, name, "missing keywords")
+        window = rule.get('window', DEFAULT_WINDOW)
+        require(isinstance(window, int) and window >= 0, RULE_PACK, name, "window must be a non-negative integer")
+        for keyword in rule['keywords']:
+            require(keyword not in seen, RULE_PACK, name, "keyword {} already in class '{}'".format(keyword, seen.get(keyword)))
+            seen[keyword] = name
+
+
+def compile_rule_tables(rules):
+    classes, windows = {}, {}
+    for name, rule in rules.items():
+        windows[name] = rule.get('window', DEFAULT_WINDOW)
+        for keyword in rule['keywords']:
+            classes[keyword] = name
+    return {'classes': classes, 'windows': windows}
+
+
+def load_correlation_rules(path=None):
+    return load_rule_pack(
+        RULE_PACK, validate_rules, compile_rule_tables,
+        compiler_key=source_fingerprint(sys.modules[__name__]), path=path,
+    )
+
+
+def _representative_rank(finding):
+    return (
+        SEVERITY_RANK.get(finding.get('severity'), 0),
+        CONFIDENCE_RANK.get(finding.get('confidence', 'MEDIUM'), 0),
+        SOURCE_PREFERENCE.get(finding.get('source'), 0),
+    )
+
+
+def _sources(finding) -> List[str]:
+    return finding.get('sources') or [finding.get('source')]
+
+
+def _merge(members: List):
+    """One record for findings from different sources that describe the same issue"""
+    representative = max(members, key=_representative_rank)
+    sources = sorted({source for member in members for source in _sources(member)})
+    related = []
+    for member in members:
+        if member is not representative:
+            related.extend(member.get('correlated') or ())
+            related.append({
+                'source': member.get('source'),
+                'shortform_keyword': member.get('shortform_keyword'),
+                'line_number': member.get('line_number'),
+            })
+    related.extend(representative.get('correlated') or ())
+    # Agreement between independent analyzers is itself evidence
+    group = {'sources': sources, 'correlated': related}
+    if isinstance(representative, Finding):
+        merged = representative.with_extra(group)
+        merged.confidence = 'HIGH'
+        return merged
+    return dict(representative, confidence='HIGH', **group)
+
+
+class CorrelationIndex:
+    """
+    Merges findings that several analyzers report for the same issue: equal or
+    equivalent keywords (per the correlation rule pack) in the same file within
+    a few lines of each other. Findings are bucketed by (file, keyword class)
+    and swept in line order; open clusters live in a queue ordered by line,
+    expired once the sweep moves past their window, so the whole pass costs
+    one sort per bucket. A cluster takes at most one finding per source, so
+    repeated hits from a single analyzer stay separate records.
+    """
+
+    def __init__(self, rule_pack=None):
+        self.rule_pack = rule_pack if rule_pack is not None else load_correlation_rules()
+        self.classes = self.rule_pack.tables['classes']
+        self.windows = self.rule_pack.tables['windows']
+
+    def keyword_class(self, keyword: str) -> str:
+        return self.classes.get(keyword, keyword)
+
+    def correlate(self, findings: List) -> Tuple[List, Dict]:
+        """Findings with correlated ones merged, in input order, plus merge statistics"""
+        buckets: Dict[Tuple, List[int]] = {}
+        for position, finding in enumerate(findings):
+            line_number = finding.get('line_number')
+            file_path = finding.get('file_path')
+            if not file_path or not isinstance(line_number, int) or line_number < 0:
+                continue
+            key = (file_path, self.keyword_class(finding.get('shortform_keyword')))
+            buckets.setdefault(key, []).append(position)
+
+        # cluster id per finding position; members listed under the first position
+        owner: Dict[int, int] = {}
+        clusters: Dict[int, List[int]] = {}
+        for (_, keyword_class), positions in buckets.items():
+            if len(positions) < 2:
+                continue
+            window = self.windows.get(keyword_class, DEFAULT_WINDOW)
+            positions.sort(key=lambda position: findings[position].get('line_number'))
+            open_clusters = deque()  # (last line, first position, sources)
+            for position in positions:
+                finding = findings[position]
+                line_number = finding.get('line_number')
+                while open_clusters and open_clusters[0][0] < line_number - window:
+                    open_clusters.popleft()
+                sources = set(_sources(finding))
+                for index, (last_line, first, cluster_sources) in enumerate(open_clusters):
+                    if last_line >= line_number - window and not cluster_sources & sources:
+                        cluster_sources |= sources
+                        clusters[first].append(position)
+                        owner[position] = first
+                        open_clusters[index] = (max(last_line, line_number), first, cluster_sources)
+                        break
+                else:
+                    clusters[position] = [position]
+                    owner[position] = position
+                    open_clusters.append((line_number, position, sources))
+
+        merged_records = 0
+        correlated = []
+        for position, finding in enumerate(findings):
+            first = owner.get(position)
+            if first is None:
+                correlated.append(finding)
+            elif first == position:
+                members = clusters[first]
+                if len(members) == 1:
+                    correlated.append(finding)
+                else:
+                    correlated.append(_merge([findings[member] for member in members]))
+                    merged_records += 1
+        stats = {
+            'input_findings': len(findings),
+            'records': len(correlated),
+            'merged_records': merged_records,
+            'findings_merged': len(findings) - len(correlated),
+            'rule_pack': self.rule_pack.describe(),
+        }
+        return correlated, stats
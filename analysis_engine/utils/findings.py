@@ -0,0 +1,225 @@
+import sys
+import logging
+from typing import Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Snippets longer than this are truncated, matching what analyzers always stored
+MAX_SNIPPET_LENGTH = 300
+# A span is packed into one int: offset << SPAN_LENGTH_BITS | length
+SPAN_LENGTH_BITS = 16
+
+# Serialized key order, kept identical to the dicts analyzers used to emit
+CORE_KEYS = ('shortform_keyword', 'file_path', 'line_number', 'severity', 'context_snippet', 'source')
+# Keys stored directly in a slot of the same name
+FIELD_KEYS = frozenset(('shortform_keyword', 'file_path', 'line_number', 'severity', 'source', 'confidence'))
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class Finding:
+    """
+    A single analyzer finding in a compact, slotted form.
+
+    Repeated values (keyword, severity, source, confidence, rule and file path)
+    are interned so thousands of findings share one copy of each string, and
+    rarely used keys (Bandit and pip-audit details) live in an optional dict.
+    The snippet is either literal text or a span into the file's text as
+    returned by `RepoIndex.read_text`, identified by (file path, character
+    offset, length); spans are only read back when the finding is serialized.
+
+    Findings behave like read-only dicts (`get`, `[]`, `in`, `keys`) so code
+    written against the old dict findings keeps working. A span-backed
+    snippet has no value until resolved through `snippet(read_text)`.
+    """
+
+    __slots__ = (
+        'shortform_keyword', 'file_path', 'line_number', 'severity', 'source',
+        'confidence', 'pattern_name', '_snippet', 'extra',
+    )
+
+    def __init__(self, shortform_keyword, file_path, line_number, severity, source,
+                 confidence='MEDIUM', snippet='', pattern_name=None, extra=None):
+        self.shortform_keyword = _intern(shortform_keyword)
+        self.file_path = _intern(file_path)
+        self.line_number = line_number
+        self.severity = _intern(severity)
+        self.source = _intern(source)
+        self.confidence = _intern(confidence)
+        self.pattern_name = _intern(pattern_name)
+        self._snippet = snippet
+        self.extra = extra or None
+
+    @classmethod
+    def with_span(cls, shortform_keyword, file_path, line_number, severity, source,
+                  offset, length, **kwargs):
+        """Finding whose snippet is `length` characters at `offset` in the file's text"""
+        finding = cls(shortform_keyword, file_path, line_number, severity, source, **kwargs)
+        finding._snippet = (offset << SPAN_LENGTH_BITS) | min(length, MAX_SNIPPET_LENGTH)
+        return finding
+
+    @classmethod
+    def from_dict(cls, data: Dict, file_path=None) -> 'Finding':
+        """Build a finding from its dict form (or a findings-cache record)"""
+        data = dict(data)
+        span = data.pop('snippet_span', None)
+        finding = cls(
+            data.pop('shortform_keyword', None),
+            file_path if file_path is not None else data.pop('file_path', None),
+            data.pop('line_number', None),
+            data.pop('severity', None),
+            data.pop('source', None),
+            data.pop('confidence', 'MEDIUM'),
+            data.pop('context_snippet', ''),
+            data.pop('pattern_name', None),
+        )
+        data.pop('file_path', None)
+        finding.extra = data or None
+        if span is not None:
+            finding._snippet = (span[0] << SPAN_LENGTH_BITS) | span[1]
+        return finding
+
+    def with_extra(self, extra: Dict) -> 'Finding':
+        """Copy of this finding with `extra` merged into its extra fields"""
+        finding = _restore(*self.__reduce__()[1])
+        finding.extra = dict(self.extra or (), **extra)
+        return finding
+
+    # -----------------------------
+    # SNIPPETS
+    # -----------------------------
+    @property
+    def snippet_span(self):
+        """(offset, length) into the file's text, or None for a literal snippet"""
+        if type(self._snippet) is str:
+            return None
+        return self._snippet >> SPAN_LENGTH_BITS, self._snippet & ((1 << SPAN_LENGTH_BITS) - 1)
+
+    def snippet(self, read_text: Optional[Callable[[str], str]] = None) -> str:
+        """The snippet text, reading span-backed snippets through `read_text(file_path)`"""
+        span = self.snippet_span
+        if span is None:
+            return self._snippet
+        if read_text is None:
+            return None
+        offset, length = span
+        try:
+            return read_text(self.file_path)[offset:offset + length]
+        except OSError as e:
+            logger.debug("Cannot read snippet for {}:{}: {}".format(self.file_path, self.line_number, e))
+            return ''
+
+    # -----------------------------
+    # SERIALIZATION
+    # -----------------------------
+    def to_dict(self, read_text: Optional[Callable[[str], str]] = None) -> Dict:
+        """Dict form used in scan JSON, with the snippet materialized"""
+        data = {
+            'shortform_keyword': self.shortform_keyword,
+            'file_path': self.file_path,
+            'line_number': self.line_number,
+            'severity': self.severity,
+            'context_snippet': self.snippet(read_text),
+            'source': self.source,
+        }
+        if self.pattern_name is not None:
+            data['pattern_name'] = self.pattern_name
+        data['confidence'] = self.confidence
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def to_record(self) -> Dict:
+        """Path-free form for the findings cache; spans stay spans (they are valid per blob)"""
+        data = {
+            'shortform_keyword': self.shortform_keyword,
+            'line_number': self.line_number,
+            'severity': self.severity,
+            'source': self.source,
+            'confidence': self.confidence,
+        }
+        span = self.snippet_span
+        if span is None:
+            data['context_snippet'] = self._snippet
+        else:
+            data['snippet_span'] = list(span)
+        if self.pattern_name is not None:
+            data['pattern_name'] = self.pattern_name
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __reduce__(self):
+        # Positional state keeps pickles small when shards ship findings back
+        return _restore, (
+            self.shortform_keyword, self.file_path, self.line_number, self.severity, self.source,
+            self.confidence, self._snippet, self.pattern_name, self.extra,
+        )
+
+    # -----------------------------
+    # DICT COMPATIBILITY
+    # -----------------------------
+    def keys(self) -> Iterator[str]:
+        yield from CORE_KEYS
+        if self.pattern_name is not None:
+            yield 'pattern_name'
+        yield 'confidence'
+        if self.extra:
+            yield from self.extra
+
+    def get(self, key, default=None):
+        if key in FIELD_KEYS:
+            return getattr(self, key)
+        if key == 'context_snippet':
+            return self.snippet()
+        if key == 'pattern_name':
+            return default if self.pattern_name is None else self.pattern_name
+        if self.extra:
+            return self.extra.get(key, default)
+        return default
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        return self.get(key)
+
+    def __contains__(self, key):
+        if key in FIELD_KEYS or key == 'context_snippet':
+            return True
+        if key == 'pattern_name':
+            return self.pattern_name is not None
+        return bool(self.extra) and key in self.extra
+
+    def __eq__(self, other):
+        if not isinstance(other, Finding):
+            return NotImplemented
+        return self.__reduce__()[1] == other.__reduce__()[1]
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "Finding({}, {}:{}, {})".format(self.shortform_keyword, self.file_path, self.line_number, self.severity)
+
+
+def _restore(shortform_keyword, file_path, line_number, severity, source, confidence, snippet, pattern_name, extra):
+    finding = Finding(shortform_keyword, file_path, line_number, severity, source, confidence, pattern_name=pattern_name, extra=extra)
+    finding._snippet = snippet
+    return finding
+
+
+def finding_to_dict(finding, read_text: Optional[Callable[[str], str]] = None) -> Dict:
+    """Dict form of either a `Finding` or an already plain dict finding"""
+    if isinstance(finding, Finding):
+        return finding.to_dict(read_text)
+    return finding
+
+
+def json_default(read_text: Optional[Callable[[str], str]] = None):
+    """`default=` hook for json.dump that materializes findings one at a time"""
+    def default(obj):
+        if isinstance(obj, Finding):
+            return obj.to_dict(read_text)
+        raise TypeError("Object of type {} is not JSON serializable".format(type(obj).__name__))
+    return default
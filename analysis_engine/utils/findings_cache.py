@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from analysis_engine.utils.findings import Finding
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_CACHE_PATH = os.path.join(BASE_DIR, "cache", "findings.sqlite3")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Eviction trims below the budget so a full cache isn't evicting on every store
+EVICTION_TARGET_RATIO = 0.9
+# SQLite's default limit on host parameters per statement is 999
+QUERY_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS findings (
+    blob_sha TEXT NOT NULL,
+    analyzer TEXT NOT NULL,
+    ruleset_version TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (blob_sha, analyzer, ruleset_version)
+);
+CREATE INDEX IF NOT EXISTS findings_last_used ON findings (last_used);
+"""
+
+
+def ruleset_version(*parts) -> str:
+    """Stable short hash identifying an analyzer's rules and engine settings"""
+    encoded = json.dumps(parts, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+class FindingsCache:
+    """
+    Persistent per-file findings cache shared across scans, keyed by
+    (git blob sha, analyzer name, rule-set version). Unchanged files are served
+    from it instead of being re-analyzed, so rescanning a repository costs
+    roughly the work of the files that changed. Findings are stored without
+    their path and re-stamped on load, so the same blob at another path (or in
+    another repository) is a hit as well. Total payload size is bounded and the
+    least recently used entries are evicted first.
+
+    The database is opened lazily per process; analyzers shipped to worker
+    processes carry the cache object but never touch the database there.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._conn = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    # -----------------------------
+    # CONNECTION
+    # -----------------------------
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    # -----------------------------
+    # BLOB-LEVEL ACCESS
+    # -----------------------------
+    def get_many(self, analyzer: str, version: str, blob_shas: Iterable[str]) -> Dict[str, List[Dict]]:
+        """Cached finding records (path-free dicts) for every blob that has an entry"""
+        wanted = list(dict.fromkeys(blob_shas))
+        found = {}
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            for start in range(0, len(wanted), QUERY_BATCH):
+                batch = wanted[start:start + QUERY_BATCH]
+                rows = conn.execute(
+                    "SELECT blob_sha, payload FROM findings WHERE analyzer = ? AND ruleset_version = ? "
+                    "AND blob_sha IN ({})".format(','.join('?' * len(batch))),
+                    [analyzer, version] + batch
+                ).fetchall()
+                for blob_sha, payload in rows:
+                    found[blob_sha] = json.loads(zlib.decompress(payload))
+                if rows:
+                    conn.executemany(
+                        "UPDATE findings SET last_used = ? WHERE blob_sha = ? AND analyzer = ? AND ruleset_version = ?",
+                        [(now, blob_sha, analyzer, version) for blob_sha, _ in rows]
+                    )
+            conn.commit()
+        return found
+
+    def put_many(self, analyzer: str, version: str, entries: Dict[str, List[Dict]]):
+        if not entries:
+            return
+        now = time.time()
+        rows = []
+        for blob_sha, findings in entries.items():
+            payload = zlib.compress(json.dumps(findings, separators=(',', ':'), default=str).encode('utf-8'))
+            rows.append((blob_sha, analyzer, version, payload, len(payload), now))
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO findings (blob_sha, analyzer, ruleset_version, payload, size, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            self.stores += len(rows)
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM findings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = total - int(self.max_bytes * EVICTION_TARGET_RATIO)
+        freed, victims = 0, []
+        for rowid, size in conn.execute("SELECT rowid, size FROM findings ORDER BY last_used"):
+            victims.append((rowid,))
+            freed += size
+            if freed >= target:
+                break
+        conn.executemany("DELETE FROM findings WHERE rowid = ?", victims)
+        self.evictions += len(victims)
+        logger.info("Findings cache over budget; evicted {} entries ({} bytes)".format(len(victims), freed))
+
+    # -----------------------------
+    # FILE-LEVEL ACCESS
+    # -----------------------------
+    def load(self, identity: Tuple[str, str], repo_index, files) -> Dict[str, List[Finding]]:
+        """Findings for every indexed file whose blob is cached, keyed by rel_path"""
+        analyzer, version = identity
+        shas = self._file_shas(repo_index, files)
+        cached = self.get_many(analyzer, version, shas.values())
+        loaded = {}
+        for rel_path, blob_sha in shas.items():
+            findings = cached.get(blob_sha)
+            if findings is None:
+                continue
+            loaded[rel_path] = [Finding.from_dict(record, file_path=rel_path) for record in findings]
+        self.hits += len(loaded)
+        self.misses += len(shas) - len(loaded)
+        return loaded
+
+    def store(self, identity: Tuple[str, str], repo_index, by_file: Dict[str, List[Finding]]):
+        analyzer, version = identity
+        entries = {}
+        for rel_path, findings in by_file.items():
+            blob_sha = self._file_sha(repo_index, rel_path)
+            if blob_sha is None:
+                continue
+            # Snippet spans are offsets into the blob's text, so they hold wherever the blob recurs
+            entries[blob_sha] = [finding.to_record() for finding in findings]
+        self.put_many(analyzer, version, entries)
+
+    def _file_shas(self, repo_index, files) -> Dict[str, str]:
+        shas = {}
+        for indexed in files:
+            blob_sha = self._file_sha(repo_index, indexed.rel_path)
+            if blob_sha is not None:
+                shas[indexed.rel_path] = blob_sha
+        return shas
+
+    def _file_sha(self, repo_index, rel_path) -> Optional[str]:
+        try:
+            return repo_index.blob_sha(rel_path)
+        except OSError as e:
+            logger.debug("Cannot hash {}: {}".format(rel_path, e))
+            return None
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'stores': self.stores,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,117 @@
+import os
+import json
+import logging
+import tempfile
+from itertools import chain
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+from analysis_engine.utils.findings import finding_to_dict
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_ORDER = ('CRITICAL', 'HIGH', 'MEDIUM', 'LOW', 'INFO')
+
+
+# -----------------------------
+# STAGES
+# -----------------------------
+def counted(findings: Iterable, stats: Dict, key: str) -> Iterator:
+    """Pass findings through, counting them into `stats[key]`"""
+    stats.setdefault(key, 0)
+    for finding in findings:
+        stats[key] += 1
+        yield finding
+
+
+def deduplicate(findings: Iterable) -> Iterator:
+    """Drop exact (file, line, keyword) repeats; LLM-hunted findings are always kept"""
+    seen = set()
+    for finding in findings:
+        if finding.get('source') == 'llm-hunter':
+            yield finding
+            continue
+        key = (finding.get('file_path'), finding.get('line_number'), finding.get('shortform_keyword'))
+        if key not in seen:
+            seen.add(key)
+            yield finding
+
+
+def drop_low_confidence(findings: Iterable) -> Iterator:
+    for finding in findings:
+        if finding.get('confidence', 'MEDIUM') != 'LOW':
+            yield finding
+
+
+def rank_by_severity(findings: Iterable, weight: Callable = lambda finding: 1) -> Dict:
+    """
+    Stable most-severe-first ordering in one pass: findings are dropped into
+    one bucket per severity level (unknown severities last) and the buckets
+    are chained, so no sorted copy of the list is made. Returns the ranked
+    iterator plus the weighted totals counted on the way.
+    """
+    buckets = {severity: [] for severity in SEVERITY_ORDER}
+    unranked = []
+    by_severity = dict.fromkeys(SEVERITY_ORDER, 0)
+    total = 0
+    for finding in findings:
+        severity = finding.get('severity')
+        count = weight(finding)
+        total += count
+        bucket = buckets.get(severity)
+        if bucket is None:
+            unranked.append(finding)
+            continue
+        bucket.append(finding)
+        by_severity[severity] += count
+    return {
+        'findings': chain(*buckets.values(), unranked),
+        'total': total,
+        'by_severity': by_severity,
+    }
+
+
+# -----------------------------
+# PERSISTENCE
+# -----------------------------
+def write_findings_jsonl(path: str, findings: Iterable, read_text: Optional[Callable[[str], str]] = None) -> int:
+    """
+    Write findings as JSON Lines, materializing one finding at a time. The file
+    is written beside `path` and renamed into place, so readers never see a
+    partial result. Returns the number of findings written.
+    """
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    written = 0
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for finding in findings:
+                f.write(json.dumps(finding_to_dict(finding, read_text), ensure_ascii=False))
+                f.write('\n')
+                written += 1
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return written
+
+
+def iter_findings_jsonl(path: str) -> Iterator[Dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.warning("Skipping malformed finding at {}:{}: {}".format(path, line_number, e))
+
+
+def iter_scan_findings(scan_results: Dict, results_dir: str) -> Iterator[Dict]:
+    """Findings of a saved scan, whether stored inline (older scans) or in a JSON Lines file"""
+    findings_file = scan_results.get('findings_file')
+    if not findings_file:
+        return iter(scan_results.get('findings', []))
+    return iter_findings_jsonl(os.path.join(results_dir, os.path.basename(findings_file)))
@@ -0,0 +1,100 @@
+import os
+import logging
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Manifests pip-audit reads; its findings are only recomputed when one of them changes
+DEPENDENCY_MANIFESTS = ('requirements.txt', 'Pipfile', 'pyproject.toml')
+# Findings not tied to a file in the tree, keyed by source
+REPO_LEVEL_SOURCES = {'pip_audit'}
+# Findings that depend on other files too; every scan re-derives them over the whole tree
+WHOLE_TREE_SOURCES = {'taint'}
+
+
+class IncrementalScanError(Exception):
+    """The base scan cannot be diffed against this checkout; a full scan is needed"""
+
+
+def head_commit(repo_path: str) -> Optional[str]:
+    """Commit id checked out in `repo_path`, or None outside a git checkout"""
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            capture_output=True, text=True, cwd=repo_path, check=True, timeout=30
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def changed_files(repo_path: str, base_commit: str, head: str = 'HEAD') -> Dict[str, str]:
+    """
+    Paths that differ between `base_commit` and `head`, mapped to their git
+    status letter (A, M, D, T). Renames are reported as a delete plus an add,
+    since a moved file needs its findings re-stamped with the new path anyway.
+    """
+    try:
+        result = subprocess.run(
+            ['git', 'diff', '--name-status', '--no-renames', '-z', base_commit, head, '--'],
+            capture_output=True, text=True, cwd=repo_path, check=True, timeout=120
+        )
+    except subprocess.CalledProcessError as e:
+        raise IncrementalScanError("git diff {}..{} failed: {}".format(base_commit, head, e.stderr.strip()))
+    except (OSError, subprocess.SubprocessError) as e:
+        raise IncrementalScanError("git diff unavailable: {}".format(e))
+
+    fields = result.stdout.split('\0')
+    changes = {}
+    for status, path in zip(fields[0::2], fields[1::2]):
+        if status and path:
+            changes[os.path.normpath(path)] = status[0]
+    return changes
+
+
+def split_changes(changes: Dict[str, str]) -> Tuple[List[str], List[str]]:
+    """(paths to re-analyze, deleted paths)"""
+    modified = sorted(path for path, status in changes.items() if status != 'D')
+    deleted = sorted(path for path, status in changes.items() if status == 'D')
+    return modified, deleted
+
+
+def manifests_changed(changes: Dict[str, str]) -> bool:
+    return any(os.path.basename(path) in DEPENDENCY_MANIFESTS for path in changes)
+
+
+def carry_over_findings(base_findings: List[Dict], changes: Dict[str, str]) -> Tuple[List[Dict], List[str]]:
+    """
+    Findings from the base scan that still hold: those in files the diff did
+    not touch. Findings in changed files are dropped (the files are re-analyzed)
+    and so are findings in deleted files. Repository-level findings such as
+    pip-audit's are kept unless a dependency manifest changed.
+
+    Records with a taint member are never carried, including records that
+    correlation merged with per-file findings: the rescan derives flows
+    afresh. Their files are returned so they are re-analyzed too, letting
+    the other members be regenerated and correlated again, just as a full
+    scan would.
+    """
+    rescan_manifests = manifests_changed(changes)
+    carried, rederive = [], set()
+    for finding in base_findings:
+        file_path = os.path.normpath(finding['file_path']) if finding.get('file_path') else None
+        if WHOLE_TREE_SOURCES.intersection(finding.get('sources') or [finding.get('source')]):
+            if file_path:
+                rederive.add(file_path)
+            continue
+        if finding.get('source') in REPO_LEVEL_SOURCES:
+            if not rescan_manifests:
+                carried.append(finding)
+            continue
+        if file_path and file_path in changes:
+            continue
+        carried.append(finding)
+    carried = [
+        finding for finding in carried
+        if finding.get('source') in REPO_LEVEL_SOURCES
+        or not finding.get('file_path') or os.path.normpath(finding['file_path']) not in rederive
+    ]
+    return carried, sorted(rederive.difference(changes))
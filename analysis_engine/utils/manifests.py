@@ -0,0 +1,467 @@
+import os
+import re
+import json
+import fnmatch
+import logging
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Dependency files collected per language; only manifests at the repository root count
+DEPENDENCY_FILES = {
+    'python': ['requirements.txt', 'Pipfile', 'pyproject.toml', 'setup.py'],
+    'javascript': ['package.json', 'package-lock.json', 'yarn.lock'],
+    'java': ['pom.xml', 'build.gradle', 'gradle.lockfile'],
+    'ruby': ['Gemfile', 'Gemfile.lock'],
+    'php': ['composer.json', 'composer.lock'],
+    'go': ['go.mod', 'go.sum'],
+    'rust': ['Cargo.toml', 'Cargo.lock'],
+    'dotnet': ['packages.config', '*.csproj'],
+}
+# OSV ecosystem name for each language's packages
+ECOSYSTEMS = {
+    'python': 'PyPI',
+    'javascript': 'npm',
+    'java': 'Maven',
+    'ruby': 'RubyGems',
+    'php': 'Packagist',
+    'go': 'Go',
+    'rust': 'crates.io',
+    'dotnet': 'NuGet',
+}
+
+# An exact version: optional v, then a digit-led version string
+EXACT_VERSION = re.compile(r'^v?(\d[\w.+\-]*)$')
+# PEP 508 requirement: name, extras, version specifiers, marker (URL requirements do not match)
+REQUIREMENT = re.compile(r'^([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*([<>=!~][^;]*?)?\s*(?:;.*)?$')
+# A specifier pinning one exact version (== or ===)
+PINNED_SPEC = re.compile(r'^===?\s*([A-Za-z0-9][\w.+!*-]*)$')
+QUOTED = re.compile(r'''(["'])(.*?)\1''')
+# TOML table header (`[packages]`, `[[package]]`)
+TOML_TABLE = re.compile(r'^\[\[?[^\]]+\]\]?$')
+
+
+class Dependency(NamedTuple):
+    ecosystem: str
+    name: str
+    version: Optional[str]  # None when the manifest only constrains it (see `spec`)
+    file_path: str
+    line_number: int
+    spec: str = ''          # The version requirement as written ('>=2.0', '^1.2', '' for any)
+
+
+# What a parser yields per dependency: (name, exact version or None, line, requirement as written)
+Declaration = Tuple[str, Optional[str], int, str]
+
+
+def dependency_files(repo_index) -> List[Tuple[str, str]]:
+    """(path, language) for every dependency file at the repository root"""
+    root_files = [f.rel_path for f in repo_index.iter_files() if os.path.dirname(f.rel_path) == '']
+    found = []
+    for language, patterns in DEPENDENCY_FILES.items():
+        for pattern in patterns:
+            for filename in fnmatch.filter(root_files, pattern):
+                found.append((filename, language))
+    return found
+
+
+def is_dependency_file(path: str) -> bool:
+    if os.path.dirname(os.path.normpath(path)) != '':
+        return False
+    return any(fnmatch.fnmatch(path, pattern) for patterns in DEPENDENCY_FILES.values() for pattern in patterns)
+
+
+def parse_manifest(file_path: str, language: str, content: str) -> List[Dependency]:
+    """
+    Dependencies with an exact version pinned in one manifest or lockfile,
+    with the line that pins them. Version ranges are skipped: without a
+    resolver there is no telling which version would be installed.
+    """
+    return [dependency for dependency in declared_dependencies(file_path, language, content) if dependency.version]
+
+
+def declared_dependencies(file_path: str, language: str, content: str) -> List[Dependency]:
+    """
+    Every dependency one manifest or lockfile declares, with the line that
+    declares it; those given only as a range have no `version`.
+    """
+    parser = PARSERS.get(os.path.basename(file_path))
+    if parser is None:
+        parser = next((p for pattern, p in PARSERS.items() if fnmatch.fnmatch(file_path, pattern)), None)
+    if parser is None:
+        return []
+    ecosystem = ECOSYSTEMS[language]
+    try:
+        return [
+            Dependency(ecosystem, name, version, file_path, line_number, spec)
+            for name, version, line_number, spec in parser(content)
+        ]
+    except (ValueError, AttributeError, TypeError) as e:
+        # Malformed JSON (JSONDecodeError is a ValueError) or an unexpected structure
+        logger.warning("Could not parse {}: {}".format(file_path, e))
+        return []
+
+
+def _exact(version) -> str:
+    match = EXACT_VERSION.match(version.strip()) if isinstance(version, str) else None
+    return match.group(1) if match else None
+
+
+def _key_lines(content: str, key: str = None) -> Dict[str, int]:
+    """
+    Line of the first occurrence of each JSON object key, found in one pass
+    over the text; with `key`, of each string value of that key instead.
+    """
+    pattern = re.compile(r'"{}"\s*:\s*"([^"]*)"'.format(re.escape(key)) if key else r'"([^"]+)"\s*:')
+    lines = {}
+    for line_number, line in enumerate(content.splitlines(), 1):
+        for found in pattern.findall(line):
+            lines.setdefault(found, line_number)
+    return lines
+
+
+# -----------------------------
+# PYTHON
+# -----------------------------
+def _pep508(text: str) -> Optional[Tuple[str, Optional[str], str]]:
+    """(name, pinned version or None, version specifiers) of a PEP 508 requirement"""
+    match = REQUIREMENT.match(text.strip())
+    if not match:
+        return None
+    spec = (match.group(2) or '').strip()
+    pinned = PINNED_SPEC.match(spec)
+    return match.group(1), pinned.group(1) if pinned else None, spec
+
+
+def _requirements(content: str) -> Iterator[Declaration]:
+    for line_number, line in enumerate(content.splitlines(), 1):
+        # Drop comments, per-requirement options (--hash) and continuation backslashes
+        line = re.split(r'\s+(?:#|--)', line, 1)[0].rstrip('\\').strip()
+        if not line or line.startswith(('#', '-')):
+            continue
+        requirement = _pep508(line)
+        if requirement:
+            name, version, spec = requirement
+            yield name, version, line_number, spec
+
+
+# Keys whose list values are requirement strings (PEP 621, build-system, setup.py)
+REQUIREMENT_LIST = re.compile(
+    r'''(?:^|[\s,(])["']?(?:dependencies|requires|install_requires|setup_requires|tests_require)["']?\s*[=:]\s*\['''
+)
+# In [project.optional-dependencies] every key is an extra listing requirement strings
+OPTIONAL_REQUIREMENT_LIST = re.compile(r'''^\s*["']?[\w.\-]+["']?\s*=\s*\[''')
+
+
+def _quoted_requirements(content: str) -> Iterator[Declaration]:
+    """
+    PEP 508 strings (pyproject arrays, setup.py lists): those with a version
+    specifier anywhere in the file, bare names only inside requirement lists
+    """
+    in_list = optional_table = False
+    for line_number, line in enumerate(content.splitlines(), 1):
+        if TOML_TABLE.match(line.strip()):
+            optional_table = line.strip() == '[project.optional-dependencies]'
+        outside = ''
+        start = REQUIREMENT_LIST.search(line) or (optional_table and OPTIONAL_REQUIREMENT_LIST.match(line))
+        if start:
+            in_list, outside, line = True, line[:start.end()], line[start.end():]
+        listed = ''
+        if in_list:
+            # The list ends at the first bracket outside a string
+            close = QUOTED.sub(lambda match: ' ' * len(match.group(0)), line).find(']')
+            if close < 0:
+                listed = line
+            else:
+                listed, outside, in_list = line[:close], outside + line[close:], False
+        else:
+            outside += line
+        for text, any_requirement in ((listed, True), (outside, False)):
+            for _, quoted in QUOTED.findall(text):
+                requirement = _pep508(quoted)
+                if requirement and (any_requirement or requirement[2]):
+                    name, version, spec = requirement
+                    yield name, version, line_number, spec
+
+
+# Tables listing packages as `name = "spec"`: Pipfile's and Poetry's
+TOML_DEPENDENCY_TABLE = re.compile(
+    r'^\[(?:packages|dev-packages|tool\.poetry\.(?:dev-)?dependencies|tool\.poetry\.group\.[\w-]+\.dependencies)\]$'
+)
+# name = "==1.2.3" or name = {version = ">=1.2", ...}
+TOML_DEPENDENCY = re.compile(r'''^\s*["']?([A-Za-z0-9][\w.-]*)["']?\s*=\s*(?:\{[^}]*version\s*=\s*)?["']([^"']*)["']''')
+
+
+def _pipfile(content: str) -> Iterator[Declaration]:
+    in_table = False
+    for line_number, line in enumerate(content.splitlines(), 1):
+        if TOML_TABLE.match(line.strip()):
+            in_table = bool(TOML_DEPENDENCY_TABLE.match(line.strip()))
+            continue
+        match = TOML_DEPENDENCY.match(line)
+        if not match:
+            continue
+        name, spec = match.group(1), match.group(2).strip()
+        pinned = PINNED_SPEC.match(spec)
+        if pinned:
+            yield name, pinned.group(1), line_number, spec
+        elif in_table and name != 'python':
+            # Poetry lists the interpreter among the dependencies
+            yield name, None, line_number, spec
+
+
+def _pyproject(content: str) -> Iterator[Declaration]:
+    yield from _quoted_requirements(content)
+    yield from _pipfile(content)
+
+
+# -----------------------------
+# JAVASCRIPT
+# -----------------------------
+NPM_SECTIONS = ('dependencies', 'devDependencies', 'optionalDependencies', 'peerDependencies')
+
+
+def _package_json(content: str) -> Iterator[Declaration]:
+    data = json.loads(content)
+    lines = _key_lines(content)
+    for section in NPM_SECTIONS:
+        for name, spec in (data.get(section) or {}).items():
+            if isinstance(spec, str):
+                yield name, _exact(spec.lstrip('=')), lines.get(name, 1), spec
+
+
+def _package_lock(content: str) -> Iterator[Declaration]:
+    data = json.loads(content)
+    lines = _key_lines(content)
+    packages = data.get('packages')
+    if packages:
+        # lockfileVersion 2/3: keyed by install path
+        for path, entry in packages.items():
+            if not path or entry.get('link') or not entry.get('version'):
+                continue
+            name = entry.get('name') or path.rsplit('node_modules/', 1)[-1]
+            yield name, entry['version'], lines.get(path, 1), entry['version']
+        return
+    pending = list((data.get('dependencies') or {}).items())
+    while pending:
+        name, entry = pending.pop()
+        if entry.get('version') and _exact(entry['version']):
+            yield name, entry['version'], lines.get(name, 1), entry['version']
+        pending.extend((entry.get('dependencies') or {}).items())
+
+
+def _yarn_lock(content: str) -> Iterator[Declaration]:
+    names, header_line = [], 0
+    for line_number, line in enumerate(content.splitlines(), 1):
+        if line and not line[0].isspace() and line.rstrip().endswith(':') and not line.startswith('#'):
+            header_line = line_number
+            names = []
+            for spec in line.rstrip()[:-1].split(','):
+                spec = spec.strip().strip('"')
+                name = spec[:spec.index('@', 1)] if '@' in spec[1:] else spec
+                # `__metadata` is Yarn 2+ bookkeeping, not a package
+                if name not in names and not name.startswith('__'):
+                    names.append(name)
+        elif names and line.strip().startswith('version'):
+            version = line.strip()[len('version'):].strip().strip(':').strip().strip('"')
+            for name in names:
+                yield name, version, header_line, version
+            names = []
+
+
+# -----------------------------
+# JAVA
+# -----------------------------
+POM_DEPENDENCY = re.compile(r'<dependency>(.*?)</dependency>', re.S)
+POM_FIELD = re.compile(r'<(groupId|artifactId|version)>\s*([^<\s]+)\s*</\1>')
+GRADLE_COORDINATE = re.compile(r'''["']([\w.\-]+):([\w.\-]+):([\w.\-]+)["']''')
+GRADLE_LOCK_ENTRY = re.compile(r'^([\w.\-]+):([\w.\-]+):([\w.\-]+)=')
+
+
+def _pom(content: str) -> Iterator[Declaration]:
+    for block in POM_DEPENDENCY.finditer(content):
+        fields = dict(POM_FIELD.findall(block.group(1)))
+        if fields.get('groupId') and fields.get('artifactId'):
+            # No <version> (managed by a parent or BOM) or a property/range: not exact in this file
+            offset = block.start() + block.group(0).find('<artifactId>')
+            yield ('{}:{}'.format(fields['groupId'], fields['artifactId']), _exact(fields.get('version', '')),
+                   content.count('\n', 0, offset) + 1, fields.get('version', ''))
+
+
+def _gradle(content: str) -> Iterator[Declaration]:
+    for line_number, line in enumerate(content.splitlines(), 1):
+        for group, artifact, version in GRADLE_COORDINATE.findall(line):
+            yield '{}:{}'.format(group, artifact), version if _exact(version) else None, line_number, version
+
+
+def _gradle_lock(content: str) -> Iterator[Declaration]:
+    for line_number, line in enumerate(content.splitlines(), 1):
+        match = GRADLE_LOCK_ENTRY.match(line.strip())
+        if match:
+            yield '{}:{}'.format(match.group(1), match.group(2)), match.group(3), line_number, match.group(3)
+
+
+# -----------------------------
+# RUBY
+# -----------------------------
+GEMFILE_GEM = re.compile(r'''^\s*gem\s+["']([^"']+)["']\s*(?:,\s*["']([^"']*)["'])?''')
+# An exact gem requirement: "1.2.3" or "= 1.2.3"
+GEMFILE_PIN = re.compile(r'^=?\s*(\d.*)$')
+GEMFILE_LOCK_SPEC = re.compile(r'^    ([^\s(]+) \(([^)\s]+)\)$')
+
+
+def _gemfile(content: str) -> Iterator[Declaration]:
+    for line_number, line in enumerate(content.splitlines(), 1):
+        match = GEMFILE_GEM.match(line)
+        if match:
+            spec = (match.group(2) or '').strip()
+            pinned = GEMFILE_PIN.match(spec)
+            yield match.group(1), _exact(pinned.group(1)) if pinned else None, line_number, spec
+
+
+def _gemfile_lock(content: str) -> Iterator[Declaration]:
+    for line_number, line in enumerate(content.splitlines(), 1):
+        match = GEMFILE_LOCK_SPEC.match(line.rstrip())
+        if match:
+            # Platform gems carry a suffix: nokogiri (1.16.0-x86_64-linux)
+            yield match.group(1), match.group(2).split('-', 1)[0], line_number, match.group(2)
+
+
+# -----------------------------
+# PHP
+# -----------------------------
+def _composer_json(content: str) -> Iterator[Declaration]:
+    data = json.loads(content)
+    lines = _key_lines(content)
+    for section in ('require', 'require-dev'):
+        for name, spec in (data.get(section) or {}).items():
+            # Platform requirements (php, ext-*) have no vendor prefix
+            if '/' in name and isinstance(spec, str):
+                yield name, _exact(spec), lines.get(name, 1), spec
+
+
+def _composer_lock(content: str) -> Iterator[Declaration]:
+    data = json.loads(content)
+    lines = _key_lines(content, key='name')
+    for section in ('packages', 'packages-dev'):
+        for package in data.get(section) or ():
+            version = _exact(package.get('version', ''))
+            if package.get('name') and version:
+                yield package['name'], version, lines.get(package['name'], 1), package['version']
+
+
+# -----------------------------
+# GO
+# -----------------------------
+GO_REQUIRE = re.compile(r'^(?:require\s+)?([\w.\-~/]+\.[\w.\-~/]+)\s+(v[\w.\-+]+)(?:\s*//.*)?$')
+
+
+def _go_version(version: str) -> str:
+    return version[1:].replace('+incompatible', '')
+
+
+def _go_mod(content: str) -> Iterator[Declaration]:
+    in_block = False
+    for line_number, line in enumerate(content.splitlines(), 1):
+        line = line.strip()
+        if line.startswith('require ('):
+            in_block = True
+            continue
+        if in_block and line == ')':
+            in_block = False
+            continue
+        if in_block or line.startswith('require '):
+            match = GO_REQUIRE.match(line)
+            if match:
+                yield match.group(1), _go_version(match.group(2)), line_number, match.group(2)
+
+
+def _go_sum(content: str) -> Iterator[Declaration]:
+    for line_number, line in enumerate(content.splitlines(), 1):
+        parts = line.split()
+        # `/go.mod` lines only record a module's requirements, not code that is built
+        if len(parts) == 3 and not parts[1].endswith('/go.mod'):
+            yield parts[0], _go_version(parts[1]), line_number, parts[1]
+
+
+# -----------------------------
+# RUST
+# -----------------------------
+# name = "1.2" or name = { version = "=1.2.3", ... }
+CARGO_DEPENDENCY = re.compile(r'''^\s*([\w\-]+)\s*=\s*(?:\{[^}]*version\s*=\s*)?["']([^"']*)["']''')
+# Cargo only treats "=1.2.3" as exact; a bare "1.2.3" is a caret range
+CARGO_PIN = re.compile(r'^=\s*(\d.*)$')
+# [dependencies], [dev-dependencies], [build-dependencies] and their target-specific forms
+CARGO_DEPENDENCY_TABLE = re.compile(r'^\[(?:target\..+\.)?(?:dev-|build-)?dependencies\]$')
+
+
+def _cargo_toml(content: str) -> Iterator[Declaration]:
+    in_table = False
+    for line_number, line in enumerate(content.splitlines(), 1):
+        if TOML_TABLE.match(line.strip()):
+            in_table = bool(CARGO_DEPENDENCY_TABLE.match(line.strip()))
+            continue
+        match = CARGO_DEPENDENCY.match(line)
+        if not match:
+            continue
+        spec = match.group(2).strip()
+        pinned = CARGO_PIN.match(spec)
+        if pinned:
+            yield match.group(1), pinned.group(1).strip(), line_number, spec
+        elif in_table:
+            yield match.group(1), None, line_number, spec
+
+
+def _cargo_lock(content: str) -> Iterator[Declaration]:
+    name, name_line = None, 0
+    for line_number, line in enumerate(content.splitlines(), 1):
+        line = line.strip()
+        if line == '[[package]]':
+            name = None
+        elif line.startswith('name = '):
+            name, name_line = line[len('name = '):].strip('"'), line_number
+        elif line.startswith('version = ') and name:
+            version = line[len('version = '):].strip('"')
+            yield name, version, name_line, version
+            name = None
+
+
+# -----------------------------
+# .NET
+# -----------------------------
+NUGET_PACKAGE = re.compile(r'<package\s+[^>]*?id="([^"]+)"[^>]*?version="([^"]+)"', re.I)
+NUGET_REFERENCE = re.compile(r'<PackageReference\s+[^>]*?Include="([^"]+)"[^>]*?Version="([^"]+)"', re.I)
+
+
+def _xml_attributes(pattern) -> Callable[[str], Iterator[Declaration]]:
+    def parse(content):
+        for line_number, line in enumerate(content.splitlines(), 1):
+            for name, spec in pattern.findall(line):
+                # "[1.2.3]" is NuGet's exact-version form
+                version = spec.strip('[]')
+                yield name, version if _exact(version) else None, line_number, spec
+    return parse
+
+
+PARSERS: Dict[str, Callable[[str], Iterator[Declaration]]] = {
+    'requirements.txt': _requirements,
+    'Pipfile': _pipfile,
+    'pyproject.toml': _pyproject,
+    'setup.py': _quoted_requirements,
+    'package.json': _package_json,
+    'package-lock.json': _package_lock,
+    'yarn.lock': _yarn_lock,
+    'pom.xml': _pom,
+    'build.gradle': _gradle,
+    'gradle.lockfile': _gradle_lock,
+    'Gemfile': _gemfile,
+    'Gemfile.lock': _gemfile_lock,
+    'composer.json': _composer_json,
+    'composer.lock': _composer_lock,
+    'go.mod': _go_mod,
+    'go.sum': _go_sum,
+    'Cargo.toml': _cargo_toml,
+    'Cargo.lock': _cargo_lock,
+    'packages.config': _xml_attributes(NUGET_PACKAGE),
+    '*.csproj': _xml_attributes(NUGET_REFERENCE),
+}
@@ -0,0 +1,213 @@
+import os
+import re
+import fnmatch
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from analysis_engine.utils.manifests import is_dependency_file
+
+logger = logging.getLogger(__name__)
+
+# Repo-level ignore file, gitignore-style globs (one per line, `#` comments, `!` re-includes)
+IGNORE_FILE = '.scanignore'
+
+# Always pruned: VCS metadata, virtualenvs, installed packages and tool caches
+DEFAULT_EXCLUDED_DIRECTORIES = (
+    '.git', '.hg', '.svn', '.bzr', 'CVS',
+    '.venv', 'venv', 'virtualenv', '.virtualenv', 'site-packages', 'dist-packages',
+    'node_modules', 'bower_components', '__pycache__',
+    '.tox', '.nox', '.eggs', '*.egg-info', '.mypy_cache', '.pytest_cache', '.ruff_cache',
+    'vendor', 'vendored', 'third_party', 'migrations',
+)
+# Generated or minified files matched by name
+DEFAULT_EXCLUDED_FILES = (
+    '*.min.js', '*.min.css', '*.map', '*.bundle.js', '*.chunk.js',
+    '*.pyc', '*.pyo', '*_pb2.py', '*_pb2_grpc.py', '*.designer.cs',
+    'package-lock.json', 'yarn.lock', 'poetry.lock', 'Pipfile.lock',
+)
+
+# Larger files are skipped outright; 0 disables the cap
+DEFAULT_MAX_FILE_BYTES = 8 * 1024 * 1024
+# Files at least this large have their head sniffed for generated-code markers
+GENERATED_SNIFF_MIN_BYTES = 16 * 1024
+# How much of a file's head is sniffed
+GENERATED_SNIFF_BYTES = 2048
+# A sniffed head with no newline in this many bytes is treated as minified
+MINIFIED_LINE_BYTES = 1024
+
+GENERATED_MARKER = re.compile(
+    rb'@generated|do not edit|auto-?generated|generated by|code generator', re.IGNORECASE
+)
+
+REASONS = ('directory', 'glob', 'ignore_file', 'size', 'generated')
+
+
+def _compile_globs(patterns) -> Optional['re.Pattern']:
+    """One alternation regex for a list of basename globs"""
+    patterns = list(patterns)
+    if not patterns:
+        return None
+    return re.compile('|'.join(fnmatch.translate(pattern) for pattern in patterns))
+
+
+class IgnoreRule:
+    """One line of an ignore file"""
+
+    __slots__ = ('negated', 'directory_only', 'anchored', 'regex')
+
+    def __init__(self, line: str):
+        self.negated = line.startswith('!')
+        if self.negated:
+            line = line[1:]
+        self.directory_only = line.endswith('/')
+        line = line.rstrip('/')
+        if line.startswith('**/'):
+            line = line[3:]
+        # Patterns with a slash are relative to the repo root, bare names match at any depth;
+        # `*` also crosses slashes, so `a/**` and `a/*` both cover everything under a/
+        self.anchored = '/' in line
+        self.regex = re.compile(fnmatch.translate(line.lstrip('/')))
+
+    def matches(self, rel_path: str, is_dir: bool) -> bool:
+        if self.directory_only and not is_dir:
+            return False
+        target = rel_path if self.anchored else rel_path.rsplit('/', 1)[-1]
+        return self.regex.match(target) is not None
+
+
+class PathPolicy:
+    """
+    Decides which paths of a checkout are scanned. Applied while `RepoIndex`
+    walks the tree, so every analyzer, extractor and external tool that works
+    from the index sees the same filtered listing.
+
+    Directories are pruned by name before they are descended into; files are
+    dropped by name glob, by the repo's ignore file, by a size cap, and by a
+    generated-code heuristic that sniffs the head of larger files for markers
+    like `@generated` or a minified first line. Everything dropped is counted
+    by reason: skipped files in files and bytes, pruned directories as
+    directories (their contents are only walked and measured with
+    `measure_pruned`, since pruning is there to avoid that walk).
+    """
+
+    def __init__(self, excluded_directories=DEFAULT_EXCLUDED_DIRECTORIES, excluded_files=DEFAULT_EXCLUDED_FILES,
+                 ignore_rules: Optional[List[str]] = None, max_file_bytes: int = DEFAULT_MAX_FILE_BYTES,
+                 detect_generated: bool = True, measure_pruned: bool = False):
+        self._directories = _compile_globs(excluded_directories)
+        self._files = _compile_globs(excluded_files)
+        self.ignore_rules = [IgnoreRule(line) for line in (ignore_rules or [])]
+        self.max_file_bytes = max_file_bytes
+        self.detect_generated = detect_generated
+        self.measure_pruned = measure_pruned
+        self.reset()
+
+    @classmethod
+    def for_repo(cls, repo_path: str, **kwargs) -> 'PathPolicy':
+        """The default policy plus the repository's own ignore file, if it has one"""
+        return cls(ignore_rules=read_ignore_file(os.path.join(repo_path, IGNORE_FILE)), **kwargs)
+
+    def reset(self):
+        self.excluded: Dict[str, List[int]] = {reason: [0, 0] for reason in REASONS}
+        self.pruned: Dict[str, int] = dict.fromkeys(REASONS, 0)
+
+    # -----------------------------
+    # DECISIONS
+    # -----------------------------
+    def _ignored(self, rel_path: str, is_dir: bool) -> bool:
+        ignored = False
+        # Last matching rule wins, as in .gitignore
+        for rule in self.ignore_rules:
+            if rule.negated == ignored and rule.matches(rel_path, is_dir):
+                ignored = not rule.negated
+        return ignored
+
+    def directory_reason(self, rel_path: str, name: str) -> Optional[str]:
+        """Why a directory is pruned, or None to descend into it"""
+        if self._directories is not None and self._directories.match(name):
+            return 'directory'
+        if self.ignore_rules and self._ignored(rel_path.replace(os.sep, '/'), True):
+            return 'ignore_file'
+        return None
+
+    def file_reason(self, rel_path: str, name: str, size: int, abs_path: str) -> Optional[str]:
+        """Why a file is skipped, or None to index it"""
+        # Root dependency manifests (lockfiles included) are what the dependency audit reads
+        manifest = is_dependency_file(rel_path)
+        if not manifest and self._files is not None and self._files.match(name):
+            return 'glob'
+        if self.ignore_rules and self._ignored(rel_path.replace(os.sep, '/'), False):
+            return 'ignore_file'
+        if manifest:
+            return None
+        if self.max_file_bytes and size > self.max_file_bytes:
+            return 'size'
+        if self.detect_generated and size >= GENERATED_SNIFF_MIN_BYTES and looks_generated(abs_path):
+            return 'generated'
+        return None
+
+    # -----------------------------
+    # ACCOUNTING
+    # -----------------------------
+    def record(self, reason: str, files: int, size: int):
+        counts = self.excluded[reason]
+        counts[0] += files
+        counts[1] += size
+
+    def record_pruned(self, reason: str, abs_path: str):
+        self.pruned[reason] += 1
+        if self.measure_pruned:
+            self.record(reason, *tree_size(abs_path))
+
+    def stats(self) -> Dict:
+        return {
+            'files_excluded': sum(files for files, _ in self.excluded.values()),
+            'bytes_excluded': sum(size for _, size in self.excluded.values()),
+            'directories_excluded': sum(self.pruned.values()),
+            'excluded_by_reason': {
+                reason: {'files': files, 'bytes': size, 'directories': self.pruned[reason]}
+                for reason, (files, size) in self.excluded.items() if files or self.pruned[reason]
+            },
+        }
+
+
+def read_ignore_file(path: str) -> List[str]:
+    try:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            lines = [line.strip() for line in f]
+    except OSError:
+        return []
+    return [line for line in lines if line and not line.startswith('#')]
+
+
+def looks_generated(abs_path: str) -> bool:
+    """True when the head of a file carries a generated-code marker or is one minified line"""
+    try:
+        with open(abs_path, 'rb') as f:
+            head = f.read(GENERATED_SNIFF_BYTES)
+    except OSError:
+        return False
+    if GENERATED_MARKER.search(head):
+        return True
+    return len(head) >= MINIFIED_LINE_BYTES and b'\n' not in head[:MINIFIED_LINE_BYTES]
+
+
+def tree_size(path: str) -> Tuple[int, int]:
+    """Files and bytes under a pruned directory, counted with stat only"""
+    files = size = 0
+    pending = [path]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            files += 1
+                            size += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return files, size
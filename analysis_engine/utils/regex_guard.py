@@ -0,0 +1,199 @@
+import re
+import time
+import logging
+from typing import Dict, List, Optional
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+try:
+    import re2
+except ImportError:  # google-re2 is optional
+    re2 = None
+
+logger = logging.getLogger(__name__)
+
+# Longer lines are only matched on their first this-many characters
+DEFAULT_MAX_LINE_LENGTH = 4096
+# Wall-clock budgets in seconds; 0 disables a budget
+DEFAULT_FILE_BUDGET = 5.0
+DEFAULT_RULE_BUDGET = 1.0
+# Paths listed in scan metrics (the counts are always complete)
+REPORTED_PATHS = 50
+REPORTED_RULES = 10
+
+REPEAT_OPS = ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+
+
+def _is_unbounded(av):
+    return av[1] == sre_parse.MAXREPEAT
+
+
+def _is_wildcard(item):
+    """A repeated item that matches almost anything: `.`, `[^...]`, `[^x]`"""
+    if len(item) != 1:
+        return False
+    op, av = item[0]
+    name = str(op)
+    if name in ('ANY', 'NOT_LITERAL'):
+        return True
+    return name == 'IN' and any(str(item_op) == 'NEGATE' for item_op, _ in av)
+
+
+def _has_unbounded_repeat(parsed):
+    for op, av in parsed:
+        name = str(op)
+        if name in REPEAT_OPS and (_is_unbounded(av) or _has_unbounded_repeat(av[2])):
+            return True
+        if name == 'SUBPATTERN' and _has_unbounded_repeat(av[-1]):
+            return True
+        if name == 'BRANCH' and any(_has_unbounded_repeat(branch) for branch in av[1]):
+            return True
+    return False
+
+
+def _count_wildcards(parsed, risks):
+    """Unbounded wildcard repeats along the worst path through `parsed`"""
+    count = 0
+    for op, av in parsed:
+        name = str(op)
+        if name in REPEAT_OPS:
+            if _is_unbounded(av):
+                if _has_unbounded_repeat(av[2]):
+                    risks.add('nested unbounded repetition')
+                if _is_wildcard(av[2]):
+                    count += 1
+            count += _count_wildcards(av[2], risks)
+        elif name == 'SUBPATTERN':
+            count += _count_wildcards(av[-1], risks)
+        elif name == 'BRANCH':
+            count += max(_count_wildcards(branch, risks) for branch in av[1])
+        elif name in ('ASSERT', 'ASSERT_NOT'):
+            count += _count_wildcards(av[1], risks)
+    return count
+
+
+def backtracking_risks(regex: str) -> List[str]:
+    """
+    Reasons a rule may backtrack badly on long input, found by inspecting its
+    parsed form: nested unbounded repeats like `(a+)+`, or several unbounded
+    wildcards such as `.*x.*y` in one match path, which cost polynomial time
+    in the line length when the match fails.
+    """
+    try:
+        parsed = sre_parse.parse(regex, re.IGNORECASE)
+    except (re.error, RecursionError):
+        return []
+    risks = set()
+    wildcards = _count_wildcards(parsed, risks)
+    if wildcards >= 2:
+        risks.add('{} unbounded wildcards in one match'.format(wildcards))
+    return sorted(risks)
+
+
+def compile_linear(regex: str, multiline: bool = False):
+    """The rule compiled with RE2 (linear time), or None when RE2 is missing or rejects it"""
+    if re2 is None:
+        return None
+    try:
+        return re2.compile(('(?im)' if multiline else '(?i)') + regex)
+    except Exception as e:  # RE2 has no lookaround or backreferences
+        logger.debug("RE2 cannot compile {!r}: {}".format(regex, e))
+        return None
+
+
+class RegexGuard:
+    """
+    Cost limits for regex rule execution and a record of where they applied.
+    Long lines are matched on a prefix only, and per-file and per-rule time
+    budgets stop a scan that is taking too long; Python's `re` cannot be
+    interrupted mid-search, so budgets are checked between rules and matches
+    and the line cap is what bounds any single search. Files cut short by a
+    budget are incomplete and must not be cached.
+
+    The report travels back from worker processes with shard results and is
+    merged into the parent's guard.
+    """
+
+    def __init__(self, max_line_length: int = DEFAULT_MAX_LINE_LENGTH, file_budget: float = DEFAULT_FILE_BUDGET,
+                 rule_budget: float = DEFAULT_RULE_BUDGET, linear_engine: bool = False):
+        self.max_line_length = max_line_length
+        self.file_budget = file_budget
+        self.rule_budget = rule_budget
+        self.linear_engine = linear_engine
+        self._long_line = re.compile(r'[^\n]{%d}' % max_line_length) if max_line_length else None
+        self._long_line_bytes = re.compile(rb'[^\n]{%d}' % max_line_length) if max_line_length else None
+        self.risky_rules: Dict[str, List[str]] = {}
+        self.linear_rules: List[str] = []
+        self.reset()
+
+    def settings(self):
+        """Settings that change findings deterministically (part of the cache key)"""
+        return self.max_line_length, self.linear_engine
+
+    def reset(self):
+        self.truncated = set()
+        self.skipped: Dict[str, str] = {}
+        self.rule_seconds: Dict[str, float] = {}
+
+    # -----------------------------
+    # LIMITS
+    # -----------------------------
+    def has_long_lines(self, buffer) -> bool:
+        if self._long_line is None:
+            return False
+        pattern = self._long_line if isinstance(buffer, str) else self._long_line_bytes
+        return pattern.search(buffer) is not None
+
+    def file_over_budget(self, started: float) -> bool:
+        return bool(self.file_budget) and time.perf_counter() - started > self.file_budget
+
+    def rule_over_budget(self, started: float) -> bool:
+        return bool(self.rule_budget) and time.perf_counter() - started > self.rule_budget
+
+    # -----------------------------
+    # REPORTING
+    # -----------------------------
+    def record_truncated(self, rel_path: str):
+        self.truncated.add(rel_path)
+
+    def record_skipped(self, rel_path: str, reason: str):
+        logger.warning("Regex scan of {} cut short: {}".format(rel_path, reason))
+        self.skipped.setdefault(rel_path, reason)
+
+    def add_rule_time(self, rule: str, seconds: float):
+        self.rule_seconds[rule] = self.rule_seconds.get(rule, 0.0) + seconds
+
+    @property
+    def incomplete(self):
+        return set(self.skipped)
+
+    def take_report(self) -> Dict:
+        """This process's records since the last reset, clearing them"""
+        report = {'truncated': sorted(self.truncated), 'skipped': dict(self.skipped), 'rule_seconds': dict(self.rule_seconds)}
+        self.reset()
+        return report
+
+    def merge(self, report: Optional[Dict]):
+        if not report:
+            return
+        self.truncated.update(report['truncated'])
+        for rel_path, reason in report['skipped'].items():
+            self.skipped.setdefault(rel_path, reason)
+        for rule, seconds in report['rule_seconds'].items():
+            self.add_rule_time(rule, seconds)
+
+    def summary(self) -> Dict:
+        slowest = sorted(self.rule_seconds.items(), key=lambda item: -item[1])[:REPORTED_RULES]
+        return {
+            'truncated_files': len(self.truncated),
+            'skipped_files': len(self.skipped),
+            'truncated': sorted(self.truncated)[:REPORTED_PATHS],
+            'skipped': dict(sorted(self.skipped.items())[:REPORTED_PATHS]),
+            'slowest_rules': {rule: round(seconds, 4) for rule, seconds in slowest},
+            'risky_rules': self.risky_rules,
+            'linear_rules': self.linear_rules,
+            'max_line_length': self.max_line_length,
+        }
@@ -0,0 +1,278 @@
+import os
+import copy
+import fnmatch
+import hashlib
+import logging
+import subprocess
+from typing import Dict, Iterator, List, Optional
+
+from analysis_engine.utils.ast_cache import ASTCache
+from analysis_engine.utils.path_policy import PathPolicy
+from analysis_engine.utils.trigram_index import TrigramIndex
+
+logger = logging.getLogger(__name__)
+
+LANGUAGE_BY_EXTENSION = {
+    '.py': 'python',
+    '.js': 'javascript', '.jsx': 'javascript', '.mjs': 'javascript', '.cjs': 'javascript',
+    '.ts': 'typescript', '.tsx': 'typescript',
+    '.go': 'go',
+    '.java': 'java', '.kt': 'kotlin',
+    '.rb': 'ruby',
+    '.php': 'php',
+    '.rs': 'rust',
+    '.cs': 'csharp',
+    '.html': 'html', '.htm': 'html',
+    '.json': 'json',
+    '.yaml': 'yaml', '.yml': 'yaml',
+    '.toml': 'toml', '.ini': 'config', '.cfg': 'config', '.env': 'config',
+    '.xml': 'xml',
+    '.md': 'markdown', '.rst': 'text', '.txt': 'text',
+    '.sh': 'shell',
+    '.sql': 'sql',
+}
+
+# Contents above this budget are still served, just not kept in memory
+DEFAULT_CACHE_BUDGET = 256 * 1024 * 1024
+
+
+class IndexedFile:
+    """A single file in the checkout"""
+
+    __slots__ = ('rel_path', 'abs_path', 'size', 'language')
+
+    def __init__(self, rel_path: str, abs_path: str, size: int, language: Optional[str]):
+        self.rel_path = rel_path
+        self.abs_path = abs_path
+        self.size = size
+        self.language = language
+
+    def __repr__(self):
+        return "IndexedFile({!r}, size={}, language={})".format(self.rel_path, self.size, self.language)
+
+
+class RepoIndex:
+    """
+    File listing of a checkout, built once per scan with a single scandir walk.
+    Analyzers and framework extractors share it instead of each re-walking the
+    tree, and file contents are read lazily and cached so every file is read
+    from disk at most once per scan. Paths the `PathPolicy` excludes (vendored
+    code, virtualenvs, generated files) never enter the listing.
+    """
+
+    def __init__(self, repo_path: str, cache_budget: int = DEFAULT_CACHE_BUDGET, ast_cache: Optional[ASTCache] = None,
+                 policy: Optional[PathPolicy] = None):
+        if not os.path.isdir(repo_path):
+            raise ValueError(f"Repository path '{repo_path}' is not a valid directory.")
+        self.repo_path = os.path.abspath(repo_path)
+        self.policy = policy if policy is not None else PathPolicy.for_repo(self.repo_path)
+        self.cache_budget = cache_budget
+        self.files: Dict[str, IndexedFile] = {}
+        self._contents: Dict[str, str] = {}
+        self._cached_bytes = 0
+        self._reads = 0
+        self._bytes_read = 0
+        self.ast_cache = ast_cache if ast_cache is not None else ASTCache()
+        self._blob_shas: Optional[Dict[str, str]] = None
+        self._full: Optional['RepoIndex'] = None
+        self._trigrams: Optional[TrigramIndex] = None
+        self._scan()
+        excluded = self.policy.stats()
+        logger.info("RepoIndex built: {} files, {} bytes ({} files, {} bytes, {} directories excluded)".format(
+            len(self.files), self.total_size, excluded['files_excluded'], excluded['bytes_excluded'],
+            excluded['directories_excluded']
+        ))
+
+    # -----------------------------
+    # LISTING
+    # -----------------------------
+    def _scan(self):
+        policy = self.policy
+        policy.reset()
+        pending = [self.repo_path]
+        while pending:
+            directory = pending.pop()
+            try:
+                with os.scandir(directory) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError as e:
+                logger.warning("Cannot list {}: {}".format(directory, e))
+                continue
+
+            subdirs = []
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        reason = policy.directory_reason(os.path.relpath(entry.path, self.repo_path), entry.name)
+                        if reason is None:
+                            subdirs.append(entry.path)
+                        else:
+                            policy.record_pruned(reason, entry.path)
+                    elif entry.is_file():
+                        rel_path = os.path.relpath(entry.path, self.repo_path)
+                        size = entry.stat().st_size
+                        reason = policy.file_reason(rel_path, entry.name, size, entry.path)
+                        if reason is None:
+                            self.files[rel_path] = IndexedFile(rel_path, entry.path, size, classify_language(entry.name))
+                        else:
+                            policy.record(reason, 1, size)
+                except OSError as e:
+                    logger.debug("Skipping {}: {}".format(entry.path, e))
+            # Reversed so the stack pops subdirectories in name order
+            pending.extend(reversed(subdirs))
+
+    def subset(self, paths) -> 'RepoIndex':
+        """
+        View of this index restricted to `paths` (e.g. the files changed since a
+        previous scan). Contents, parsed trees and blob ids stay shared.
+        """
+        wanted = {self.rel_path(path) for path in paths}
+        view = copy.copy(self)
+        view.files = {rel_path: indexed for rel_path, indexed in self.files.items() if rel_path in wanted}
+        view._full = self.full
+        view._trigrams = None
+        return view
+
+    @property
+    def full(self) -> 'RepoIndex':
+        """The whole-checkout index a subset view was taken from (the index itself otherwise)"""
+        return self._full if self._full is not None else self
+
+    @property
+    def total_size(self) -> int:
+        return sum(f.size for f in self.files.values())
+
+    def iter_files(self, language: Optional[str] = None, extensions=None) -> Iterator[IndexedFile]:
+        """Yield indexed files, optionally restricted to a language or extensions"""
+        for indexed in self.files.values():
+            if language and indexed.language != language:
+                continue
+            if extensions and not indexed.rel_path.endswith(tuple(extensions)):
+                continue
+            yield indexed
+
+    def find(self, filename: str) -> List[str]:
+        """Absolute paths of every file with the given basename (supports glob patterns)"""
+        return [
+            indexed.abs_path for indexed in self.files.values()
+            if fnmatch.fnmatch(os.path.basename(indexed.rel_path), filename)
+        ]
+
+    def exists(self, path: str) -> bool:
+        return self.rel_path(path) in self.files
+
+    def get(self, path: str) -> Optional[IndexedFile]:
+        return self.files.get(self.rel_path(path))
+
+    def rel_path(self, path: str) -> str:
+        if os.path.isabs(path):
+            return os.path.relpath(path, self.repo_path)
+        return os.path.normpath(path)
+
+    def abs_path(self, path: str) -> str:
+        if os.path.isabs(path):
+            return path
+        return os.path.join(self.repo_path, path)
+
+    # -----------------------------
+    # CONTENTS
+    # -----------------------------
+    def read_text(self, path: str) -> str:
+        """File contents decoded as UTF-8 (undecodable bytes dropped), read at most once"""
+        rel_path = self.rel_path(path)
+        content = self._contents.get(rel_path)
+        if content is not None:
+            return content
+
+        with open(self.abs_path(rel_path), 'r', encoding='utf-8', errors='ignore') as f:
+            content = f.read()
+        self._reads += 1
+        self._bytes_read += len(content)
+
+        if rel_path in self.files and self._cached_bytes + len(content) <= self.cache_budget:
+            self._contents[rel_path] = content
+            self._cached_bytes += len(content)
+        return content
+
+    def blob_sha(self, path: str) -> str:
+        """
+        Git blob id of a file's current contents. Taken from the git index when
+        the file is unmodified in the checkout, otherwise hashed the way git would.
+        """
+        rel_path = self.rel_path(path)
+        if self._blob_shas is None:
+            self._blob_shas = self._load_blob_shas()
+        sha = self._blob_shas.get(rel_path)
+        if sha is None:
+            with open(self.abs_path(rel_path), 'rb') as f:
+                sha = git_blob_sha(f.read())
+            self._blob_shas[rel_path] = sha
+        return sha
+
+    def _load_blob_shas(self) -> Dict[str, str]:
+        if not os.path.exists(os.path.join(self.repo_path, '.git')):
+            return {}
+        try:
+            staged = subprocess.run(
+                ['git', 'ls-files', '--stage', '-z'],
+                capture_output=True, text=True, cwd=self.repo_path, check=True, timeout=60
+            ).stdout
+            modified = subprocess.run(
+                ['git', 'ls-files', '--modified', '-z'],
+                capture_output=True, text=True, cwd=self.repo_path, check=True, timeout=60
+            ).stdout
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.debug("git ls-files unavailable for {}: {}".format(self.repo_path, e))
+            return {}
+
+        changed = {os.path.normpath(p) for p in modified.split('\0') if p}
+        shas = {}
+        for entry in staged.split('\0'):
+            if not entry:
+                continue
+            meta, _, path = entry.partition('\t')
+            mode, sha, _ = meta.split(' ', 2)
+            path = os.path.normpath(path)
+            # Regular files only: symlink and submodule ids don't describe file contents
+            if mode in ('100644', '100755') and path not in changed:
+                shas[path] = sha
+        return shas
+
+    def __getstate__(self):
+        # Shipped to worker processes without cached contents or trees;
+        # workers re-read what they need instead of paying to pickle it.
+        state = self.__dict__.copy()
+        state['_contents'] = {}
+        state['_cached_bytes'] = 0
+        state['ast_cache'] = ASTCache(self.ast_cache.max_bytes)
+        state['_trigrams'] = None
+        return state
+
+    def parse_ast(self, path: str):
+        """Parsed module for a Python file, shared by every AST consumer in the scan"""
+        rel_path = self.rel_path(path)
+        return self.ast_cache.parse(rel_path, self.read_text(rel_path))
+
+    def trigram_index(self) -> TrigramIndex:
+        """Text search index over this index's files, built on first use and kept for the scan"""
+        if self._trigrams is None:
+            self._trigrams = TrigramIndex(self)
+        return self._trigrams
+
+    def stats(self) -> Dict:
+        return {
+            'files_indexed': len(self.files),
+            'bytes_indexed': self.total_size,
+            'file_reads': self._reads,
+            'bytes_read': self._bytes_read,
+            **self.policy.stats(),
+        }
+
+
+def git_blob_sha(data: bytes) -> str:
+    header = 'blob {}\0'.format(len(data)).encode('ascii')
+    return hashlib.sha1(header + data).hexdigest()
+
+
+def classify_language(filename: str) -> Optional[str]:
+    return LANGUAGE_BY_EXTENSION.get(os.path.splitext(filename)[1].lower())
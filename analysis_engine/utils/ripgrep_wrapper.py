@@ -1,11 +1,91 @@
 import subprocess
+import tempfile
+import base64
 import json
 import logging
 import os
-from typing import List, Dict, Optional
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Paths per rg run in `match_lines`, keeping the command line well under ARG_MAX
+MATCH_BATCH_SIZE = 2000
+
+
+def _event_text(field: Dict) -> str:
+    """Text of an rg JSON `path`/`lines` field; non-UTF-8 data arrives base64-encoded"""
+    if 'text' in field:
+        return field['text']
+    return base64.b64decode(field.get('bytes', '')).decode('utf-8', errors='replace')
+
+
+def _format_context(lines, match_line_number: int) -> str:
+    formatted = []
+    for line_number, text in lines:
+        marker = '>' if line_number == match_line_number else ' '
+        formatted.append(f"{marker} {line_number}: {text.strip()}")
+    return "\n".join(formatted)
+
+
+def parse_rg_json(lines: Iterable[str], repo_path: str, pattern: str, context_lines: int) -> Iterator[Dict]:
+    """
+    Turn an `rg --json` event stream into match results, one per matched line,
+    as soon as each match's trailing context has been seen.
+
+    rg reports every line near a match exactly once per file, either as a
+    `context` event or as a `match` event, in line order. So a rolling window
+    of the last `context_lines` lines supplies each match's leading context,
+    and a match is complete once a line past its trailing context arrives (or
+    its file ends).
+    """
+    recent = deque(maxlen=context_lines or None)
+    pending = []  # (result, lines collected so far) awaiting trailing context
+    file_path = None
+
+    def flush(upto=None):
+        while pending and (upto is None or pending[0][0]['line_number'] + context_lines < upto):
+            result, window = pending.pop(0)
+            result['context_snippet'] = _format_context(window, result['line_number'])
+            yield result
+
+    for raw in lines:
+        try:
+            event = json.loads(raw)
+        except json.JSONDecodeError:
+            logger.warning(f"Failed to decode JSON line from ripgrep: {raw!r}")
+            continue
+
+        kind = event.get('type')
+        data = event.get('data', {})
+        if kind == 'begin':
+            file_path = os.path.relpath(_event_text(data['path']), repo_path)
+            recent.clear()
+        elif kind in ('match', 'context'):
+            line_number = data['line_number']
+            text = _event_text(data['lines']).rstrip('\r\n')
+            # Drop leading context that is no longer adjacent (rg skipped a gap)
+            while recent and recent[0][0] < line_number - context_lines:
+                recent.popleft()
+            yield from flush(upto=line_number)
+            for _, window in pending:
+                window.append((line_number, text))
+            if kind == 'match':
+                result = {
+                    'file_path': file_path,
+                    'line_number': line_number,
+                    'line_content': text.strip(),
+                    'match_text': pattern,
+                }
+                pending.append((result, list(recent) + [(line_number, text)]))
+            if context_lines:
+                recent.append((line_number, text))
+        elif kind == 'end':
+            yield from flush()
+            recent.clear()
+    yield from flush()
+
+
 class RipGrep:
     """
     A wrapper around the `rg` (ripgrep) command-line tool to perform
@@ -29,7 +109,7 @@ class RipGrep:
             )
 
     def search(
-               self, 
+               self,
                pattern: str,
                file_type: Optional[str] = None,
                context_lines: int = 5,
@@ -49,114 +129,110 @@ class RipGrep:
                         Example: {
                             'file_path': 'src/main.js',
                             'line_number': 15,
-                            'line_content': '  vulnerableFunc(user_input);',
-                            'context_before': [...],
-                            'context_after': [...],
-                            'match': 'vulnerableFunc'
+                            'line_content': 'vulnerableFunc(user_input);',
+                            'match_text': 'vulnerableFunc',
+                            'context_snippet': '  14: ...\\n> 15: vulnerableFunc(user_input);\\n  16: ...'
                         }
         """
+        return list(self.iter_search(pattern, file_type, context_lines, max_results))
+
+    def iter_search(
+               self,
+               pattern: str,
+               file_type: Optional[str] = None,
+               context_lines: int = 5,
+               max_results: Optional[int] = 20) -> Iterator[Dict]:
+        """
+        Generator form of `search`: results are parsed from rg's output as it
+        streams in, and rg is stopped as soon as `max_results` matches have been
+        produced (or the caller stops iterating).
+        """
         cmd = [
             'rg',
             '--json',                   # Output results as JSON
             '--context', str(context_lines), # Include context lines
-            '--max-count', str(max_results), # Limit number of results
-            pattern,
-            self.repo_path
         ]
+        if max_results:
+            cmd.extend(['--max-count', str(max_results)]) # Per-file cap; the total is enforced below
         if file_type:
             cmd.extend(['-t', file_type])
+        cmd.extend(['-e', pattern, self.repo_path])
 
         logger.debug(f"Running ripgrep command: {' '.join(cmd)}")
 
+        lines = self._stream(cmd)
+        produced = 0
         try:
-            process = subprocess.run(cmd, capture_output=True, text=True, check=True, encoding='utf-8')
-        except subprocess.CalledProcessError as e:
-            # rg exits with 1 if no matches, but 2 if error. Only raise on 2.
-            if e.returncode == 1:
-                logger.debug(f"No matches found for pattern '{pattern}'.")
-                return []
-            logger.error(f"ripgrep command failed with error: {e.stderr}", exc_info=True)
-            raise RuntimeError(f"ripgrep error: {e.stderr}")
-        except Exception as e:
-            logger.error(f"Failed to run ripgrep: {e}", exc_info=True)
-            raise
-
-        results = []
-        current_match_data = None
-        for line in process.stdout.splitlines():
-            try:
-                json_data = json.loads(line)
-                
-                if json_data['type'] == 'begin':
-                    current_match_data = {'file_path': os.path.relpath(json_data['data']['path']['text'], self.repo_path), 'context_before': [], 'context_after': []}
-                elif json_data['type'] == 'match' and current_match_data:
-                    current_match_data['line_number'] = json_data['data']['line_number']
-                    current_match_data['line_content'] = json_data['data']['lines']['text'].strip()
-                    current_match_data['match'] = pattern # For simplicity, store the pattern as match
-                    # Add match to the results list and reset for next begin
-                    results.append(current_match_data)
-                    current_match_data = None # Reset to wait for next 'begin'
-                elif json_data['type'] == 'context' and current_match_data:
-                    if json_data['data']['submatches'][0]['start'] < json_data['data']['lines']['text'].strip().find(pattern): # This heuristic might be wrong without pattern matching logic
-                        current_match_data['context_before'].append(json_data['data']['lines']['text'].strip())
-                    else:
-                        current_match_data['context_after'].append(json_data['data']['lines']['text'].strip())
-                elif json_data['type'] == 'end':
-                    # Should ideally have a match data here, but handle cases where match might be filtered
-                    if current_match_data and 'line_number' in current_match_data: # Ensure it's a full match block
-                        results.append(current_match_data)
-                    current_match_data = None
-                
-            except json.JSONDecodeError:
-                logger.warning(f"Failed to decode JSON line from ripgrep: {line}")
-            except Exception as e:
-                logger.error(f"Error processing ripgrep JSON output line: {line} - {e}", exc_info=True)
-        
-        # Rigrep outputs results stream, a 'match' event always follows a 'begin' event for actual matches.
-        # The logic for accumulating context_before/after for a specific match from the raw rg --json stream is complex.
-        # A simpler approach for the scope of this task is to extract only file_path, line_number and content,
-        # and then re-read files for the context directly.
-        # Let's simplify the parsing for now to just get file, line, and the match line itself.
-        
-        simplified_results = []
-        for line in process.stdout.splitlines():
-            try:
-                json_data = json.loads(line)
-                if json_data['type'] == 'match':
-                    simplified_results.append({
-                        'file_path': os.path.relpath(json_data['data']['path']['text'], self.repo_path),
-                        'line_number': json_data['data']['line_number'],
-                        'line_content': json_data['data']['lines']['text'].strip(),
-                        'match_text': pattern # We'll re-read for context later
-                    })
-            except json.JSONDecodeError:
-                pass # Ignore non-json lines or malformed lines
-        
-        # Now, for each simplified result, re-read the file to get N lines of context
-        final_results = []
-        for res in simplified_results:
-            file_abs_path = os.path.join(self.repo_path, res['file_path'])
-            try:
-                with open(file_abs_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    lines = f.readlines()
-                
-                start_line_idx = max(0, res['line_number'] - 1 - context_lines)
-                end_line_idx = min(len(lines), res['line_number'] + context_lines)
-                
-                context_snippet_lines = []
-                for i in range(start_line_idx, end_line_idx):
-                    line_prefix = f"{i + 1}: "
-                    if i + 1 == res['line_number']:
-                        context_snippet_lines.append(f"> {line_prefix}{lines[i].strip()}") # Mark the actual match line
-                    else:
-                        context_snippet_lines.append(f"  {line_prefix}{lines[i].strip()}")
-                
-                res['context_snippet'] = "\n".join(context_snippet_lines)
-                final_results.append(res)
-                if len(final_results) >= max_results: # Ensure we don't exceed max results after re-reading context
+            for result in parse_rg_json(lines, self.repo_path, pattern, context_lines):
+                yield result
+                produced += 1
+                if max_results and produced >= max_results:
                     break
+        finally:
+            # Stops rg if it is still running
+            lines.close()
+        if produced == 0:
+            logger.debug(f"No matches found for pattern '{pattern}'.")
 
-            except Exception as e:
-                logger.warning(f"Could not read context for {res['file_path']}:{res['line_number']}: {e}")
-        
-        return final_results
+    def match_lines(
+               self,
+               patterns: List[str],
+               paths: List[str],
+               ignore_case: bool = True) -> Iterator[Tuple[str, int, str]]:
+        """
+        Lines matching any of `patterns` in the given repository-relative files,
+        as (file_path, line_number, line) with the line's newline removed
+        ('\r\n' too, as Python's universal newlines would read the line).
+        Each batch of paths is a single rg run searching the files on rg's
+        worker threads. Exactly `paths` are searched: ignore files are not
+        consulted and binary files are searched as text.
+        """
+        cmd = ['rg', '--json', '--no-config', '--text', '--no-ignore', '--hidden']
+        if ignore_case:
+            cmd.append('--ignore-case')
+        for pattern in patterns:
+            cmd.extend(['-e', pattern])
+        cmd.append('--')
+
+        for start in range(0, len(paths), MATCH_BATCH_SIZE):
+            batch = paths[start:start + MATCH_BATCH_SIZE]
+            logger.debug(f"Running ripgrep with {len(patterns)} patterns over {len(batch)} files")
+            for raw in self._stream(cmd + batch, cwd=self.repo_path):
+                try:
+                    event = json.loads(raw)
+                except json.JSONDecodeError:
+                    logger.warning(f"Failed to decode JSON line from ripgrep: {raw!r}")
+                    continue
+                if event.get('type') != 'match':
+                    continue
+                data = event['data']
+                yield (
+                    os.path.normpath(_event_text(data['path'])),
+                    data['line_number'],
+                    _event_text(data['lines']).rstrip('\r\n'),
+                )
+
+    def _stream(self, cmd: List[str], cwd: Optional[str] = None) -> Iterator[str]:
+        """
+        Yield rg's stdout lines as they arrive. Closing the generator early
+        kills rg; if rg runs to completion with an error, RuntimeError is raised.
+        """
+        # stderr goes to a file so a chatty rg can never block on a full pipe
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(
+                cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=stderr, text=True, encoding='utf-8', errors='replace'
+            )
+            try:
+                yield from process.stdout
+            finally:
+                if process.poll() is None:
+                    process.kill()
+                process.stdout.close()
+                returncode = process.wait()
+
+            # rg exits with 1 if no matches, but 2 if error. Only raise on 2.
+            if returncode == 2:
+                stderr.seek(0)
+                message = stderr.read().decode('utf-8', errors='replace')
+                logger.error(f"ripgrep command failed with error: {message}")
+                raise RuntimeError(f"ripgrep error: {message}")
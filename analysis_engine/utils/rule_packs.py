@@ -0,0 +1,157 @@
+import os
+import sys
+import json
+import pickle
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# Versioned rule-pack sources shipped with the engine
+RULES_DIR = os.path.join(BASE_DIR, "rules")
+# Compiled artifacts, one per pack content hash
+DEFAULT_ARTIFACT_DIR = os.path.join(BASE_DIR, "cache", "rule_packs")
+# Bumped when the artifact layout changes, so stale artifacts are rebuilt
+ARTIFACT_FORMAT = 1
+
+
+class RulePackError(ValueError):
+    """A rule pack that is missing, malformed or fails validation"""
+
+
+class RulePack:
+    """
+    A validated rule pack and the tables compiled from it. `content_hash`
+    identifies the exact source the tables were built from and is recorded
+    with every scan alongside the pack's declared `version`.
+    """
+
+    __slots__ = ('name', 'version', 'content_hash', 'rules', 'tables')
+
+    def __init__(self, name: str, version: str, content_hash: str, rules: Dict, tables: Dict):
+        self.name = name
+        self.version = version
+        self.content_hash = content_hash
+        self.rules = rules
+        self.tables = tables
+
+    def describe(self) -> Dict:
+        return {'version': self.version, 'content_hash': self.content_hash[:16], 'rules': len(self.rules)}
+
+    def __repr__(self):
+        return "RulePack({}, version={}, rules={})".format(self.name, self.version, len(self.rules))
+
+
+# Packs already loaded by this process, by (pack name, content hash, compiler key)
+_loaded: Dict[tuple, RulePack] = {}
+_lock = threading.Lock()
+
+
+def rule_pack_path(name: str) -> str:
+    return os.path.join(RULES_DIR, "{}.json".format(name))
+
+
+def load_rule_pack(name: str, validate: Callable[[Dict], None], compile_tables: Callable[[Dict], Dict],
+                   compiler_key: str = '', path: Optional[str] = None,
+                   artifact_dir: Optional[str] = DEFAULT_ARTIFACT_DIR) -> RulePack:
+    """
+    Load rule pack `name`, validating and compiling it only when no artifact
+    exists for its current contents. `validate(rules)` raises RulePackError
+    for bad rules; `compile_tables(rules)` returns the derived lookup tables
+    stored in the artifact. `compiler_key` must change whenever
+    `compile_tables` would produce different output for the same rules.
+    """
+    path = path or rule_pack_path(name)
+    try:
+        with open(path, 'rb') as f:
+            source = f.read()
+    except OSError as e:
+        raise RulePackError("Rule pack '{}' cannot be read: {}".format(name, e))
+    content_hash = hashlib.sha256(source).hexdigest()
+    key = (name, content_hash, compiler_key)
+
+    with _lock:
+        pack = _loaded.get(key)
+        if pack is not None:
+            return pack
+
+        artifact = None
+        if artifact_dir:
+            artifact = os.path.join(artifact_dir, "{}-{}-{}.pickle".format(
+                name, content_hash[:16], _artifact_key(compiler_key)
+            ))
+            pack = _read_artifact(artifact)
+        if pack is None:
+            pack = _compile(name, source, content_hash, validate, compile_tables)
+            if artifact:
+                _write_artifact(artifact, pack)
+        _loaded[key] = pack
+        return pack
+
+
+def _artifact_key(compiler_key: str) -> str:
+    return hashlib.sha256('{}:{}'.format(ARTIFACT_FORMAT, compiler_key).encode('utf-8')).hexdigest()[:8]
+
+
+def _compile(name: str, source: bytes, content_hash: str, validate, compile_tables) -> RulePack:
+    try:
+        document = json.loads(source.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise RulePackError("Rule pack '{}' is not valid JSON: {}".format(name, e))
+    if not isinstance(document, dict) or not isinstance(document.get('rules'), dict):
+        raise RulePackError("Rule pack '{}' has no 'rules' table".format(name))
+    if document.get('pack') != name:
+        raise RulePackError("Rule pack file for '{}' declares pack '{}'".format(name, document.get('pack')))
+    version = document.get('version')
+    if not isinstance(version, str) or not version:
+        raise RulePackError("Rule pack '{}' has no version".format(name))
+
+    rules = document['rules']
+    validate(rules)
+    pack = RulePack(name, version, content_hash, rules, compile_tables(rules))
+    logger.info("Compiled rule pack {} {} ({} rules)".format(name, version, len(rules)))
+    return pack
+
+
+def _read_artifact(artifact: str) -> Optional[RulePack]:
+    try:
+        with open(artifact, 'rb') as f:
+            state = pickle.load(f)
+        return RulePack(*state)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("Ignoring unreadable rule-pack artifact {}: {}".format(artifact, e))
+        return None
+
+
+def _write_artifact(artifact: str, pack: RulePack):
+    state = (pack.name, pack.version, pack.content_hash, pack.rules, pack.tables)
+    try:
+        os.makedirs(os.path.dirname(artifact), exist_ok=True)
+        # Written to a temporary file and renamed, so concurrent workers never see a partial artifact
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(artifact), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, artifact)
+    except OSError as e:
+        logger.warning("Could not write rule-pack artifact {}: {}".format(artifact, e))
+
+
+def require(condition: Any, pack: str, rule: str, problem: str):
+    """Raise RulePackError for `rule` unless `condition` holds"""
+    if not condition:
+        raise RulePackError("Rule pack '{}', rule '{}': {}".format(pack, rule, problem))
+
+
+def source_fingerprint(*modules) -> str:
+    """Compiler key covering the source of the modules that build a pack's tables"""
+    digest = hashlib.sha256(sys.version.encode('utf-8'))
+    for module in modules:
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
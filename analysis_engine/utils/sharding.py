@@ -0,0 +1,217 @@
+import os
+import heapq
+import logging
+import multiprocessing
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional
+
+from analysis_engine.utils.ast_cache import combine_stats
+
+logger = logging.getLogger(__name__)
+
+# More shards than workers keeps every core busy while the last shards drain
+SHARDS_PER_WORKER = 4
+# Below this many files, process start-up and pickling cost more than they save
+DEFAULT_MIN_FILES = 200
+# Serial runs write freshly analyzed files to the findings cache in chunks of this many
+STORE_CHUNK_FILES = 500
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def plan_shards(files, shard_count: int) -> List[List]:
+    """
+    Split indexed files into `shard_count` size-balanced shards.
+    Files are placed largest first onto the currently lightest shard (LPT
+    scheduling), and the shards come back heaviest first so the biggest units
+    of work are submitted before the small ones that fill in the gaps.
+    """
+    ordered = sorted(files, key=lambda f: (-f.size, f.rel_path))
+    shard_count = max(1, min(shard_count, len(ordered)))
+    shards = [[] for _ in range(shard_count)]
+    heap = [(0, n) for n in range(shard_count)]
+    for indexed in ordered:
+        load, n = heapq.heappop(heap)
+        shards[n].append(indexed)
+        heapq.heappush(heap, (load + indexed.size, n))
+    loads = {n: load for load, n in heap}
+    return [shards[n] for n in sorted(range(shard_count), key=lambda n: -loads[n]) if shards[n]]
+
+
+def _analyze_shard(analyzer, repo_index, rel_paths):
+    """Worker entry point: run the analyzer's per-file pass over one shard"""
+    results = [(rel_path, analyzer._analyze_file(rel_path, repo_index)) for rel_path in rel_paths]
+    guard = getattr(analyzer, 'guard', None)
+    return results, {
+        'repo_index': repo_index.stats(),
+        'ast_cache': repo_index.ast_cache.stats(),
+        'guard': guard.take_report() if guard is not None else None,
+    }
+
+
+class ShardedFileRunner:
+    """
+    Runs an analyzer's `_analyze_file` over a set of indexed files, either
+    serially or sharded across a process pool. Sharded results are merged back
+    into the order of the input files, so the output is identical to a serial run.
+    With a findings cache, files whose blobs were analyzed before are served
+    from it and only the rest are analyzed. A `batch` callable, given every
+    pending path at once, replaces per-file analysis for engines that search
+    many files in one go (it must return an entry for each path it analyzed).
+    """
+
+    def __init__(self, workers: Optional[int] = 1, min_files: int = DEFAULT_MIN_FILES, cache=None):
+        self.workers = workers if workers else default_workers()
+        self.min_files = min_files
+        self.cache = cache
+        self.stats: Dict = {}
+        self._pool = None
+        self._lock = threading.Lock()
+        self._cancelled = False
+
+    @property
+    def parallel(self) -> bool:
+        return self.workers > 1
+
+    def run(self, analyzer, repo_index, files, batch=None) -> List[Dict]:
+        return list(self.iter_run(analyzer, repo_index, files, batch))
+
+    def iter_run(self, analyzer, repo_index, files, batch=None) -> Iterator[Dict]:
+        """
+        Findings in input-file order, yielded as they become available. Serial
+        runs analyze one file at a time and write the findings cache in chunks,
+        so only a chunk of results is held; sharded and batch runs finish
+        before the first finding is yielded.
+        """
+        files = list(files)
+        self.stats = {'files': len(files), 'workers': 1, 'shards': 0}
+        self._cancelled = False
+
+        cached = self._load_cached(analyzer, repo_index, files)
+        pending = [indexed for indexed in files if indexed.rel_path not in cached]
+        if batch is None and not self._should_shard(pending):
+            yield from self._iter_serial(analyzer, repo_index, files, cached)
+            return
+
+        if batch is not None:
+            by_file = batch([indexed.rel_path for indexed in pending], repo_index) if pending else {}
+        else:
+            by_file = self._run_sharded(analyzer, repo_index, pending)
+        self._store(analyzer, repo_index, by_file)
+        by_file.update(cached)
+        for indexed in files:
+            yield from by_file.pop(indexed.rel_path, ())
+
+    def _iter_serial(self, analyzer, repo_index, files, cached):
+        analyzed = {}
+        for indexed in files:
+            findings = cached.pop(indexed.rel_path, None)
+            if findings is None:
+                findings = analyzer._analyze_file(indexed.rel_path, repo_index)
+                analyzed[indexed.rel_path] = findings
+                if len(analyzed) >= STORE_CHUNK_FILES:
+                    self._store(analyzer, repo_index, analyzed)
+                    analyzed = {}
+            yield from findings
+        self._store(analyzer, repo_index, analyzed)
+
+    def _load_cached(self, analyzer, repo_index, files):
+        if self.cache is None or not files:
+            return {}
+        try:
+            cached = self.cache.load(analyzer.cache_identity(), repo_index, files)
+        except sqlite3.Error as e:
+            logger.warning("Findings cache unavailable, analyzing every file: {}".format(e))
+            return {}
+        self.stats['cached_files'] = len(cached)
+        return cached
+
+    def _store(self, analyzer, repo_index, by_file):
+        if self.cache is None or not by_file:
+            return
+        incomplete = analyzer.guard.incomplete if getattr(analyzer, 'guard', None) is not None else None
+        if incomplete:
+            # Results cut short by a time budget depend on machine load, not on the blob
+            by_file = {rel_path: findings for rel_path, findings in by_file.items() if rel_path not in incomplete}
+        try:
+            self.cache.store(analyzer.cache_identity(), repo_index, by_file)
+        except sqlite3.Error as e:
+            logger.warning("Could not update findings cache: {}".format(e))
+
+    def _should_shard(self, files) -> bool:
+        if not self.parallel or len(files) < self.min_files:
+            return False
+        if multiprocessing.current_process().daemon:
+            # Celery prefork workers are daemonic and may not spawn children
+            logger.info("Running inside a daemonic worker; file analysis stays serial")
+            return False
+        return True
+
+    def _run_sharded(self, analyzer, repo_index, files):
+        shards = plan_shards(files, self.workers * SHARDS_PER_WORKER)
+        workers = min(self.workers, len(shards))
+        logger.info("{}: {} files in {} shards across {} workers".format(
+            type(analyzer).__name__, len(files), len(shards), workers))
+
+        by_file = {}
+        worker_stats = []
+        pool = ProcessPoolExecutor(max_workers=workers)
+        with self._lock:
+            if self._cancelled:
+                pool.shutdown(wait=False)
+                raise RuntimeError("Sharded analysis cancelled")
+            self._pool = pool
+        try:
+            futures = [
+                pool.submit(_analyze_shard, analyzer, repo_index, [indexed.rel_path for indexed in shard])
+                for shard in shards
+            ]
+            for future in as_completed(futures):
+                results, stats = future.result()
+                by_file.update(results)
+                worker_stats.append(stats)
+                if stats['guard'] is not None:
+                    analyzer.guard.merge(stats['guard'])
+        finally:
+            with self._lock:
+                self._pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        self.stats.update({
+            'workers': workers,
+            'shards': len(shards),
+            'largest_shard_bytes': sum(f.size for f in shards[0]),
+            'smallest_shard_bytes': sum(f.size for f in shards[-1]),
+            # Summed over worker processes, which never touch the parent's caches
+            'repo_index': {
+                key: sum(s['repo_index'][key] for s in worker_stats) for key in ('file_reads', 'bytes_read')
+            },
+            'ast_cache': combine_stats([s['ast_cache'] for s in worker_stats]),
+        })
+        return by_file
+
+    def cancel(self):
+        """Stop an in-flight sharded run (used when its stage times out)"""
+        with self._lock:
+            self._cancelled = True
+            pool = self._pool
+        if pool is None:
+            return
+        for process in list((getattr(pool, '_processes', None) or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def __getstate__(self):
+        # Travels with its analyzer into worker processes; pools and locks stay behind
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        state['_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
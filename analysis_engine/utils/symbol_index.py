@@ -0,0 +1,245 @@
+import os
+import re
+import ast
+import bisect
+import logging
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Call sites, callees and definitions listed per hunt context
+MAX_REFERENCES = 20
+# Names defined all over a codebase say nothing about which code is linked
+IGNORED_NAMES = {'__init__', 'main', 'run', 'get', 'post', 'put', 'delete', 'setup', 'test', 'index', 'update'}
+IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+# Declarations in languages the index does not parse (`function foo`, `class Foo`)
+DECLARED_ENTITY = re.compile(r'(?:function|class|def)\s+([A-Za-z0-9_]+)')
+
+
+class Definition(NamedTuple):
+    name: str
+    qualname: str
+    file_path: str
+    line: int
+    end_line: int
+    kind: str  # 'function', 'method' or 'class'
+
+
+class CallSite(NamedTuple):
+    file_path: str
+    line: int
+    caller: str  # qualname of the enclosing definition, '<module>' at top level
+
+
+class _SymbolVisitor(ast.NodeVisitor):
+    """One pass over a module recording definitions, import aliases and calls"""
+
+    def __init__(self, file_path: str, local_roots=frozenset()):
+        self.file_path = file_path
+        self.local_roots = local_roots
+        self.definitions: List[Definition] = []
+        self.calls: List[Tuple[str, CallSite]] = []
+        self.aliases: Dict[str, str] = {}
+        # Names bound by `import x` for modules outside the repository (subprocess, os, ...)
+        self.external_modules = set()
+        self._scope: List[Definition] = []
+
+    def _define(self, node, kind):
+        parent = self._scope[-1] if self._scope else None
+        if kind == 'function' and parent is not None and parent.kind == 'class':
+            kind = 'method'
+        qualname = '{}.{}'.format(parent.qualname, node.name) if parent else node.name
+        definition = Definition(node.name, qualname, self.file_path, node.lineno,
+                                getattr(node, 'end_lineno', None) or node.lineno, kind)
+        self.definitions.append(definition)
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+        self._scope.append(definition)
+        for child in node.body:
+            self.visit(child)
+        self._scope.pop()
+
+    def visit_FunctionDef(self, node):
+        self._define(node, 'function')
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        for base in node.bases:
+            self.visit(base)
+        self._define(node, 'class')
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            if alias.name.split('.', 1)[0] not in self.local_roots:
+                self.external_modules.add(alias.asname or alias.name.split('.', 1)[0])
+
+    def visit_ImportFrom(self, node):
+        for alias in node.names:
+            if alias.asname and alias.name != '*':
+                self.aliases[alias.asname] = alias.name
+
+    def visit_Call(self, node):
+        func = node.func
+        name = func.id if isinstance(func, ast.Name) else func.attr if isinstance(func, ast.Attribute) else None
+        if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id in self.external_modules:
+            # subprocess.run() is not a call of the repository's own `run`
+            name = None
+        if name:
+            caller = self._scope[-1].qualname if self._scope else '<module>'
+            self.calls.append((self.aliases.get(name, name), CallSite(self.file_path, node.lineno, caller)))
+        self.generic_visit(node)
+
+
+class SymbolIndex:
+    """
+    Repo-wide index of Python definitions and call sites, built once per scan
+    from the trees in the scan's AST cache. Definitions are keyed by name and,
+    per file, kept in line order so the definition enclosing a finding is a
+    bisect away; call sites are keyed by the called name (import aliases
+    resolved), so callers and callees of a definition are dict lookups rather
+    than a text search over the checkout. Resolution is by name, not by type:
+    `obj.save()` counts as a call of every `save` the index knows.
+    """
+
+    def __init__(self, repo_index):
+        self.repo_index = repo_index
+        self.definitions: Dict[str, List[Definition]] = {}
+        self.calls: Dict[str, List[CallSite]] = {}
+        self._by_file: Dict[str, List[Definition]] = {}
+        self._starts: Dict[str, List[int]] = {}
+        self._callees: Dict[Tuple[str, str], List[Tuple[str, int]]] = {}
+        self.files = 0
+        self.syntax_errors = 0
+
+    @classmethod
+    def build(cls, repo_index) -> 'SymbolIndex':
+        index = cls(repo_index)
+        started = time.time()
+        files = list(repo_index.iter_files(language='python'))
+        # Top-level packages and modules of the checkout, which `import x` may refer to
+        local_roots = frozenset(os.path.splitext(f.rel_path.split(os.sep, 1)[0])[0] for f in files)
+        for indexed in files:
+            index.add_file(indexed.rel_path, local_roots)
+        logger.info("SymbolIndex built: {} files, {} names defined, {} called names in {:.2f}s".format(
+            index.files, len(index.definitions), len(index.calls), time.time() - started
+        ))
+        return index
+
+    def add_file(self, rel_path: str, local_roots=frozenset()):
+        try:
+            tree = self.repo_index.parse_ast(rel_path)
+        except (SyntaxError, ValueError):
+            self.syntax_errors += 1
+            return
+        except OSError as e:
+            logger.debug("Cannot index symbols of {}: {}".format(rel_path, e))
+            return
+        visitor = _SymbolVisitor(rel_path, local_roots)
+        visitor.visit(tree)
+        self.files += 1
+        for definition in visitor.definitions:
+            self.definitions.setdefault(definition.name, []).append(definition)
+        definitions = sorted(visitor.definitions, key=lambda d: d.line)
+        self._by_file[rel_path] = definitions
+        self._starts[rel_path] = [d.line for d in definitions]
+        for name, site in visitor.calls:
+            self.calls.setdefault(name, []).append(site)
+            if site.caller != '<module>':
+                self._callees.setdefault((rel_path, site.caller), []).append((name, site.line))
+
+    # -----------------------------
+    # LOOKUPS
+    # -----------------------------
+    def enclosing(self, file_path: str, line: int) -> Optional[Definition]:
+        """Innermost definition whose body spans `line`"""
+        definitions = self._by_file.get(file_path)
+        if not definitions or not isinstance(line, int):
+            return None
+        # Candidates start at or before the line; the latest-starting one that still spans it is innermost
+        for definition in reversed(definitions[:bisect.bisect_right(self._starts[file_path], line)]):
+            if definition.end_line >= line:
+                return definition
+        return None
+
+    def callers(self, name: str) -> List[CallSite]:
+        return self.calls.get(name, [])
+
+    def callees(self, definition: Definition) -> List[Tuple[str, int, List[Definition]]]:
+        """(called name, line, definitions of that name) for each call made in `definition`'s own body"""
+        return [
+            (name, line, self.definitions.get(name, []))
+            for name, line in self._callees.get((definition.file_path, definition.qualname), [])
+        ]
+
+    def target(self, file_path: str, line: int, snippet: str = '') -> Optional[Definition]:
+        """
+        The code a finding is about: the definition enclosing its line, else
+        the first definition named in its snippet (module-level findings).
+        """
+        definition = self.enclosing(file_path, line)
+        if definition is not None:
+            return definition
+        for name in IDENTIFIER.findall(snippet or ''):
+            if name not in IGNORED_NAMES and self.definitions.get(name):
+                local = [d for d in self.definitions[name] if d.file_path == file_path]
+                return (local or self.definitions[name])[0]
+        return None
+
+    def mentions(self, name: str, language: Optional[str], exclude: str = None) -> List[str]:
+        """Files of `language` that use `name` as a whole word (for code the index does not parse)"""
+        found = []
+        for rel_path in self.repo_index.trigram_index().files_matching(r'\b{}\b'.format(re.escape(name))):
+            if rel_path == exclude or (language and self.repo_index.get(rel_path).language != language):
+                continue
+            found.append(rel_path)
+            if len(found) >= MAX_REFERENCES:
+                break
+        return found
+
+    # -----------------------------
+    # HUNT CONTEXT
+    # -----------------------------
+    def cross_references(self, finding: Dict) -> str:
+        """Callers and callees of the code a finding sits in, as prompt text ('' if none are known)"""
+        file_path, line, snippet = finding.get('file_path'), finding.get('line_number'), finding.get('context_snippet', '')
+        indexed = self.repo_index.get(file_path) if file_path else None
+        if indexed is not None and indexed.language != 'python':
+            match = DECLARED_ENTITY.search(snippet or '')
+            if not match:
+                return ''
+            files = self.mentions(match.group(1), indexed.language, exclude=file_path)
+            return "`{}` is also used in:\n{}".format(match.group(1), '\n'.join(files)) if files else ''
+
+        definition = self.target(file_path, line, snippet)
+        if definition is None:
+            return ''
+        lines = ["Vulnerable code is in {} `{}` ({}:{}-{})".format(
+            definition.kind, definition.qualname, definition.file_path, definition.line, definition.end_line
+        )]
+        callers = [] if definition.name in IGNORED_NAMES else self.callers(definition.name)
+        if callers:
+            lines.append("Called from:")
+            lines.extend("  {}:{} in {}".format(site.file_path, site.line, site.caller) for site in callers[:MAX_REFERENCES])
+            if len(callers) > MAX_REFERENCES:
+                lines.append("  ... {} more call sites".format(len(callers) - MAX_REFERENCES))
+        callees, seen = [], set()
+        for name, call_line, defined in self.callees(definition):
+            if defined and name not in IGNORED_NAMES and name not in seen:
+                seen.add(name)
+                callees.append((name, call_line, defined))
+        if callees:
+            lines.append("Calls into:")
+            for name, call_line, defined in callees[:MAX_REFERENCES]:
+                where = ', '.join('{}:{}'.format(d.file_path, d.line) for d in defined[:3])
+                lines.append("  line {}: {} -> {}".format(call_line, name, where))
+        return '\n'.join(lines)
+
+    def stats(self) -> Dict:
+        return {
+            'files': self.files,
+            'syntax_errors': self.syntax_errors,
+            'definitions': sum(len(found) for found in self.definitions.values()),
+            'call_sites': sum(len(found) for found in self.calls.values()),
+        }
@@ -0,0 +1,327 @@
+import os
+import re
+import time
+import logging
+from array import array
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+from analysis_engine.utils.ripgrep_wrapper import _format_context
+
+logger = logging.getLogger(__name__)
+
+# Text indexed per scan; files past the budget are searched without narrowing
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Head of a file checked for NUL bytes, as rg does to skip binary files
+BINARY_SNIFF_CHARS = 8192
+# rg `-t` file types and the extensions they cover (anything else is taken as an extension)
+FILE_TYPES = {
+    'py': ('.py', '.pyi'),
+    'js': ('.js', '.jsx', '.mjs', '.cjs', '.vue'),
+    'ts': ('.ts', '.tsx', '.cts', '.mts'),
+    'java': ('.java', '.jsp'),
+    'go': ('.go',),
+    'rust': ('.rs',),
+    'ruby': ('.rb', '.gemspec'),
+    'php': ('.php', '.phtml'),
+    'c': ('.c', '.h'),
+    'cpp': ('.cpp', '.cc', '.cxx', '.hpp', '.hh', '.hxx', '.h'),
+    'cs': ('.cs',),
+    'html': ('.html', '.htm'),
+    'json': ('.json',),
+    'yaml': ('.yaml', '.yml'),
+    'toml': ('.toml',),
+    'xml': ('.xml',),
+    'sh': ('.sh', '.bash', '.zsh'),
+    'sql': ('.sql',),
+    'md': ('.md', '.markdown'),
+    'txt': ('.txt',),
+}
+
+REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+if hasattr(sre_constants, 'POSSESSIVE_REPEAT'):
+    REPEATS.add(sre_constants.POSSESSIVE_REPEAT)
+ATOMIC_GROUP = getattr(sre_constants, 'ATOMIC_GROUP', None)
+
+# Query nodes: None matches every file, ('lit', text), ('and', [...]), ('or', [...])
+Query = Optional[Tuple]
+
+
+def trigrams(text: str) -> Set[Tuple[str, str, str]]:
+    return set(zip(text, text[1:], text[2:]))
+
+
+def plan_query(pattern: str, flags: int = 0) -> Query:
+    """
+    Literal strings any match of `pattern` must contain, as an and/or tree.
+    Only what is certain is kept: optional parts, character classes and
+    anything else not spelled out literally simply add no constraint.
+    """
+    parsed = sre_parse.parse(pattern, flags)
+    return _plan_sequence(parsed, bool(parsed.state.flags & re.IGNORECASE))
+
+
+def _plan_sequence(items, ignore_case: bool) -> Query:
+    parts, run = [], []
+
+    def end_run():
+        text = ''.join(run)
+        run.clear()
+        # Case-folding outside ASCII can match text whose lowercase form differs
+        if len(text) >= 3 and not (ignore_case and not text.isascii()):
+            parts.append(('lit', text.lower()))
+
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            run.append(chr(av))
+            continue
+        if op in REPEATS and av[0] >= 1 and len(av[2]) == 1 and av[2][0][0] is sre_constants.LITERAL:
+            # `xyz+`: the required repeats end the run, and the last one also starts the next
+            char = chr(av[2][0][1])
+            run.extend(char * av[0])
+            end_run()
+            run.append(char)
+            continue
+        end_run()
+        if op is sre_constants.SUBPATTERN:
+            _, add_flags, _, sub = av
+            parts.append(_plan_sequence(sub, ignore_case or bool(add_flags & re.IGNORECASE)))
+        elif op is sre_constants.BRANCH:
+            alternatives = [_plan_sequence(branch, ignore_case) for branch in av[1]]
+            if all(alternative is not None for alternative in alternatives):
+                parts.append(('or', alternatives))
+        elif op in REPEATS:
+            minimum, _, sub = av
+            if minimum >= 1:
+                parts.append(_plan_sequence(sub, ignore_case))
+        elif ATOMIC_GROUP is not None and op is ATOMIC_GROUP:
+            parts.append(_plan_sequence(av, ignore_case))
+    end_run()
+
+    parts = [part for part in parts if part is not None]
+    if not parts:
+        return None
+    return parts[0] if len(parts) == 1 else ('and', parts)
+
+
+class TrigramIndex:
+    """
+    In-memory trigram index over a scan's text files, searched through the
+    same interface as `RipGrep` (`search`, `iter_search`, `match_lines`).
+    Each file's lowercased text is reduced to its set of 3-character
+    substrings, and each trigram maps to the ids of the files containing it.
+    A regex query is planned into the literals every match must contain;
+    their trigrams' posting lists are intersected (or unioned, for
+    alternations) to find candidate files, and only candidates are searched
+    line by line with `re`. Files are read through the RepoIndex, so the
+    index needs no `rg` binary and no second read of the checkout.
+    """
+
+    def __init__(self, repo_index, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.repo_index = repo_index
+        self.max_bytes = max_bytes
+        self.paths: List[str] = []
+        self.postings: Dict[Tuple[str, str, str], array] = {}
+        # Files past the byte budget: always candidates
+        self.unindexed: Set[int] = set()
+        self.indexed_bytes = 0
+        self.binary_files = 0
+        self.queries = 0
+        self.candidates_searched = 0
+        self._build()
+
+    def _build(self):
+        started = time.time()
+        for indexed in self.repo_index.iter_files():
+            try:
+                text = self.repo_index.read_text(indexed.rel_path)
+            except OSError as e:
+                logger.debug("Cannot index {}: {}".format(indexed.rel_path, e))
+                continue
+            if '\0' in text[:BINARY_SNIFF_CHARS]:
+                self.binary_files += 1
+                continue
+            file_id = len(self.paths)
+            self.paths.append(indexed.rel_path)
+            if self.max_bytes and self.indexed_bytes + len(text) > self.max_bytes:
+                self.unindexed.add(file_id)
+                continue
+            self.indexed_bytes += len(text)
+            postings = self.postings
+            for trigram in trigrams(text.lower()):
+                posting = postings.get(trigram)
+                if posting is None:
+                    postings[trigram] = posting = array('I')
+                posting.append(file_id)
+        logger.info("TrigramIndex built: {} files, {} trigrams, {} bytes indexed ({} over budget) in {:.2f}s".format(
+            len(self.paths), len(self.postings), self.indexed_bytes, len(self.unindexed), time.time() - started
+        ))
+
+    # -----------------------------
+    # CANDIDATES
+    # -----------------------------
+    def candidates(self, pattern: str, flags: int = 0) -> List[int]:
+        """Ids, in file order, of the files that may contain a match of `pattern`"""
+        self.queries += 1
+        found = self._evaluate(plan_query(pattern, flags))
+        if found is None:
+            return list(range(len(self.paths)))
+        return sorted(found | self.unindexed)
+
+    def _evaluate(self, query: Query) -> Optional[Set[int]]:
+        if query is None:
+            return None
+        kind, value = query
+        if kind == 'lit':
+            postings = []
+            for trigram in trigrams(value):
+                posting = self.postings.get(trigram)
+                if posting is None:
+                    return set()
+                postings.append(posting)
+            postings.sort(key=len)
+            found = set(postings[0])
+            for posting in postings[1:]:
+                found.intersection_update(posting)
+                if not found:
+                    break
+            return found
+        results = [self._evaluate(part) for part in value]
+        if kind == 'and':
+            narrowed = [result for result in results if result is not None]
+            if not narrowed:
+                return None
+            narrowed.sort(key=len)
+            found = narrowed[0]
+            for result in narrowed[1:]:
+                found = found & result
+            return found
+        if any(result is None for result in results):
+            return None
+        return set().union(*results)
+
+    def files_matching(self, pattern: str, flags: int = 0) -> Iterator[str]:
+        """Paths of files with at least one match of `pattern` (searched as a whole text)"""
+        regex = self._compile(pattern, flags)
+        for file_id in self.candidates(pattern, flags):
+            self.candidates_searched += 1
+            if regex.search(self.repo_index.read_text(self.paths[file_id])):
+                yield self.paths[file_id]
+
+    # -----------------------------
+    # RIPGREP INTERFACE
+    # -----------------------------
+    def search(
+               self,
+               pattern: str,
+               file_type: Optional[str] = None,
+               context_lines: int = 5,
+               max_results: int = 20) -> List[Dict]:
+        """Same arguments and result dicts as `RipGrep.search`"""
+        return list(self.iter_search(pattern, file_type, context_lines, max_results))
+
+    def iter_search(
+               self,
+               pattern: str,
+               file_type: Optional[str] = None,
+               context_lines: int = 5,
+               max_results: Optional[int] = 20) -> Iterator[Dict]:
+        regex, whole_text = self._compile_line_search(pattern)
+        extensions = FILE_TYPES.get(file_type, ('.' + file_type,)) if file_type else None
+        produced = 0
+        for file_id in self.candidates(pattern):
+            rel_path = self.paths[file_id]
+            if extensions and not rel_path.endswith(extensions):
+                continue
+            self.candidates_searched += 1
+            lines = self._lines(rel_path, whole_text)
+            in_file = 0
+            for index, line in self._matching_lines(lines, regex):
+                window = range(max(0, index - context_lines), min(len(lines), index + context_lines + 1))
+                yield {
+                    'file_path': rel_path,
+                    'line_number': index + 1,
+                    'line_content': line.strip(),
+                    'match_text': pattern,
+                    'context_snippet': _format_context([(n + 1, lines[n].rstrip('\r')) for n in window], index + 1),
+                }
+                produced += 1
+                in_file += 1
+                # rg's --max-count caps matches per file; the total is capped across files
+                if max_results and (produced >= max_results or in_file >= max_results):
+                    break
+            if max_results and produced >= max_results:
+                return
+
+    def match_lines(
+               self,
+               patterns: List[str],
+               paths: List[str],
+               ignore_case: bool = True) -> Iterator[Tuple[str, int, str]]:
+        """Same contract as `RipGrep.match_lines`: lines of `paths` matching any pattern"""
+        if not patterns:
+            return
+        combined = '|'.join('(?:{})'.format(pattern) for pattern in patterns)
+        flags = re.IGNORECASE if ignore_case else 0
+        regex, whole_text = self._compile_line_search(combined, flags)
+        wanted = {os.path.normpath(path) for path in paths}
+        for file_id in self.candidates(combined, flags):
+            rel_path = self.paths[file_id]
+            if rel_path not in wanted:
+                continue
+            self.candidates_searched += 1
+            for index, line in self._matching_lines(self._lines(rel_path, whole_text), regex):
+                yield rel_path, index + 1, line
+
+    # -----------------------------
+    # HELPERS
+    # -----------------------------
+    def _compile(self, pattern: str, flags: int = 0):
+        try:
+            return re.compile(pattern, flags)
+        except re.error as e:
+            # rg fails the same way on a pattern it cannot parse
+            raise RuntimeError("invalid search pattern {!r}: {}".format(pattern, e))
+
+    def _compile_line_search(self, pattern: str, flags: int = 0):
+        """
+        The per-line regex, plus a whole-text one that matches wherever any line
+        would (so most candidates are rejected without splitting them into
+        lines); None when anchors make the two disagree.
+        """
+        regex = self._compile(pattern, flags)
+        if '\\A' in pattern or '\\Z' in pattern:
+            return regex, None
+        return regex, self._compile(pattern, flags | re.MULTILINE)
+
+    def _lines(self, rel_path: str, whole_text=None) -> List[str]:
+        """Lines as rg reads them ('\\r' kept); none when `whole_text` rules the file out"""
+        text = self.repo_index.read_text(rel_path)
+        if whole_text is not None and not whole_text.search(text):
+            return []
+        lines = text.split('\n')
+        if text.endswith('\n'):
+            lines.pop()
+        return lines
+
+    @staticmethod
+    def _matching_lines(lines: List[str], regex) -> Iterator[Tuple[int, str]]:
+        for index, line in enumerate(lines):
+            if regex.search(line):
+                yield index, line
+
+    def stats(self) -> Dict:
+        return {
+            'files': len(self.paths),
+            'trigrams': len(self.postings),
+            'indexed_bytes': self.indexed_bytes,
+            'unindexed_files': len(self.unindexed),
+            'binary_files': self.binary_files,
+            'queries': self.queries,
+            'candidates_searched': self.candidates_searched,
+        }
@@ -15,6 +15,8 @@ def create_app():
     # Configuration
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key')
     app.config['PULLED_CODE_DIR'] = os.path.join(project_root, 'PulledCode_temp')
+    app.config['MIRROR_CACHE_DIR'] = os.environ.get('MIRROR_CACHE_DIR', os.path.join(project_root, 'MirrorCache'))
+    app.config['MIRROR_CACHE_MAX_BYTES'] = int(os.environ.get('MIRROR_CACHE_MAX_BYTES', 20 * 1024 ** 3))
     app.config['DATA_DIR'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
     app.config['TEMPLATES_DIR'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates')
     
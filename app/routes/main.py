@@ -107,14 +107,21 @@ def analyze_repository():
     sector_hint = data.get('sector_hint') or 'General Data Privacy'
     framework_hint = data.get('backend_framework', '').lower()
     plan = data.get('plan', CURRENT_PLAN)
+    base_scan_id = data.get('base_scan_id')
+    if base_scan_id:
+        try:
+            base_scan_id = str(uuid.UUID(str(base_scan_id)))
+        except ValueError:
+            return jsonify({"error": "base_scan_id must be a scan id"}), 400
     scan_id = str(uuid.uuid4())
     repo_name = github_url.split('/')[-1].replace('.git', '')
     repo_path = os.path.join(current_app.config['PULLED_CODE_DIR'], scan_id, repo_name)
     user_token = session.get('google_access_token')
 
+    github_service = None
     try:
         print(f"[/api/analyze] Received request for scan {scan_id}")
-        print(f"[/api/analyze] URL: {github_url}, Sector: {sector_hint}, Framework: {framework_hint}, Plan: {plan}")
+        print(f"[/api/analyze] URL: {github_url}, Sector: {sector_hint}, Framework: {framework_hint}, Plan: {plan}, Base scan: {base_scan_id}")
         
         print(f"[/api/analyze] Phase 1: Cloning repository into isolated path: {repo_path}")
         github_service = GitHubService()
@@ -122,7 +129,10 @@ def analyze_repository():
         
         print(f"[/api/analyze] Phase 2: Starting codebase analysis with plan: {plan}...")
         analysis_service = AnalysisService(plan=plan)
-        scan_results = analysis_service.analyze_codebase(repo_path, sector_hint, scan_id)
+        repo_index = analysis_service.build_index(repo_path)
+        scan_results = analysis_service.analyze_codebase(
+            repo_path, sector_hint, scan_id, repo_index=repo_index, base_scan_id=base_scan_id
+        )
         
         framework_analysis_results = None
         if framework_hint:
@@ -133,13 +143,15 @@ def analyze_repository():
                     framework_analysis_results = extract_django_endpoints(
                         repo_path=repo_path, 
                         user_token=user_token, 
-                        sector=sector_hint
+                        sector=sector_hint,
+                        repo_index=repo_index
                     )
                 elif framework_hint in ['flask', 'fastapi']:
                     framework_analysis_results = extract_flask_fastapi_endpoints(
                         repo_path=repo_path, 
                         user_token=user_token, 
-                        sector=sector_hint
+                        sector=sector_hint,
+                        repo_index=repo_index
                     )
                 
                 if framework_analysis_results:
@@ -159,12 +171,18 @@ def analyze_repository():
             'plan_used': plan,
             'total_findings': scan_results['summary']['total_findings'],
             'framework_analysis': framework_analysis_results, 
+            'incremental': scan_results.get('incremental'),
             'message': f'Analysis completed successfully using {plan} plan'
         })
     except Exception as e:
         print(f"[/api/analyze] ERROR for scan {scan_id}: {str(e)}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
     finally:
+        if github_service:
+            try:
+                github_service.release_repository(repo_path)
+            except Exception as cleanup_e:
+                print(f"[/api/analyze] Could not release mirror worktree: {str(cleanup_e)}")
         parent_dir = os.path.dirname(repo_path)
         if os.path.exists(parent_dir):
             print(f"[/api/analyze] Cleaning up directory: {parent_dir}")
@@ -8,6 +8,11 @@ from flask import current_app
 import logging
 
 from analysis_engine.orchestrator import AnalysisOrchestrator
+from analysis_engine.utils.findings_stream import iter_scan_findings, write_findings_jsonl
+from analysis_engine.utils.incremental import (
+    DEPENDENCY_MANIFESTS, IncrementalScanError, carry_over_findings, changed_files,
+    head_commit, manifests_changed, split_changes,
+)
 from app.services.repo_info_service import RepoInfoExtractor
 
 logger = logging.getLogger(__name__)
@@ -28,17 +33,37 @@ class AnalysisService:
 
         logger.info(f"AnalysisService initialized (delegating to orchestrator), plan={plan}")
 
-    def analyze_codebase(self, repo_path, sector_hint, scan_id):
+    def build_index(self, repo_path):
+        """RepoIndex honouring the orchestrator's path settings (size cap, generated files)"""
+        return self.orchestrator.build_index(repo_path)
+
+    def analyze_codebase(self, repo_path, sector_hint, scan_id, repo_index=None, base_scan_id=None):
         try:
             logger.info(f"🔍 Starting scan {scan_id} on path {repo_path}")
+            if repo_index is None:
+                repo_index = self.build_index(repo_path)
+            commit_sha = head_commit(repo_path)
 
             # 1️⃣ Extract repository context
-            repo_info = self.repo_extractor.extract(repo_path)
-
-            # 2️⃣ Run FULL analysis via orchestrator
+            repo_info = self.repo_extractor.extract(repo_path, repo_index)
+
+            # 2️⃣ Work out what needs analyzing (everything, or only what changed since the base scan)
+            analysis_index, carried_findings, incremental = repo_index, None, None
+            if base_scan_id:
+                try:
+                    analysis_index, carried_findings, incremental = self._plan_incremental(
+                        base_scan_id, repo_path, repo_index, commit_sha
+                    )
+                except IncrementalScanError as e:
+                    logger.warning(f"Incremental rescan from {base_scan_id} not possible, running a full scan: {e}")
+                    incremental = {"mode": "full", "base_scan_id": base_scan_id, "fallback_reason": str(e)}
+
+            # 3️⃣ Run analysis via orchestrator
             findings, metrics = self.orchestrator.run(
                 repo_path=repo_path,
-                repository_info=repo_info
+                repository_info=repo_info,
+                repo_index=analysis_index,
+                carried_findings=carried_findings
             )
             
             risk_summary = metrics.pop('llm_risk_summary', 'Not generated.')
@@ -48,22 +73,27 @@ class AnalysisService:
                 "analysis_time": metrics.get("total_time", 0)
             }
 
-            # 3️⃣ Build final scan object
+            # 4️⃣ Build final scan object
             scan_results = {
                 "scan_id": scan_id,
                 "timestamp": datetime.now().isoformat(),
                 "repository_path": repo_path,
+                "commit_sha": commit_sha,
                 "sector_hint": sector_hint,
                 "plan_used": self.plan,
                 "repository_info": repo_info,
                 "findings": findings,
                 "summary": summary,
                 "risk_summary": risk_summary,
-                "metrics": metrics
+                "metrics": metrics,
+                # Incremental rescans against this scan re-analyze anything outside this list
+                "indexed_files": sorted(repo_index.files),
             }
+            if incremental:
+                scan_results["incremental"] = incremental
 
-            # 4️⃣ Persist results
-            self._save_scan_results(scan_id, scan_results)
+            # 5️⃣ Persist results
+            self._save_scan_results(scan_id, scan_results, repo_index)
 
             logger.info(f"✅ Scan complete: {len(findings)} findings")
             return scan_results
@@ -72,13 +102,89 @@ class AnalysisService:
             logger.error(f"❌ Analysis failed for scan {scan_id}: {e}", exc_info=True)
             raise
 
-    def _save_scan_results(self, scan_id, results):
+    def _plan_incremental(self, base_scan_id, repo_path, repo_index, commit_sha):
+        """
+        Diff HEAD against the commit recorded in the base scan. Returns the index
+        of files to re-analyze, the base findings that carry over unchanged, and
+        a summary recorded with the new scan.
+        """
+        base_scan = self._load_scan_results(base_scan_id)
+        base_commit = base_scan.get("commit_sha")
+        if not base_commit:
+            raise IncrementalScanError(f"scan {base_scan_id} has no recorded commit")
+        if not commit_sha:
+            raise IncrementalScanError("checkout has no HEAD commit")
+        # Carried-over findings are only valid if they came from the same rules
+        base_packs = base_scan.get("metrics", {}).get("rule_packs")
+        if base_packs != self.orchestrator.rule_packs():
+            raise IncrementalScanError(f"rule packs changed since scan {base_scan_id}")
+        # ... and from the same analyzer code and tool versions
+        base_versions = base_scan.get("metrics", {}).get("analyzer_versions")
+        if base_versions != self.orchestrator.analyzer_versions():
+            raise IncrementalScanError(f"analyzers changed since scan {base_scan_id}")
+        # Files the base scan never indexed (other sparse set, path policy) have nothing to carry over
+        base_files = base_scan.get("indexed_files")
+        if base_files is None:
+            raise IncrementalScanError(f"scan {base_scan_id} has no recorded file list")
+        # Findings dropped by the per-rule/per-file caps cannot be carried over
+        if base_scan.get("metrics", {}).get("aggregation", {}).get("omitted_records"):
+            raise IncrementalScanError(f"scan {base_scan_id} omitted capped findings")
+
+        changes = changed_files(repo_path, base_commit, commit_sha)
+        modified, deleted = split_changes(changes)
+        rescan = [path for path in modified if repo_index.exists(path)]
+        if manifests_changed(changes):
+            # pip-audit reads the manifests from disk, so keep them visible to it
+            rescan += [name for name in DEPENDENCY_MANIFESTS if repo_index.exists(name) and name not in rescan]
+
+        results_dir = os.path.join(self.data_dir, "scanned_results")
+        carried, rederive = carry_over_findings(iter_scan_findings(base_scan, results_dir), changes)
+        # Files whose findings took part in a taint flow are re-analyzed so they correlate afresh
+        rederive = [path for path in rederive if repo_index.exists(path) and path not in rescan]
+        rescan += rederive
+        unscanned = sorted(set(repo_index.files) - set(base_files) - set(rescan))
+        rescan += unscanned
+
+        logger.info(
+            f"Incremental rescan against {base_scan_id} ({base_commit[:12]}..{commit_sha[:12]}): "
+            f"{len(rescan)} files to analyze ({len(unscanned)} not in the base scan, {len(rederive)} with taint "
+            f"findings), {len(deleted)} deleted, {len(carried)} findings carried over"
+        )
+        return repo_index.subset(rescan), carried, {
+            "mode": "incremental",
+            "base_scan_id": base_scan_id,
+            "base_commit_sha": base_commit,
+            "changed_files": modified,
+            "deleted_files": deleted,
+            "unscanned_files": unscanned,
+            "taint_files": rederive,
+            "carried_over_findings": len(carried),
+        }
+
+    def _load_scan_results(self, scan_id):
+        path = os.path.join(self.data_dir, "scanned_results", f"{scan_id}.json")
+        if not os.path.exists(path):
+            raise IncrementalScanError(f"base scan {scan_id} not found")
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _save_scan_results(self, scan_id, results, repo_index):
         results_dir = os.path.join(self.data_dir, "scanned_results")
         os.makedirs(results_dir, exist_ok=True)
 
+        # Findings go to a JSON Lines file beside the scan, materialized one at a time
+        # (snippets read from the checkout) so no second copy of them is built
+        findings_file = f"{scan_id}.findings.jsonl"
+        written = write_findings_jsonl(
+            os.path.join(results_dir, findings_file), results["findings"], repo_index.read_text
+        )
+        summary = {key: value for key, value in results.items() if key != "findings"}
+        summary["findings_file"] = findings_file
+        summary["findings_count"] = written
+
         path = os.path.join(results_dir, f"{scan_id}.json")
         with open(path, "w") as f:
-            json.dump(results, f, indent=2)
+            json.dump(summary, f, indent=2)
 
         logger.info(f"💾 Results saved: {path}")
 
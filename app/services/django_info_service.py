@@ -6,16 +6,27 @@ from flask import session
 import google.generativeai as genai
 from google.oauth2.credentials import Credentials
 
+from analysis_engine.utils.repo_index import RepoIndex
+
 # =========================================================
 # 1. Utilities
 # =========================================================
 
-def find_files(repo_path: str, filename: str) -> List[str]:
-    matches = []
-    for root, _, files in os.walk(repo_path):
-        if filename in files:
-            matches.append(os.path.join(root, filename))
-    return matches
+def find_files(repo_path: str, filename: str, repo_index: Optional[RepoIndex] = None) -> List[str]:
+    if repo_index is None:
+        repo_index = RepoIndex(repo_path)
+    return [
+        f.abs_path for f in repo_index.iter_files()
+        if os.path.basename(f.rel_path) == filename
+    ]
+
+
+def parse_source(path: str, repo_index: Optional[RepoIndex] = None) -> ast.AST:
+    # Views shared by several endpoints hit the scan's AST cache instead of re-parsing
+    abs_path = os.path.abspath(path)
+    if repo_index is not None and repo_index.exists(abs_path):
+        return repo_index.parse_ast(abs_path)
+    return ast.parse(open(path, encoding="utf-8").read())
 
 
 def get_ast_string(node: ast.AST) -> str:
@@ -26,9 +37,11 @@ def get_ast_string(node: ast.AST) -> str:
     return ""
 
 
-def module_to_path(repo_path: str, module: str) -> Optional[str]:
+def module_to_path(repo_path: str, module: str, repo_index: Optional[RepoIndex] = None) -> Optional[str]:
     parts = module.split(".")
     candidate = os.path.join(repo_path, *parts) + ".py"
+    if repo_index is not None:
+        return candidate if repo_index.exists(os.path.abspath(candidate)) else None
     if os.path.exists(candidate):
         return candidate
     return None
@@ -38,10 +51,10 @@ def module_to_path(repo_path: str, module: str) -> Optional[str]:
 # 2. Django Project Discovery
 # =========================================================
 
-def discover_settings_module(repo_path: str) -> Optional[str]:
-    for manage_path in find_files(repo_path, "manage.py"):
+def discover_settings_module(repo_path: str, repo_index: Optional[RepoIndex] = None) -> Optional[str]:
+    for manage_path in find_files(repo_path, "manage.py", repo_index):
         try:
-            tree = ast.parse(open(manage_path, encoding="utf-8").read())
+            tree = parse_source(manage_path, repo_index)
             for node in ast.walk(tree):
                 if isinstance(node, ast.Call) and hasattr(node.func, "attr"):
                     if node.func.attr == "setdefault" and len(node.args) >= 2:
@@ -52,9 +65,9 @@ def discover_settings_module(repo_path: str) -> Optional[str]:
     return None
 
 
-def extract_root_urlconf(settings_path: str) -> Optional[str]:
+def extract_root_urlconf(settings_path: str, repo_index: Optional[RepoIndex] = None) -> Optional[str]:
     try:
-        tree = ast.parse(open(settings_path, encoding="utf-8").read())
+        tree = parse_source(settings_path, repo_index)
         for node in tree.body:
             if isinstance(node, ast.Assign):
                 for t in node.targets:
@@ -69,10 +82,10 @@ def extract_root_urlconf(settings_path: str) -> Optional[str]:
 # 3. URL Parsing (Recursive)
 # =========================================================
 
-def parse_urls_file(repo_path: str, urls_file: str, base: str = "") -> List[Dict]:
+def parse_urls_file(repo_path: str, urls_file: str, base: str = "", repo_index: Optional[RepoIndex] = None) -> List[Dict]:
     endpoints = []
     try:
-        tree = ast.parse(open(urls_file, encoding="utf-8").read())
+        tree = parse_source(urls_file, repo_index)
     except Exception:
         return endpoints
 
@@ -86,9 +99,9 @@ def parse_urls_file(repo_path: str, urls_file: str, base: str = "") -> List[Dict
                 if len(node.args) > 1 and isinstance(node.args[1], ast.Call):
                     if getattr(node.args[1].func, "id", "") == "include":
                         mod = get_ast_string(node.args[1].args[0])
-                        inc = module_to_path(repo_path, mod)
+                        inc = module_to_path(repo_path, mod, repo_index)
                         if inc:
-                            endpoints.extend(parse_urls_file(repo_path, inc, full_path))
+                            endpoints.extend(parse_urls_file(repo_path, inc, full_path, repo_index))
                         continue
 
                 view_expr = ast.unparse(node.args[1]) if len(node.args) > 1 else "unknown"
@@ -106,11 +119,11 @@ def parse_urls_file(repo_path: str, urls_file: str, base: str = "") -> List[Dict
 # 4. View Resolution
 # =========================================================
 
-def resolve_view_file(repo_path: str, view_expr: str) -> Optional[str]:
+def resolve_view_file(repo_path: str, view_expr: str, repo_index: Optional[RepoIndex] = None) -> Optional[str]:
     parts = view_expr.split(".")
     if len(parts) < 2:
         return None
-    return module_to_path(repo_path, ".".join(parts[:-1]))
+    return module_to_path(repo_path, ".".join(parts[:-1]), repo_index)
 
 
 # =========================================================
@@ -135,7 +148,7 @@ HTTP_METHODS = {"GET", "POST", "PUT", "DELETE", "PATCH"}
 # 6. View Analysis
 # =========================================================
 
-def analyze_view(view_file: str, view_name: str) -> Dict[str, Any]:
+def analyze_view(view_file: str, view_name: str, repo_index: Optional[RepoIndex] = None) -> Dict[str, Any]:
     analysis = {
         "view_definition_line": None, # ### NEW
         "http_methods": [],
@@ -145,7 +158,7 @@ def analyze_view(view_file: str, view_name: str) -> Dict[str, Any]:
     }
 
     try:
-        tree = ast.parse(open(view_file, encoding="utf-8").read())
+        tree = parse_source(view_file, repo_index)
     except Exception:
         return analysis
 
@@ -426,7 +439,7 @@ def enrich_with_llm(extracted: Dict[str, Any], user_token: Optional[str] = None,
 # 7. Main Orchestrator (PUBLIC API)
 # =========================================================
 
-def extract_django_endpoints(repo_path: str, user_token: Optional[str] = None, sector: str = "General Data Privacy") -> Dict[str, Any]:
+def extract_django_endpoints(repo_path: str, user_token: Optional[str] = None, sector: str = "General Data Privacy", repo_index: Optional[RepoIndex] = None) -> Dict[str, Any]:
     output = {
         "framework": "django",
         "endpoints": [],
@@ -434,31 +447,34 @@ def extract_django_endpoints(repo_path: str, user_token: Optional[str] = None, s
     }
 
     try:
-        settings_module = discover_settings_module(repo_path)
+        if repo_index is None:
+            repo_index = RepoIndex(repo_path)
+
+        settings_module = discover_settings_module(repo_path, repo_index)
         if not settings_module:
             raise Exception("Django settings module not found")
 
-        settings_file = module_to_path(repo_path, settings_module)
+        settings_file = module_to_path(repo_path, settings_module, repo_index)
         if not settings_file:
             raise Exception("settings.py not found")
 
-        root_urlconf = extract_root_urlconf(settings_file)
+        root_urlconf = extract_root_urlconf(settings_file, repo_index)
         if not root_urlconf:
             raise Exception("ROOT_URLCONF missing")
 
-        urls_file = module_to_path(repo_path, root_urlconf)
+        urls_file = module_to_path(repo_path, root_urlconf, repo_index)
         if not urls_file:
             raise Exception("urls.py not found")
 
-        endpoints = parse_urls_file(repo_path, urls_file)
+        endpoints = parse_urls_file(repo_path, urls_file, repo_index=repo_index)
         output['endpoints'] = endpoints
 
         for ep in endpoints:
             view_expr = ep.get("view", "")
-            view_file = resolve_view_file(repo_path, view_expr)
+            view_file = resolve_view_file(repo_path, view_expr, repo_index)
             if view_file:
                 view_name = view_expr.split(".")[-1]
-                ep.update(analyze_view(view_file, view_name))
+                ep.update(analyze_view(view_file, view_name, repo_index))
 
         # Step 6: LLM enrichment
         try:
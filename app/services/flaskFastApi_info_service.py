@@ -7,6 +7,8 @@ from flask import session
 import google.generativeai as genai
 from google.oauth2.credentials import Credentials
 
+from analysis_engine.utils.repo_index import RepoIndex
+
 # =========================================================
 # 1. Utilities
 # =========================================================
@@ -25,13 +27,10 @@ AUTH_PATTERNS = [
 ]
 
 
-def find_python_files(repo_path: str) -> List[str]:
-    py_files = []
-    for root, _, files in os.walk(repo_path):
-        for f in files:
-            if f.endswith(".py"):
-                py_files.append(os.path.join(root, f))
-    return py_files
+def find_python_files(repo_path: str, repo_index: Optional[RepoIndex] = None) -> List[str]:
+    if repo_index is None:
+        repo_index = RepoIndex(repo_path)
+    return [f.abs_path for f in repo_index.iter_files(language="python")]
 
 
 def get_constant(node: ast.AST) -> Optional[str]:
@@ -359,7 +358,8 @@ def enrich_with_llm(extracted: Dict[str, Any], framework: str, sector: str, user
 def extract_flask_fastapi_endpoints(
     repo_path: str,
     sector: str = "General Data Privacy",
-    user_token: Optional[str] = None
+    user_token: Optional[str] = None,
+    repo_index: Optional[RepoIndex] = None
 ) -> Dict[str, Any]:
 
     output = {
@@ -369,9 +369,12 @@ def extract_flask_fastapi_endpoints(
     }
 
     try:
-        for file_path in find_python_files(repo_path):
+        if repo_index is None:
+            repo_index = RepoIndex(repo_path)
+
+        for file_path in find_python_files(repo_path, repo_index):
             try:
-                tree = ast.parse(open(file_path, encoding="utf-8").read())
+                tree = repo_index.parse_ast(file_path)
             except Exception:
                 continue
 
@@ -6,11 +6,16 @@ from datetime import datetime
 from flask import current_app, session
 import google.generativeai as genai
 from google.oauth2.credentials import Credentials
+from app.services.mirror_cache import DEFAULT_MAX_BYTES, MirrorCache
 
 
 class GitHubService:
     def __init__(self):
         self.pulled_code_dir = current_app.config.get('PULLED_CODE_DIR')
+        mirror_dir = current_app.config.get('MIRROR_CACHE_DIR')
+        self.mirror_cache = MirrorCache(
+            mirror_dir, current_app.config.get('MIRROR_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+        ) if mirror_dir else None
 
     # -----------------------------
     # PUBLIC ENTRY POINT
@@ -18,7 +23,8 @@ class GitHubService:
     def clone_repository(self, github_url, destination_path):
         """
         High-level automated pipeline:
-        1. Partial clone (no blobs)
+        1. Partial clone (no blobs), or a worktree of the cached mirror
+           (call release_repository when done with it)
         2. List repo tree
         3. Send tree to LLM (Gemini)
         4. Apply sparse checkout
@@ -54,6 +60,10 @@ class GitHubService:
     # STEP 1: PARTIAL CLONE
     # -----------------------------
     def _partial_clone(self, github_url, destination_path):
+        if self.mirror_cache:
+            # Repeat scans reuse the local mirror and only fetch what changed upstream
+            self.mirror_cache.checkout(github_url, destination_path)
+            return
         subprocess.run(
             [
                 "git", "clone",
@@ -177,9 +187,12 @@ class GitHubService:
     def _apply_sparse_checkout(self, repo_path, include_rules):
         repo = git.Repo(repo_path)
 
-        repo.git.config("core.sparseCheckout", "true")
+        # Written to this worktree's own config; mirror worktrees share the mirror's config file
+        repo.git.config("--worktree", "core.sparseCheckout", "true")
 
-        sparse_file = os.path.join(repo_path, ".git", "info", "sparse-checkout")
+        # Per-worktree location: .git is a file, not a directory, in mirror worktrees
+        sparse_file = os.path.join(repo_path, repo.git.rev_parse("--git-path", "info/sparse-checkout"))
+        os.makedirs(os.path.dirname(sparse_file), exist_ok=True)
 
         with open(sparse_file, "w") as f:
             for rule in include_rules:
@@ -192,6 +205,14 @@ class GitHubService:
         repo = git.Repo(repo_path)
         repo.git.checkout("HEAD")
 
+    # -----------------------------
+    # CLEANUP
+    # -----------------------------
+    def release_repository(self, repo_path):
+        """Detach a checkout from the mirror cache; a no-op for plain clones"""
+        if self.mirror_cache:
+            self.mirror_cache.release(repo_path)
+
     # -----------------------------
     # LOGGING (UNCHANGED)
     # -----------------------------
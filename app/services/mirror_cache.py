@@ -0,0 +1,224 @@
+import os
+import shutil
+import hashlib
+import logging
+import subprocess
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: mirrors still work, just without cross-process locking
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024 * 1024
+LAST_USED_MARKER = 'last-used'
+
+
+def _mirror_key(url: str) -> str:
+    normalized = url.strip().rstrip('/')
+    if normalized.endswith('.git'):
+        normalized = normalized[:-4]
+    return hashlib.sha256(normalized.lower().encode('utf-8')).hexdigest()[:24]
+
+
+def _git(args, cwd=None, timeout=600):
+    return subprocess.run(['git'] + args, cwd=cwd, capture_output=True, text=True, check=True, timeout=timeout)
+
+
+def _directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class MirrorCache:
+    """
+    Local cache of bare, blobless (--filter=blob:none) mirrors, one per remote
+    URL. A scan gets its own worktree of the mirror instead of a fresh clone, so
+    repeat scans of a repository only fetch what changed upstream and share
+    the objects already on disk.
+
+    Each mirror has two lock files. Cloning, fetching and adding or removing a
+    worktree hold its update lock exclusively, so concurrent workers never write
+    to the same mirror at once. A scan also holds a shared pin on the mirror
+    until its worktree is released; eviction needs the pin exclusively, so a
+    mirror is never deleted while a scan reads from it. Mirrors are evicted
+    least recently used first once the cache exceeds its disk budget.
+    """
+
+    def __init__(self, root: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.mirrors_dir = os.path.join(root, 'mirrors')
+        self.locks_dir = os.path.join(root, 'locks')
+        os.makedirs(self.mirrors_dir, exist_ok=True)
+        os.makedirs(self.locks_dir, exist_ok=True)
+        # worktree path -> (mirror path, open pin file)
+        self._leases = {}
+
+    def mirror_path(self, url: str) -> str:
+        return os.path.join(self.mirrors_dir, _mirror_key(url) + '.git')
+
+    # -----------------------------
+    # LOCKING
+    # -----------------------------
+    def _open_lock(self, mirror_path: str, kind: str):
+        return open(os.path.join(self.locks_dir, '{}.{}'.format(os.path.basename(mirror_path), kind)), 'a+')
+
+    @staticmethod
+    def _flock(lock_file, operation: str, blocking: bool = True) -> bool:
+        """Apply LOCK_EX / LOCK_SH; returns False if non-blocking and already held"""
+        if fcntl is None:
+            return True
+        flags = getattr(fcntl, operation) | (0 if blocking else fcntl.LOCK_NB)
+        try:
+            fcntl.flock(lock_file.fileno(), flags)
+        except BlockingIOError:
+            return False
+        return True
+
+    @contextmanager
+    def _updating(self, mirror_path: str):
+        """Exclusive lock for anything that writes to the mirror (clone, fetch, worktree add/remove)"""
+        lock_file = self._open_lock(mirror_path, 'lock')
+        try:
+            self._flock(lock_file, 'LOCK_EX')
+            yield
+        finally:
+            lock_file.close()
+
+    # -----------------------------
+    # PUBLIC API
+    # -----------------------------
+    def checkout(self, url: str, worktree_path: str) -> str:
+        """
+        Make `worktree_path` a detached, not-yet-populated worktree at the
+        remote's current HEAD. Callers populate it (e.g. after configuring a
+        sparse checkout) and must call `release` once they are done with it.
+        """
+        mirror_path = self.mirror_path(url)
+        # Shared pin for as long as the worktree exists, so eviction skips this mirror
+        pin = self._open_lock(mirror_path, 'pin')
+        try:
+            self._flock(pin, 'LOCK_SH')
+            with self._updating(mirror_path):
+                self._refresh(url, mirror_path)
+                if os.path.isdir(worktree_path) and not os.listdir(worktree_path):
+                    os.rmdir(worktree_path)
+                os.makedirs(os.path.dirname(worktree_path), exist_ok=True)
+                _git(['--git-dir', mirror_path, 'worktree', 'add', '--no-checkout', '--detach', worktree_path, 'HEAD'])
+                self._touch(mirror_path)
+        except Exception:
+            pin.close()
+            raise
+
+        self._leases[os.path.abspath(worktree_path)] = (mirror_path, pin)
+        self._evict(keep=mirror_path)
+        return worktree_path
+
+    def release(self, worktree_path: str):
+        """Remove a worktree created by `checkout` and unpin its mirror"""
+        mirror_path, pin = self._leases.pop(os.path.abspath(worktree_path), (None, None))
+        if mirror_path is None:
+            return
+        try:
+            with self._updating(mirror_path):
+                try:
+                    _git(['--git-dir', mirror_path, 'worktree', 'remove', '--force', worktree_path], timeout=120)
+                except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+                    logger.warning("Could not remove worktree {}: {}".format(worktree_path, e))
+                    _git(['--git-dir', mirror_path, 'worktree', 'prune'], timeout=120)
+                self._touch(mirror_path)
+        finally:
+            pin.close()
+
+    # -----------------------------
+    # MIRRORS
+    # -----------------------------
+    def _refresh(self, url: str, mirror_path: str):
+        if os.path.isdir(mirror_path):
+            try:
+                # Drop records of worktrees whose scans died before releasing them
+                _git(['--git-dir', mirror_path, 'worktree', 'prune'])
+                _git(['--git-dir', mirror_path, 'fetch', '--prune', 'origin'])
+                # Mirrors created before per-worktree config was enabled
+                self._enable_worktree_config(mirror_path)
+                logger.info("Updated mirror {} for {}".format(mirror_path, url))
+                return
+            except subprocess.CalledProcessError as e:
+                logger.warning("Mirror {} is unusable, re-cloning: {}".format(mirror_path, e.stderr.strip()))
+                shutil.rmtree(mirror_path, ignore_errors=True)
+
+        tmp_path = mirror_path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        _git(['clone', '--mirror', '--filter=blob:none', url, tmp_path])
+        self._enable_worktree_config(tmp_path)
+        os.rename(tmp_path, mirror_path)
+        logger.info("Created mirror {} for {}".format(mirror_path, url))
+
+    @staticmethod
+    def _enable_worktree_config(mirror_path: str):
+        """
+        Let each worktree keep its own settings (`git config --worktree`, e.g.
+        core.sparseCheckout) in its config.worktree, so scans never write the
+        mirror's shared config. Called with the update lock held. core.bare
+        moves to the mirror's own config.worktree, as linked worktrees would
+        otherwise read it from the shared config and consider themselves bare.
+        """
+        try:
+            if _git(['--git-dir', mirror_path, 'config', '--bool', 'extensions.worktreeConfig']).stdout.strip() == 'true':
+                return
+        except subprocess.CalledProcessError:
+            pass  # not set
+        _git(['--git-dir', mirror_path, 'config', 'extensions.worktreeConfig', 'true'])
+        _git(['--git-dir', mirror_path, 'config', '--worktree', 'core.bare', 'true'])
+        _git(['--git-dir', mirror_path, 'config', '--unset', 'core.bare'])
+
+    def _touch(self, mirror_path: str):
+        marker = os.path.join(mirror_path, LAST_USED_MARKER)
+        with open(marker, 'a'):
+            pass
+        os.utime(marker, None)
+
+    def _last_used(self, mirror_path: str) -> float:
+        try:
+            return os.path.getmtime(os.path.join(mirror_path, LAST_USED_MARKER))
+        except OSError:
+            return 0.0
+
+    def _evict(self, keep: str = None):
+        """Delete least recently used mirrors until the cache fits its budget"""
+        mirrors = [
+            os.path.join(self.mirrors_dir, name) for name in os.listdir(self.mirrors_dir)
+            if name.endswith('.git')
+        ]
+        sizes = {path: _directory_size(path) for path in mirrors}
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+
+        for mirror_path in sorted(mirrors, key=self._last_used):
+            if total <= self.max_bytes:
+                break
+            if mirror_path == keep:
+                continue
+            pin = self._open_lock(mirror_path, 'pin')
+            lock_file = self._open_lock(mirror_path, 'lock')
+            try:
+                # Skip mirrors a running scan has pinned or another worker is updating
+                if not (self._flock(pin, 'LOCK_EX', blocking=False) and
+                        self._flock(lock_file, 'LOCK_EX', blocking=False)):
+                    continue
+                shutil.rmtree(mirror_path, ignore_errors=True)
+                total -= sizes[mirror_path]
+                logger.info("Evicted mirror {} ({} bytes)".format(mirror_path, sizes[mirror_path]))
+            finally:
+                lock_file.close()
+                pin.close()
@@ -8,6 +8,8 @@ from datetime import datetime
 from google.oauth2.credentials import Credentials
 import pypandoc
 
+from analysis_engine.utils.findings_stream import iter_scan_findings
+
 class ReportService:
     def __init__(self):
         self.data_dir = current_app.config['DATA_DIR']
@@ -166,6 +168,11 @@ class ReportService:
                 parts.append(f"### {idx}. {title} ({short})")
                 parts.append(f"- Severity: {sev}")
                 parts.append(f"- Location: {path}:{line}")
+                if f.get('sources'):
+                    parts.append(f"- Reported by: {', '.join(f['sources'])}")
+                if f.get('occurrences', 1) > 1:
+                    lines = ', '.join(str(n) for n in f.get('line_numbers', [])[:20])
+                    parts.append(f"- Occurrences: {f['occurrences']} in this file (lines {lines})")
                 if desc:
                     parts.append(f"- Description: {desc}")
                 if snippet:
@@ -219,6 +226,7 @@ class ReportService:
         
         with open(results_path, 'r') as f:
             main_results = json.load(f)
+        main_results['findings'] = list(iter_scan_findings(main_results, os.path.dirname(results_path)))
 
         # Check for and merge the separate framework analysis file
         framework_results_path = os.path.join(self.data_dir, 'scanned_results', f'{scan_id}_EndpointAnalysis.json')
@@ -27,16 +27,20 @@ def _remove_readonly_onerror(func, path, _):
 
 # Ensure app context for tasks that need current_app.config
 @celery.task(bind=True)
-def run_analysis_task(self, github_url: str, sector_hint: str, framework_hint: str, plan: str, user_token: str):
+def run_analysis_task(self, github_url: str, sector_hint: str, framework_hint: str, plan: str, user_token: str, base_scan_id: str = None):
     app = current_app._get_current_object() # Access Flask app instance
     
     scan_id = str(uuid.uuid4())
     repo_name = github_url.split('/')[-1].replace('.git', '')
     repo_path = os.path.join(app.config['PULLED_CODE_DIR'], scan_id, repo_name)
 
+    github_service = None
     try:
         print(f"[Task:{self.request.id}] Received analysis request for scan {scan_id}")
-        print(f"[Task:{self.request.id}] URL: {github_url}, Sector: {sector_hint}, Framework: {framework_hint}, Plan: {plan}")
+        print(f"[Task:{self.request.id}] URL: {github_url}, Sector: {sector_hint}, Framework: {framework_hint}, Plan: {plan}, Base scan: {base_scan_id}")
+        if base_scan_id:
+            # Only ever used to build a path under scanned_results
+            base_scan_id = str(uuid.UUID(str(base_scan_id)))
         
         # Phase 1: Input & Analysis
         print(f"[Task:{self.request.id}] Phase 1: Cloning repository into isolated path: {repo_path}")
@@ -49,7 +53,10 @@ def run_analysis_task(self, github_url: str, sector_hint: str, framework_hint: s
         
         # Perform standard security analysis
         analysis_service = AnalysisService(plan=plan)
-        scan_results = analysis_service.analyze_codebase(repo_path, sector_hint, scan_id)
+        repo_index = analysis_service.build_index(repo_path)
+        scan_results = analysis_service.analyze_codebase(
+            repo_path, sector_hint, scan_id, repo_index=repo_index, base_scan_id=base_scan_id
+        )
         
         framework_analysis_results = None
         if framework_hint:
@@ -59,13 +66,15 @@ def run_analysis_task(self, github_url: str, sector_hint: str, framework_hint: s
                     framework_analysis_results = extract_django_endpoints(
                         repo_path=repo_path, 
                         user_token=user_token, 
-                        sector=sector_hint
+                        sector=sector_hint,
+                        repo_index=repo_index
                     )
                 elif framework_hint in ['flask', 'fastapi']:
                     framework_analysis_results = extract_flask_fastapi_endpoints(
                         repo_path=repo_path, 
                         user_token=user_token, 
-                        sector=sector_hint
+                        sector=sector_hint,
+                        repo_index=repo_index
                     )
                 
                 if framework_analysis_results:
@@ -87,6 +96,7 @@ def run_analysis_task(self, github_url: str, sector_hint: str, framework_hint: s
             'plan_used': plan,
             'total_findings': scan_results['summary']['total_findings'],
             'framework_analysis': framework_analysis_results, 
+            'incremental': scan_results.get('incremental'),
             'message': f'Analysis completed successfully using {plan} plan'
         }
     
@@ -97,6 +107,11 @@ def run_analysis_task(self, github_url: str, sector_hint: str, framework_hint: s
     
     finally:
         # Phase 3: Cleanup
+        if github_service:
+            try:
+                github_service.release_repository(repo_path)
+            except Exception as cleanup_e:
+                print(f"[Task:{self.request.id}] Could not release mirror worktree: {str(cleanup_e)}")
         parent_dir = os.path.dirname(repo_path)
         if os.path.exists(parent_dir):
             print(f"[Task:{self.request.id}] Cleaning up directory: {parent_dir}")